@@ -0,0 +1,87 @@
+"""
+Time the vectorized at-risk computation against a per-enrollment Python loop
+on synthetic attendance of about a million (student, session) rows.
+
+    python -m benchmarks.attendance_analytics_benchmark [courses] [students_per_course] [sessions_per_course]
+
+The defaults give 50 courses x 500 students x 40 sessions = 1,000,000 rows.
+Only the computation is timed; loading is three column queries either way.
+"""
+import sys
+import time
+from collections import defaultdict
+import numpy as np
+from util.attendance_analytics_utils import AttendanceArrays, compute_attendance_risk
+
+
+def synthetic_arrays(courses: int, students: int, sessions: int, seed: int = 7):
+    rng = np.random.default_rng(seed)
+    student_count = courses * students // 2  # every student takes two courses
+    enrollment_course = np.repeat(np.arange(courses), students)
+    enrollment_student = (
+        np.arange(courses * students) % student_count
+    )
+    session_course = np.repeat(np.arange(courses), sessions)
+    session_closed = np.ones(courses * sessions, dtype=bool)
+    session_closed[sessions - 1 :: sessions] = False  # each course's latest is open
+
+    # Each enrollment attends each session of its course with its own rate.
+    rates = rng.uniform(0.4, 1.0, len(enrollment_course))
+    rows_present = rng.random((len(enrollment_course), sessions)) < rates[:, None]
+    enrollment_index, session_offset = np.nonzero(rows_present)
+    return AttendanceArrays(
+        course_codes=np.array([f"C{course:03d}" for course in range(courses)]),
+        matric_numbers=np.array([f"M{student:06d}" for student in range(student_count)]),
+        session_course=session_course,
+        session_closed=session_closed,
+        enrollment_course=enrollment_course,
+        enrollment_student=enrollment_student,
+        presence_session=enrollment_course[enrollment_index] * sessions + session_offset,
+        presence_student=enrollment_student[enrollment_index],
+    )
+
+
+def python_loop(arrays: AttendanceArrays, threshold: float):
+    # The course-by-course equivalent: walk every enrollment's sessions in order.
+    sessions_by_course = defaultdict(list)
+    for session, course in enumerate(arrays.session_course.tolist()):
+        sessions_by_course[course].append(session)
+    closed = arrays.session_closed.tolist()
+    present = set(zip(arrays.presence_session.tolist(), arrays.presence_student.tolist()))
+    at_risk = 0
+    for course, student in zip(
+        arrays.enrollment_course.tolist(), arrays.enrollment_student.tolist()
+    ):
+        held = attended = longest = current = 0
+        for session in sessions_by_course[course]:
+            scanned = (session, student) in present
+            if not scanned and not closed[session]:
+                continue
+            held += 1
+            attended += scanned
+            current = 0 if scanned else current + 1
+            longest = max(longest, current)
+        at_risk += held > 0 and attended * 100 / held < threshold
+    return at_risk
+
+
+def main(courses: int, students: int, sessions: int):
+    arrays = synthetic_arrays(courses, students, sessions)
+    rows = courses * students * sessions
+    print(f"{rows:,} rows, {len(arrays.presence_session):,} presences")
+
+    started = time.perf_counter()
+    risk = compute_attendance_risk(arrays, 75)
+    vectorized = time.perf_counter() - started
+    print(f"{'  vectorized (NumPy)':<28} {vectorized:8.3f} s  {int(risk.at_risk.sum()):,} at risk")
+
+    started = time.perf_counter()
+    at_risk = python_loop(arrays, 75)
+    looped = time.perf_counter() - started
+    print(f"{'  per-enrollment Python loop':<28} {looped:8.3f} s  {at_risk:,} at risk")
+    print(f"  speed-up: {looped / vectorized:.1f}x")
+
+
+if __name__ == "__main__":
+    args = [int(arg) for arg in sys.argv[1:4]]
+    main(*(args + [50, 500, 40][len(args) :]))
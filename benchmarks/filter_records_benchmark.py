@@ -0,0 +1,95 @@
+"""
+Compare the per-call select() that filter_records used to build with the
+cached lookup statements in utils.
+
+    python -m benchmarks.filter_records_benchmark [iterations]
+
+Runs against an in-memory SQLite database, so the numbers isolate Python-side
+statement building, cache-key generation and compilation from network time.
+"""
+import asyncio
+import sys
+import time
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.future import select
+from sqlmodel import SQLModel
+from models import Student
+from utils import _lookup, _record_statement, filter_records, record_exists
+
+
+async def uncached_filter_records(model, db: AsyncSession, **filters):
+    # filter_records as it was: a new statement on every call.
+    result = await db.execute(select(model).filter_by(**filters))
+    return result.scalars().first()
+
+
+def time_per_call(label, iterations, function):
+    started = time.perf_counter()
+    for _ in range(iterations):
+        function()
+    elapsed = time.perf_counter() - started
+    print(f"{label:<40} {elapsed / iterations * 1e6:8.1f} us/call")
+
+
+async def time_per_lookup(label, iterations, lookup):
+    started = time.perf_counter()
+    for _ in range(iterations):
+        await lookup()
+    elapsed = time.perf_counter() - started
+    print(f"{label:<40} {elapsed / iterations * 1e6:8.1f} us/call")
+
+
+async def main(iterations: int):
+    engine = create_async_engine("sqlite+aiosqlite://")
+    async with engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all)
+
+    async with AsyncSession(engine, expire_on_commit=False) as db:
+        db.add(
+            Student(
+                matric_number="BENCH001",
+                student_fullname="Bench Student",
+                student_email="bench@example.com",
+                student_password="x",
+            )
+        )
+        await db.commit()
+
+        print("Statement preparation (build + cache key):")
+        time_per_call(
+            "  select().filter_by() per call",
+            iterations,
+            lambda: select(Student)
+            .filter_by(matric_number="BENCH001")
+            ._generate_cache_key(),
+        )
+        time_per_call(
+            "  cached lookup statement",
+            iterations,
+            lambda: _lookup(
+                _record_statement, Student, {"matric_number": "BENCH001"}
+            )._generate_cache_key(),
+        )
+
+        print("Lookups against in-memory SQLite:")
+        await time_per_lookup(
+            "  uncached filter_records",
+            iterations,
+            lambda: uncached_filter_records(Student, db, matric_number="BENCH001"),
+        )
+        await time_per_lookup(
+            "  cached filter_records",
+            iterations,
+            lambda: filter_records(Student, db, matric_number="BENCH001"),
+        )
+        await time_per_lookup(
+            "  record_exists",
+            iterations,
+            lambda: record_exists(Student, db, matric_number="BENCH001"),
+        )
+
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 5000))
@@ -1,3 +1,5 @@
+from typing import Dict, List
+from pydantic import Field, field_validator
 from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
@@ -7,6 +9,113 @@ class Settings(BaseSettings):
     ACCESS_TOKEN_EXPIRE_MINUTES: int
     BASE_URL : str
 
+    # Signed QR tokens: the active key id, and retired key ids mapped to the
+    # secret they were derived from so tokens issued before a rotation still verify.
+    # Ranges match the token fields: one byte for the key id, two for the ttl.
+    QR_TOKEN_KEY_ID: int = Field(1, ge=0, le=255)
+    QR_TOKEN_RETIRED_KEYS: Dict[int, str] = {}
+    QR_TOKEN_TTL_MINUTES: int = Field(10, gt=0, le=65535 // 60)
+    # Rotating QR codes: seconds per code (0 keeps codes static, one byte in
+    # the token) and code length. Each code keeps the period it was issued with.
+    QR_ROTATION_PERIOD_SECONDS: int = Field(0, ge=0, le=255)
+    QR_ROTATION_DIGITS: int = 8
+    # Prefix for compact QR payloads; defaults to the upper-cased BASE_URL plus
+    # "/Q/" so the whole symbol stays in QR alphanumeric mode.
+    QR_COMPACT_PREFIX: str = ""
+    # Server-rendered QR images: entries kept in the LRU cache and pixels per module.
+    QR_IMAGE_CACHE_SIZE: int = 512
+    QR_IMAGE_SCALE: int = 10
+    # Write an "Absent" row per missing student when a session closes. Off by
+    # default: absence is derived from sessions x enrollment at read time.
+    ATTENDANCE_STORE_ABSENCES: bool = False
+    # Seconds between sweeps that close sessions whose scan window has passed.
+    SESSION_SWEEP_INTERVAL_SECONDS: int = 60
+    # Semester archival: the semester still being taught (never archived) and
+    # the directory that holds archived semesters as compressed row files.
+    CURRENT_SEMESTER: str = ""
+    ATTENDANCE_ARCHIVE_DIR: str = "archive"
+    # Log every SQL statement, on every engine (primary, replica and each
+    # bulkhead's pools).
+    DB_ECHO: bool = False
+    # Read replica for GET routes (empty reads from the primary). A caller's
+    # reads stay on the primary for a window after their own writes, and all
+    # reads fall back while the replica lags or fails its periodic check.
+    READ_DATABASE_URL: str = ""
+    READ_YOUR_WRITES_SECONDS: float = 5
+    REPLICA_MAX_LAG_SECONDS: float = 5
+    REPLICA_CHECK_INTERVAL_SECONDS: float = 5
+    # Bulkheads: concurrent requests (and pooled connections) per route class.
+    # Requests beyond a class's limit get a 503 with this Retry-After. "auth"
+    # serves the token user lookup of every route, so it never takes a slot
+    # from the route's own class.
+    BULKHEAD_LIMITS: Dict[str, int] = {
+        "critical": 20,
+        "interactive": 10,
+        "reports": 3,
+        "auth": 10,
+    }
+    BULKHEAD_RETRY_AFTER_SECONDS: int = 2
+    # Live attendance feed: events buffered per connection before it is
+    # resynced with a fresh roster, and how long one send may block.
+    FEED_QUEUE_SIZE: int = 100
+    FEED_SEND_TIMEOUT_SECONDS: float = 10
+    # Token required in X-Metrics-Token by the /metrics endpoints (empty: disabled).
+    METRICS_TOKEN: str = ""
+    # Rows validated and inserted per statement batch by bulk CSV imports.
+    BULK_BATCH_SIZE: int = 1000
+    # Processes hashing passwords during bulk student imports (0: one per core),
+    # and the emails of the lecturers allowed to run imports (empty: nobody).
+    IMPORT_HASH_WORKERS: int = 0
+    STUDENT_IMPORT_LECTURER_EMAILS: List[str] = []
+    # Per-request profiling. Disabled, the middleware is not installed at all.
+    # Enabled, it profiles a sampled share of requests and any request with a
+    # valid X-Profile-Token, writing folded stacks to PROFILE_DIR and keeping
+    # the newest PROFILE_MAX_FILES files.
+    PROFILE_ENABLED: bool = False
+    PROFILE_SAMPLE_RATE: float = 0.0
+    PROFILE_INTERVAL_SECONDS: float = 0.005
+    PROFILE_TRACEMALLOC: bool = False
+    PROFILE_DIR: str = "profiles"
+    PROFILE_MAX_FILES: int = 100
+    # Event loop lag: how often the loop is probed (0 disables the monitor) and
+    # how long a stall lasts before the blocking stack is captured and logged.
+    LOOP_MONITOR_INTERVAL_SECONDS: float = 0.05
+    LOOP_BLOCKING_THRESHOLD_SECONDS: float = 0.1
+    # Load shedding: while the smoothed lag exceeds this (0 disables), the
+    # listed route classes are rejected with a 503 so scans keep their share.
+    LOOP_LAG_SHED_SECONDS: float = 0
+    LOOP_LAG_SHED_CLASSES: List[str] = ["interactive", "reports"]
+    # Request tracing: per-phase timings in the Server-Timing header of requests
+    # carrying a valid X-Metrics-Token or X-Profile-Token, and with TRACE_FILE
+    # set, every trace appended to it in Chrome trace event format.
+    TRACING_ENABLED: bool = False
+    TRACE_FILE: str = ""
+    # Attendance percentage below which the at-risk report flags a student.
+    ATTENDANCE_AT_RISK_THRESHOLD: float = 75
+    # Proxy-scan detection: PROXY_CLUSTER_SIZE students scanning from the same
+    # or adjacent rounded coordinates within PROXY_WINDOW_SECONDS, or one device
+    # marking two students in a session, are flagged. Indoor phones often share
+    # one Wi-Fi derived fix, so a queue at the lecture hall door can form a
+    # small cluster honestly; coordinate flags are leads for review, and large
+    # halls may need a higher PROXY_CLUSTER_SIZE. State is kept for the newest
+    # PROXY_MAX_SESSIONS open sessions of each worker.
+    PROXY_DETECTION_ENABLED: bool = True
+    PROXY_WINDOW_SECONDS: float = 10
+    PROXY_CLUSTER_SIZE: int = 6
+    PROXY_COORDINATE_DECIMALS: int = 5
+    PROXY_MAX_SESSIONS: int = 256
+
+    @field_validator("BULKHEAD_LIMITS")
+    @classmethod
+    def check_bulkhead_classes(cls, limits: Dict[str, int]) -> Dict[str, int]:
+        # Every route class is looked up by name; a partial override would fail per request.
+        expected = {"critical", "interactive", "reports", "auth"}
+        if set(limits) != expected:
+            raise ValueError(f"BULKHEAD_LIMITS must set exactly {sorted(expected)}")
+        if any(limit < 1 for limit in limits.values()):
+            raise ValueError("BULKHEAD_LIMITS must all be at least 1")
+        return limits
+
     class Config:
         env_file = ".env"
 
@@ -1,21 +1,332 @@
 #### app/database.py
+import asyncio
+import logging
+import time
+from contextlib import AsyncExitStack, asynccontextmanager
+from typing import Dict, Set
+from fastapi import Request
+from jose import jwt, JWTError
 from sqlmodel import SQLModel
+from sqlalchemy import event, text
+from sqlalchemy.exc import DBAPIError, InterfaceError, OperationalError
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
 from config import settings
+from errors.capacity_errors import BulkheadFullError, LoopOverloadedError
+from migrations import apply_migrations
+from util.loop_monitor_utils import loop_monitor
+from util.tracing_utils import span
+
+logger = logging.getLogger(__name__)
 
 DATABASE_URL = settings.DATABASE_URL
-engine = create_async_engine(DATABASE_URL, echo=True)
+engine = create_async_engine(DATABASE_URL, echo=settings.DB_ECHO)
+
+
+class PrimarySession(Session):
+    """Sessions on the primary; their commits open read-your-writes windows."""
+
+
+class ReplicaSession(Session):
+    """Read-only sessions on the replica; see _fail_over_to_primary."""
+
+
+# Background work (startup migrations, the session sweeper, CLI jobs)
+async_session = sessionmaker(
+    engine,
+    class_=AsyncSession,
+    sync_session_class=PrimarySession,
+    expire_on_commit=False,
+)
+
+# Read replica; without READ_DATABASE_URL every read stays on the primary.
+read_engine = (
+    create_async_engine(settings.READ_DATABASE_URL, echo=settings.DB_ECHO)
+    if settings.READ_DATABASE_URL
+    else engine
+)
+
+
+class Bulkhead:
+    """
+    A class of routes with its own connection pools sized to its concurrency
+    limit, so one class cannot take connections reserved for another.
+    Requests over the limit are rejected at once instead of queuing.
+    """
+
+    def __init__(self, name: str, limit: int):
+        self.name = name
+        self.limit = limit
+        pool_args = {"pool_size": limit, "max_overflow": 0}
+        self.engine = create_async_engine(DATABASE_URL, echo=settings.DB_ECHO, **pool_args)
+        self.session = sessionmaker(
+            self.engine,
+            class_=AsyncSession,
+            sync_session_class=PrimarySession,
+            expire_on_commit=False,
+        )
+        self.read_engine = (
+            create_async_engine(settings.READ_DATABASE_URL, echo=settings.DB_ECHO, **pool_args)
+            if settings.READ_DATABASE_URL
+            else self.engine
+        )
+        self.read_session = sessionmaker(
+            self.read_engine,
+            class_=AsyncSession,
+            sync_session_class=ReplicaSession,
+            expire_on_commit=False,
+        )
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.shed = 0
+
+    @asynccontextmanager
+    async def admit(self):
+        if self.name in settings.LOOP_LAG_SHED_CLASSES and loop_monitor.overloaded:
+            self.shed += 1
+            raise LoopOverloadedError(self.name, settings.BULKHEAD_RETRY_AFTER_SECONDS)
+        if self.in_flight >= self.limit:
+            self.rejected += 1
+            raise BulkheadFullError(self.name, settings.BULKHEAD_RETRY_AFTER_SECONDS)
+        self.in_flight += 1
+        self.admitted += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+
+    def metrics(self) -> Dict[str, int]:
+        metrics = {
+            "limit": self.limit,
+            "in_flight": self.in_flight,
+            "peak_in_flight": self.peak_in_flight,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "shed": self.shed,
+            "connections_checked_out": self.engine.pool.checkedout(),
+        }
+        if self.read_engine is not self.engine:
+            metrics["replica_connections_checked_out"] = (
+                self.read_engine.pool.checkedout()
+            )
+        return metrics
+
+    async def dispose(self):
+        await self.engine.dispose()
+        if self.read_engine is not self.engine:
+            await self.read_engine.dispose()
+
+
+# Critical: scans. Interactive: everything else a user clicks. Reports: heavy
+# semester-wide reads. Auth: the token user lookup of every route.
+bulkheads = {
+    name: Bulkhead(name, limit) for name, limit in settings.BULKHEAD_LIMITS.items()
+}
+
+
+class ReplicaRouter:
+    """
+    Decides whether a read may go to the replica. A principal's reads stay on
+    the primary for READ_YOUR_WRITES_SECONDS after they commit, and all reads
+    fall back to the primary while the replica is unreachable or lagging.
+    Write windows are tracked per worker process.
+    """
+
+    def __init__(self):
+        self.last_writes: Dict[str, float] = {}
+        self.replica_healthy = True
+        self.checked_at = float("-inf")
+        self._lock = asyncio.Lock()
+
+    def record_write(self, principals: Set[str]):
+        now = time.monotonic()
+        if len(self.last_writes) > 10000:
+            self.last_writes = {
+                principal: written_at
+                for principal, written_at in self.last_writes.items()
+                if now - written_at < settings.READ_YOUR_WRITES_SECONDS
+            }
+        for principal in principals:
+            self.last_writes[principal] = now
+
+    def recently_wrote(self, principals: Set[str]) -> bool:
+        now = time.monotonic()
+        return any(
+            now - self.last_writes.get(principal, float("-inf"))
+            < settings.READ_YOUR_WRITES_SECONDS
+            for principal in principals
+        )
+
+    async def replica_available(self) -> bool:
+        if not settings.READ_DATABASE_URL:
+            return False
+        if time.monotonic() - self.checked_at >= settings.REPLICA_CHECK_INTERVAL_SECONDS:
+            async with self._lock:
+                if (
+                    time.monotonic() - self.checked_at
+                    >= settings.REPLICA_CHECK_INTERVAL_SECONDS
+                ):
+                    self.replica_healthy = await self._probe_replica()
+                    self.checked_at = time.monotonic()
+        return self.replica_healthy
+
+    def mark_unavailable(self, exc: Exception):
+        # Read from the primary until the next periodic check.
+        logger.warning("Read replica failed, reading from primary: %r", exc)
+        self.replica_healthy = False
+        self.checked_at = time.monotonic()
+
+    async def _probe_replica(self) -> bool:
+        try:
+            async with read_engine.connect() as conn:
+                if conn.dialect.name == "postgresql":
+                    # Replay lag; zero when caught up or when not a standby.
+                    lag = await conn.scalar(
+                        text(
+                            "SELECT COALESCE(CASE WHEN pg_last_wal_receive_lsn() "
+                            "= pg_last_wal_replay_lsn() THEN 0 ELSE EXTRACT(EPOCH "
+                            "FROM now() - pg_last_xact_replay_timestamp()) END, 0)"
+                        )
+                    )
+                else:
+                    await conn.execute(text("SELECT 1"))
+                    lag = 0
+        except Exception as exc:
+            logger.warning("Read replica unavailable, reading from primary: %r", exc)
+            return False
+        return lag <= settings.REPLICA_MAX_LAG_SECONDS
+
+
+replica_router = ReplicaRouter()
+
+
+CLIENT_NONCE_MAX_LENGTH = 64
+
+
+@event.listens_for(ReplicaSession, "do_orm_execute")
+def _fail_over_to_primary(orm_execute_state):
+    """
+    When the replica fails mid-request, move the session to the primary and
+    retry the statement, so the request still completes, and stop using the
+    replica until the router's next check.
+    """
+    session = orm_execute_state.session
+    primary_bind = session.info.get("primary_bind")
+    if primary_bind is None:
+        return None
+    try:
+        return orm_execute_state.invoke_statement()
+    except DBAPIError as exc:
+        if not (
+            exc.connection_invalidated
+            or isinstance(exc, (OperationalError, InterfaceError))
+        ):
+            raise
+        replica_router.mark_unavailable(exc)
+        del session.info["primary_bind"]
+        # Nothing was written on the replica, so only reads are lost.
+        session.rollback()
+        session.bind = primary_bind
+        return orm_execute_state.invoke_statement(bind_arguments={"bind": primary_bind})
+
+
+@event.listens_for(PrimarySession, "after_commit")
+def _open_read_your_writes_window(session):
+    principals = session.info.get("principals")
+    if principals:
+        replica_router.record_write(principals)
+
+
+def request_principals(request: Request) -> Set[str]:
+    """
+    Identify who is making a request: the token subject when there is one.
+    Unauthenticated writes (signup, enrollment) open a window only for a
+    client that sends its own nonce, in the X-Client-Nonce header or the
+    client_nonce cookie. Client addresses are not used: a campus behind one
+    NAT would share a single window and pin everyone's reads to the primary.
+    """
+    principals = set()
+    nonce = request.headers.get("x-client-nonce") or request.cookies.get("client_nonce")
+    if nonce and len(nonce) <= CLIENT_NONCE_MAX_LENGTH:
+        principals.add(f"client:{nonce}")
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    if scheme.lower() == "bearer" and token:
+        try:
+            payload = jwt.decode(
+                token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM]
+            )
+            if payload.get("sub"):
+                principals.add(f"sub:{payload['sub']}")
+        except JWTError:
+            pass
+    return principals
 
-async_session = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
 
 # Function to initialize the database
 async def init_db():
     async with engine.begin() as conn:
         #await conn.run_sync(SQLModel.metadata.drop_all)
-        await conn.run_sync(SQLModel.metadata.create_all)
+        await conn.run_sync(apply_migrations)
+
+async def dispose_engines():
+    await engine.dispose()
+    if read_engine is not engine:
+        await read_engine.dispose()
+    for bulkhead in bulkheads.values():
+        await bulkhead.dispose()
+
+
+@asynccontextmanager
+async def bulkhead_session(
+    route_class: str, principals=None, read_only=False, span_name="open_session"
+):
+    """
+    Admit a unit of work to its route class and open a session from that
+    class's pools; read-only work goes to the replica when it may.
+    """
+    bulkhead = bulkheads[route_class]
+    async with AsyncExitStack() as stack:
+        # The span covers admission and routing, not the session's lifetime.
+        with span(span_name, "dependency", route_class=route_class):
+            await stack.enter_async_context(bulkhead.admit())
+            factory = bulkhead.session
+            if read_only and not replica_router.recently_wrote(principals or set()):
+                if await replica_router.replica_available():
+                    factory = bulkhead.read_session
+            session = await stack.enter_async_context(factory())
+        session.info["principals"] = principals
+        if factory is bulkhead.read_session and bulkhead.read_engine is not bulkhead.engine:
+            session.info["primary_bind"] = bulkhead.engine.sync_engine
+        yield session
+
+
+def primary_db(route_class: str, name: str):
+    # Dependency to get a database session for a route class
+    async def get_session(request: Request):
+        async with bulkhead_session(
+            route_class, request_principals(request), span_name=name
+        ) as session:
+            yield session  # Provides the session for a single request
+
+    return get_session
+
+
+def replica_db(route_class: str, name: str):
+    # Dependency for read-only routes: the replica unless the caller needs the primary
+    async def get_session(request: Request):
+        async with bulkhead_session(
+            route_class, request_principals(request), read_only=True, span_name=name
+        ) as session:
+            yield session
+
+    return get_session
+
 
-# Dependency to get the database session
-async def get_db():
-    async with async_session() as session:
-        yield session  # Provides the session for a single request
+get_critical_db = primary_db("critical", "get_critical_db")
+get_db = primary_db("interactive", "get_db")
+get_read_db = replica_db("interactive", "get_read_db")
+get_report_db = replica_db("reports", "get_report_db")
+get_bulk_db = primary_db("reports", "get_bulk_db")
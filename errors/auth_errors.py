@@ -27,3 +27,7 @@ class StudentNotFoundError(CustomAuthError):
 class PasswordError(CustomAuthError):
     def __init__(self):
         super().__init__(401, "Incorrect password.")
+
+class MetricsAccessError(CustomAuthError):
+    def __init__(self):
+        super().__init__(403, "A valid metrics token is required.")
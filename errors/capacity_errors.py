@@ -0,0 +1,24 @@
+from fastapi import HTTPException
+
+
+class CustomCapacityError(HTTPException):
+    def __init__(self, status_code, detail=None, headers=None):
+        super().__init__(status_code, detail, headers)
+
+
+class BulkheadFullError(CustomCapacityError):
+    def __init__(self, route_class: str, retry_after: int):
+        super().__init__(
+            503,
+            f"Too many {route_class} requests in progress; please retry shortly.",
+            {"Retry-After": str(retry_after)},
+        )
+
+
+class LoopOverloadedError(CustomCapacityError):
+    def __init__(self, route_class: str, retry_after: int):
+        super().__init__(
+            503,
+            f"The server is overloaded; {route_class} requests are paused, please retry shortly.",
+            {"Retry-After": str(retry_after)},
+        )
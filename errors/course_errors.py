@@ -19,6 +19,12 @@ class UnauthorizedLecturerCourseError(CustomCourseError):
             403, "You are not authorized to perform this action for this course."
         )
 
+class UnauthorizedDepartmentError(CustomCourseError):
+    def __init__(self):
+        super().__init__(
+            403, "You are not authorized to view courses outside your department."
+        )
+
 class LecturerNotLoggedInError(CustomCourseError):
     def __init__(self):
         super().__init__(403, "You must be logged in as a lecturer.")
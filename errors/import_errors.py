@@ -0,0 +1,18 @@
+from fastapi import HTTPException
+
+
+class CustomImportError(HTTPException):
+    def __init__(self, status_code, detail=None):
+        super().__init__(status_code, detail)
+
+
+class MissingCSVColumnsError(CustomImportError):
+    def __init__(self, missing_columns):
+        super().__init__(
+            400, f"CSV is missing required columns: {', '.join(sorted(missing_columns))}."
+        )
+
+
+class ImportNotAllowedError(CustomImportError):
+    def __init__(self):
+        super().__init__(403, "You are not authorized to import students.")
@@ -6,12 +6,6 @@ class CustomQRCodeError(HTTPException):
         super().__init__(status_code, detail)
 
 
-class HourlyQRCodeError(CustomQRCodeError):
-    def __init__(self):
-        super().__init__(
-            400, "QR Code already generated for this course within the past minutes."
-        )
-
 class QRCodeNotFoundError(CustomQRCodeError):
     def __init__(self):
         super().__init__(403, "QR code not found for this course")
@@ -23,3 +17,15 @@ class ExpiredQRCodeError(CustomQRCodeError):
             403,
             "QR code has expired; you have been marked as absent for this session",
         )
+
+
+class InvalidQRTokenError(CustomQRCodeError):
+    def __init__(self):
+        super().__init__(403, "QR code is invalid or has been tampered with.")
+
+
+class StaleQRCodeError(CustomQRCodeError):
+    def __init__(self):
+        super().__init__(
+            403, "QR code has rotated; scan the code currently on display."
+        )
@@ -1,13 +1,35 @@
-from fastapi import FastAPI, APIRouter
+import asyncio
+import logging
+from fastapi import FastAPI, APIRouter, Depends
 from fastapi.middleware.cors import CORSMiddleware
-from database import init_db, engine
+from database import init_db, dispose_engines, async_session, bulkheads
 from routes import student, lecturer
 from contextlib import asynccontextmanager
+from config import settings
+from middleware import IdentityCacheMiddleware, ProfilingMiddleware, TracingMiddleware
+from utils import identity_cache_totals
+from util.attendance_utils import close_expired_sessions
+from util.loop_monitor_utils import loop_monitor
+from util.student_import_utils import shutdown_hash_pool
+from util.auth_utils import verify_metrics_token
+
+logger = logging.getLogger(__name__)
 
 
 async def close_db_connections():
     """Closes all database connections gracefully."""
-    await engine.dispose()
+    await dispose_engines()
+
+
+async def sweep_expired_sessions():
+    """Periodically closes sessions whose scan window has passed."""
+    while True:
+        try:
+            async with async_session() as db:
+                await close_expired_sessions(db)
+        except Exception:
+            logger.exception("Session sweep failed")
+        await asyncio.sleep(settings.SESSION_SWEEP_INTERVAL_SECONDS)
 
 
 @asynccontextmanager
@@ -15,11 +37,16 @@ async def lifespan(app: FastAPI):
     # Startup logic
     await init_db()
     print("Application startup: Database initialized")
+    sweeper = asyncio.create_task(sweep_expired_sessions())
+    loop_monitor.start()
 
     try:
         yield
     finally:
         # Shutdown logic
+        sweeper.cancel()
+        loop_monitor.stop()
+        await shutdown_hash_pool()
         await close_db_connections()
         print("Application shutdown: Database connections closed")
 
@@ -33,8 +60,20 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],  # Allows all HTTP methods (GET, POST, PUT, DELETE, OPTIONS, etc.)
     allow_headers=["*"],  # Allows all headers
+    expose_headers=["X-Identity-Cache", "X-Profile", "Server-Timing"],
 )
 
+# Request-scoped cache of rows already loaded by primary or unique key
+app.add_middleware(IdentityCacheMiddleware)
+
+# Opt-in request profiling; nothing is installed unless it is enabled
+if settings.PROFILE_ENABLED:
+    app.add_middleware(ProfilingMiddleware)
+
+# Per-phase request timings in Server-Timing for operators, optionally exported as traces
+if settings.TRACING_ENABLED:
+    app.add_middleware(TracingMiddleware)
+
 # Define the router
 router = APIRouter()
 
@@ -42,6 +81,21 @@ router = APIRouter()
 async def home():
     return {"message": "Welcome to the Attendance Management System API"}
 
+@router.get("/metrics/bulkheads", dependencies=[Depends(verify_metrics_token)])
+async def bulkhead_metrics():
+    """Occupancy and rejections of each route class."""
+    return {name: bulkhead.metrics() for name, bulkhead in bulkheads.items()}
+
+@router.get("/metrics/loop_lag", dependencies=[Depends(verify_metrics_token)])
+async def loop_lag_metrics():
+    """Event loop lag percentiles (seconds) and the stacks of recent stalls."""
+    return loop_monitor.metrics()
+
+@router.get("/metrics/identity_cache", dependencies=[Depends(verify_metrics_token)])
+async def identity_cache_metrics():
+    """Lookups answered from the request identity cache since startup."""
+    return identity_cache_totals
+
 # Include the router in the FastAPI app
 app.include_router(router)
 app.include_router(lecturer.router, tags=["Lecturer"], prefix="/lecturer")
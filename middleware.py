@@ -0,0 +1,144 @@
+#### app/middleware.py
+import asyncio
+import random
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from config import settings
+from util.auth_utils import metrics_token_matches
+from util.tracing_utils import Trace, current_trace, export_trace
+from util.profiling_utils import (
+    RequestProfile,
+    profile_name,
+    save_profile,
+    verify_profile_token,
+)
+from utils import RequestIdentityCache, current_identity_cache, identity_cache_totals
+
+
+class IdentityCacheMiddleware:
+    """
+    Give every HTTP request its own identity cache and report what it saved
+    in the X-Identity-Cache response header.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        cache = RequestIdentityCache()
+        token = current_identity_cache.set(cache)
+
+        async def send_with_counters(message: Message):
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                headers.append(
+                    "X-Identity-Cache", f"hits={cache.hits}, misses={cache.misses}"
+                )
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_counters)
+        finally:
+            current_identity_cache.reset(token)
+            identity_cache_totals["requests"] += 1
+            identity_cache_totals["hits"] += cache.hits
+            identity_cache_totals["misses"] += cache.misses
+
+
+class ProfilingMiddleware:
+    """
+    Profile sampled requests and requests carrying a valid X-Profile-Token.
+    One request is profiled at a time; the profile name is returned in the
+    X-Profile response header. Only installed when PROFILE_ENABLED is set.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        self.active = False
+
+    def wants_profile(self, scope: Scope) -> bool:
+        if scope["type"] != "http" or self.active:
+            return False
+        if settings.PROFILE_SAMPLE_RATE and random.random() < settings.PROFILE_SAMPLE_RATE:
+            return True
+        for name, value in scope["headers"]:
+            if name == b"x-profile-token":
+                return verify_profile_token(value.decode("latin-1"))
+        return False
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if not self.wants_profile(scope):
+            await self.app(scope, receive, send)
+            return
+
+        self.active = True
+        profile = RequestProfile(profile_name(scope["method"], scope["path"]))
+
+        async def send_with_profile_name(message: Message):
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message).append("X-Profile", profile.name)
+            await send(message)
+
+        profile.start()
+        try:
+            await self.app(scope, receive, send_with_profile_name)
+        finally:
+            profile.stop()
+            self.active = False
+            try:
+                await asyncio.to_thread(save_profile, profile)
+            except OSError as exc:
+                print(f"Saving profile {profile.name} failed: {exc!r}")
+
+
+def wants_server_timing(scope: Scope) -> bool:
+    for name, value in scope["headers"]:
+        if name == b"x-metrics-token" and metrics_token_matches(
+            value.decode("latin-1")
+        ):
+            return True
+        if name == b"x-profile-token" and verify_profile_token(
+            value.decode("latin-1")
+        ):
+            return True
+    return False
+
+
+class TracingMiddleware:
+    """
+    Trace every HTTP request and append the trace to TRACE_FILE when one is
+    configured. The phases are reported in the Server-Timing header only to
+    operators, identified by a metrics or profile token, since they expose
+    internals and make timing probes easy.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        trace = Trace(f"{scope['method']} {scope['path']}")
+        token = current_trace.set(trace)
+        report_timing = wants_server_timing(scope)
+
+        async def send_with_timing(message: Message):
+            if message["type"] == "http.response.start" and report_timing:
+                MutableHeaders(scope=message).append("Server-Timing", trace.server_timing())
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            current_trace.reset(token)
+            if settings.TRACE_FILE:
+                try:
+                    await asyncio.to_thread(export_trace, trace, settings.TRACE_FILE)
+                except OSError as exc:
+                    print(f"Writing trace {trace.name} failed: {exc!r}")
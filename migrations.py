@@ -0,0 +1,381 @@
+#### app/migrations.py
+from bisect import bisect_right
+from collections import defaultdict
+from datetime import datetime, timedelta
+from sqlalchemy import bindparam, inspect, select, text
+from sqlmodel import SQLModel
+from config import settings
+from models import SchemaMigration, AttendanceSession, AttendanceRecords
+from util.attendance_summary_utils import rebuild_attendance_summaries
+from util.attendance_rollup_utils import rebuild_attendance_rollups
+from util.geohash_utils import encode_geohash
+
+# --------------------
+# Schema Migrations
+# --------------------
+# create_all only creates missing tables, so changes to existing tables are
+# listed here in order. A fresh database is created at the latest schema and
+# simply records every migration as applied; an existing one runs the pending
+# steps once. Each step receives a synchronous connection.
+
+
+def _column_names(conn, table):
+    return {column["name"] for column in inspect(conn).get_columns(table)}
+
+
+def add_attendance_session_key(conn):
+    """
+    Tie attendance records to their QR code session and make
+    (session_id, matric_number) unique so scans dedupe on insert.
+    """
+    if "session_id" not in _column_names(conn, "attendancerecords"):
+        conn.execute(text("ALTER TABLE attendancerecords ADD COLUMN session_id INTEGER"))
+    conn.execute(
+        text(
+            "CREATE UNIQUE INDEX IF NOT EXISTS uq_attendance_session_student "
+            "ON attendancerecords (session_id, matric_number)"
+        )
+    )
+
+
+def add_qrcode_hour_bucket(conn):
+    """
+    Key QR code sessions by (course, lecturer, hour) so generation is one upsert.
+    Existing rows keep a NULL bucket: older duplicates within an hour would
+    violate the key, and NULLs never conflict.
+    """
+    if "hour_bucket" not in _column_names(conn, "qrcode"):
+        conn.execute(text("ALTER TABLE qrcode ADD COLUMN hour_bucket TIMESTAMP"))
+    conn.execute(
+        text(
+            "CREATE UNIQUE INDEX IF NOT EXISTS uq_qrcode_course_lecturer_hour "
+            "ON qrcode (course_code, lecturer_id, hour_bucket)"
+        )
+    )
+
+
+def _assign_unlinked_records(conn):
+    """
+    Assign records without a session to the latest session of their course that
+    started at or before them. When several records of one student land in the
+    same session, a Present record wins and the rest stay unassigned.
+    """
+    sessions = AttendanceSession.__table__
+    records = AttendanceRecords.__table__
+
+    starts = defaultdict(list)
+    session_ids = defaultdict(list)
+    for session_id, course_code, started_at in conn.execute(
+        select(sessions.c.session_id, sessions.c.course_code, sessions.c.started_at)
+        .order_by(sessions.c.started_at)
+    ):
+        starts[course_code].append(started_at)
+        session_ids[course_code].append(session_id)
+
+    taken = set(
+        conn.execute(
+            select(records.c.session_id, records.c.matric_number).where(
+                records.c.session_id.is_not(None)
+            )
+        ).all()
+    )
+    unlinked = conn.execute(
+        select(
+            records.c.record_id,
+            records.c.matric_number,
+            records.c.course_code,
+            records.c.date,
+            records.c.status,
+        ).where(records.c.session_id.is_(None))
+    ).all()
+
+    assignments = []
+    for record in sorted(unlinked, key=lambda r: (r.status != "Present", r.date)):
+        position = bisect_right(starts[record.course_code], record.date)
+        if not position:
+            continue
+        key = (session_ids[record.course_code][position - 1], record.matric_number)
+        if key in taken:
+            continue
+        taken.add(key)
+        assignments.append({"rid": record.record_id, "sid": key[0]})
+
+    if assignments:
+        conn.execute(
+            records.update()
+            .where(records.c.record_id == bindparam("rid"))
+            .values(session_id=bindparam("sid")),
+            assignments,
+        )
+
+
+def add_attendance_sessions(conn):
+    """
+    Promote every QR code to an AttendanceSession and link attendance records
+    to sessions by key instead of by time window. Sessions reuse their QR
+    code's id, so session keys written since 0001 stay valid.
+    """
+    if "session_id" not in _column_names(conn, "qrcode"):
+        conn.execute(text("ALTER TABLE qrcode ADD COLUMN session_id INTEGER"))
+    conn.execute(
+        text(
+            "CREATE UNIQUE INDEX IF NOT EXISTS uq_qrcode_session "
+            "ON qrcode (session_id)"
+        )
+    )
+
+    conn.execute(
+        text(
+            "INSERT INTO attendancesession "
+            "(session_id, course_code, lecturer_id, started_at, hour_bucket, "
+            "latitude, longitude) "
+            "SELECT qr_code_id, course_code, lecturer_id, generation_time, "
+            "hour_bucket, latitude, longitude FROM qrcode WHERE session_id IS NULL"
+        )
+    )
+    conn.execute(text("UPDATE qrcode SET session_id = qr_code_id WHERE session_id IS NULL"))
+
+    # Keys pointing at deleted QR codes are re-derived like older records.
+    conn.execute(
+        text(
+            "UPDATE attendancerecords SET session_id = NULL "
+            "WHERE session_id NOT IN (SELECT session_id FROM attendancesession)"
+        )
+    )
+    _assign_unlinked_records(conn)
+
+    if conn.dialect.name == "postgresql":
+        conn.execute(
+            text(
+                "SELECT setval(pg_get_serial_sequence('attendancesession', 'session_id'), "
+                "COALESCE((SELECT MAX(session_id) FROM attendancesession), 0) + 1, false)"
+            )
+        )
+        conn.execute(
+            text(
+                "ALTER TABLE qrcode ADD CONSTRAINT fk_qrcode_session "
+                "FOREIGN KEY (session_id) REFERENCES attendancesession (session_id)"
+            )
+        )
+        conn.execute(
+            text(
+                "ALTER TABLE attendancerecords ADD CONSTRAINT fk_attendance_session "
+                "FOREIGN KEY (session_id) REFERENCES attendancesession (session_id)"
+            )
+        )
+
+
+def compact_absence_rows(conn) -> int:
+    """
+    Drop stored Absent rows; reads derive absence from sessions x enrollment.
+    Not a migration: turning ATTENDANCE_STORE_ABSENCES back on cannot bring
+    the rows back, so this only runs when asked for explicitly:
+
+        python -m migrations compact-absences
+
+    The freed space is only returned to the OS after a VACUUM (FULL on
+    PostgreSQL), which cannot run inside this transaction.
+    """
+    return conn.execute(
+        text("DELETE FROM attendancerecords WHERE status = 'Absent'")
+    ).rowcount
+
+
+def build_attendance_summaries(conn):
+    """
+    Close sessions whose scan window has passed, then populate the
+    per-student summaries from the existing sessions and records.
+    """
+    sessions = AttendanceSession.__table__
+    now = datetime.utcnow()
+    conn.execute(
+        sessions.update()
+        .where(
+            sessions.c.closed_at.is_(None),
+            sessions.c.started_at < now - timedelta(minutes=settings.QR_TOKEN_TTL_MINUTES),
+        )
+        .values(closed_at=now)
+    )
+    rebuild_attendance_summaries(conn)
+
+
+def add_session_semester(conn):
+    """
+    Stamp sessions with their course's semester and index (semester, course)
+    so current-semester reads and archival prune by semester.
+    """
+    if "semester" not in _column_names(conn, "attendancesession"):
+        conn.execute(text("ALTER TABLE attendancesession ADD COLUMN semester VARCHAR"))
+    conn.execute(
+        text(
+            "UPDATE attendancesession SET semester = (SELECT semester FROM course "
+            "WHERE course.course_code = attendancesession.course_code) "
+            "WHERE semester IS NULL"
+        )
+    )
+    conn.execute(
+        text(
+            "CREATE INDEX IF NOT EXISTS ix_attendancesession_semester_course "
+            "ON attendancesession (semester, course_code)"
+        )
+    )
+
+
+def index_lecturer_name(conn):
+    """
+    Enrollment identifies lecturers by name; index it instead of scanning.
+    """
+    conn.execute(
+        text(
+            "CREATE INDEX IF NOT EXISTS ix_lecturer_lecturer_name "
+            "ON lecturer (lecturer_name)"
+        )
+    )
+
+
+def build_attendance_rollups(conn):
+    """
+    Populate the department, semester and week rollups from the sessions
+    closed so far; from now on closing a session keeps them current.
+    """
+    rebuild_attendance_rollups(conn)
+
+
+COORDINATE_BATCH_SIZE = 5000
+
+
+def _parse_geo_location(value):
+    try:
+        latitude, longitude = (float(part) for part in value.split(","))
+    except (AttributeError, ValueError):
+        return None
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+        return None
+    return latitude, longitude
+
+
+def split_attendance_coordinates(conn):
+    """
+    Replace the "lat,lon" geo_location string of attendance records with
+    numeric latitude and longitude columns plus an indexed geohash. Records
+    are converted in batches of COORDINATE_BATCH_SIZE; unparseable strings
+    (absences store "") leave the new columns NULL.
+    """
+    columns = _column_names(conn, "attendancerecords")
+    for name, sql_type in (
+        ("latitude", "FLOAT"),
+        ("longitude", "FLOAT"),
+        ("geohash", "VARCHAR"),
+    ):
+        if name not in columns:
+            conn.execute(text(f"ALTER TABLE attendancerecords ADD COLUMN {name} {sql_type}"))
+
+    if "geo_location" in columns:
+        select_batch = text(
+            "SELECT record_id, geo_location FROM attendancerecords "
+            "WHERE record_id > :after AND geo_location <> '' "
+            "ORDER BY record_id LIMIT :size"
+        )
+        update_batch = text(
+            "UPDATE attendancerecords SET latitude = :latitude, "
+            "longitude = :longitude, geohash = :geohash WHERE record_id = :record_id"
+        )
+        after = 0
+        while True:
+            rows = conn.execute(
+                select_batch, {"after": after, "size": COORDINATE_BATCH_SIZE}
+            ).all()
+            if not rows:
+                break
+            after = rows[-1][0]
+            updates = []
+            for record_id, geo_location in rows:
+                point = _parse_geo_location(geo_location)
+                if point is not None:
+                    updates.append(
+                        {
+                            "record_id": record_id,
+                            "latitude": point[0],
+                            "longitude": point[1],
+                            "geohash": encode_geohash(*point),
+                        }
+                    )
+            if updates:
+                conn.execute(update_batch, updates)
+        conn.execute(text("ALTER TABLE attendancerecords DROP COLUMN geo_location"))
+
+    conn.execute(
+        text(
+            "CREATE INDEX IF NOT EXISTS ix_attendancerecords_geohash "
+            "ON attendancerecords (geohash)"
+        )
+    )
+
+
+def add_qrcode_rotation_period(conn):
+    """
+    Record the rotation period each QR code was issued with. Existing codes
+    were issued under the current setting, so they are stamped with it.
+    """
+    if "rotation_period" not in _column_names(conn, "qrcode"):
+        conn.execute(
+            text("ALTER TABLE qrcode ADD COLUMN rotation_period INTEGER NOT NULL DEFAULT 0")
+        )
+    conn.execute(
+        text("UPDATE qrcode SET rotation_period = :period"),
+        {"period": settings.QR_ROTATION_PERIOD_SECONDS},
+    )
+
+
+def add_session_voided_at(conn):
+    """
+    Let sessions whose QR code was deleted be marked void instead of counted.
+    """
+    if "voided_at" not in _column_names(conn, "attendancesession"):
+        conn.execute(text("ALTER TABLE attendancesession ADD COLUMN voided_at TIMESTAMP"))
+
+
+MIGRATIONS = [
+    ("0001_attendance_session_key", add_attendance_session_key),
+    ("0002_qrcode_hour_bucket", add_qrcode_hour_bucket),
+    ("0003_attendance_sessions", add_attendance_sessions),
+    # 0004 deleted Absent rows; that is now the opt-in compact-absences command.
+    ("0005_attendance_summaries", build_attendance_summaries),
+    ("0006_session_semester", add_session_semester),
+    ("0007_lecturer_name_index", index_lecturer_name),
+    ("0008_attendance_rollups", build_attendance_rollups),
+    ("0009_attendance_coordinates", split_attendance_coordinates),
+    ("0010_qrcode_rotation_period", add_qrcode_rotation_period),
+    ("0011_session_voided_at", add_session_voided_at),
+]
+
+
+def apply_migrations(conn):
+    fresh = not inspect(conn).get_table_names()
+    SQLModel.metadata.create_all(conn)
+
+    table = SchemaMigration.__table__
+    applied = set(conn.execute(table.select().with_only_columns(table.c.name)).scalars())
+    for name, migrate in MIGRATIONS:
+        if name in applied:
+            continue
+        if not fresh:
+            migrate(conn)
+        conn.execute(table.insert().values(name=name, applied_at=datetime.utcnow()))
+
+
+if __name__ == "__main__":
+    import asyncio
+    import sys
+    from database import engine
+
+    async def main():
+        if sys.argv[1:] != ["compact-absences"]:
+            sys.exit("usage: python -m migrations compact-absences")
+        if settings.ATTENDANCE_STORE_ABSENCES:
+            sys.exit("ATTENDANCE_STORE_ABSENCES is on, so Absent rows are still in use")
+        async with engine.begin() as conn:
+            deleted = await conn.run_sync(compact_absence_rows)
+        print(f"{deleted} Absent rows deleted; run VACUUM to return the space")
+
+    asyncio.run(main())
@@ -1,6 +1,7 @@
 from sqlmodel import SQLModel, Field, Relationship
+from sqlalchemy import Index, UniqueConstraint
 from typing import Optional, List, Optional
-from datetime import datetime
+from datetime import date, datetime
 
 
 # Student model
@@ -22,7 +23,7 @@ class Student(SQLModel, table=True):
 # lecturer model
 class Lecturer(SQLModel, table=True):
     lecturer_id: int = Field(primary_key=True, index=True)
-    lecturer_name: str
+    lecturer_name: str = Field(index=True)  # Enrollment looks lecturers up by name
     lecturer_email: str
     lecturer_department: str
     lecturer_password: str
@@ -62,15 +63,57 @@ class LecturerCourses(SQLModel, table=True):
     course: Optional[Course] = Relationship(back_populates="lecturer")
 
 
+# AttendanceSession model (one attendance-taking session of a course)
+class AttendanceSession(SQLModel, table=True):
+    __table_args__ = (
+        # At most one session per course and lecturer each hour.
+        UniqueConstraint(
+            "course_code",
+            "lecturer_id",
+            "hour_bucket",
+            name="uq_session_course_lecturer_hour",
+        ),
+        # Semester first: hot queries and archival prune by semester, then course.
+        Index("ix_attendancesession_semester_course", "semester", "course_code"),
+    )
+
+    session_id: int = Field(primary_key=True, index=True)
+    course_code: str = Field(foreign_key="course.course_code", index=True)
+    lecturer_id: int = Field(foreign_key="lecturer.lecturer_id")
+    semester: Optional[str] = None  # Course.semester when the session started
+    started_at: datetime
+    hour_bucket: Optional[datetime] = None  # started_at truncated to the hour
+    latitude: float
+    longitude: float
+    closed_at: Optional[datetime] = None
+    # Set when its QR code is deleted after scans; a void session counts nowhere.
+    voided_at: Optional[datetime] = None
+
+
 # QR Code model
 class QRCode(SQLModel, table=True):
+    __table_args__ = (
+        # At most one session per course and lecturer each hour.
+        UniqueConstraint(
+            "course_code",
+            "lecturer_id",
+            "hour_bucket",
+            name="uq_qrcode_course_lecturer_hour",
+        ),
+    )
+
     qr_code_id: int = Field(primary_key=True, index=True)
     course_code: str = Field(foreign_key="course.course_code")
     lecturer_id: int = Field(foreign_key="lecturer.lecturer_id")  # FK to lecturer
     generation_time: datetime
+    hour_bucket: Optional[datetime] = None  # generation_time truncated to the hour
+    session_id: Optional[int] = Field(
+        default=None, foreign_key="attendancesession.session_id", unique=True
+    )
     latitude: float
     longitude: float
     url: str
+    rotation_period: int = 0  # Seconds per rotating code when issued (0: static)
 
     # Relationships
     lecturer: Optional[Lecturer] = Relationship(back_populates="qr_codes")
@@ -93,13 +136,104 @@ class StudentCourses(SQLModel, table=True):
 
 # AttendanceRecords model
 class AttendanceRecords(SQLModel, table=True):
+    __table_args__ = (
+        # One record per student per session; lets the scan insert dedupe itself.
+        UniqueConstraint(
+            "session_id", "matric_number", name="uq_attendance_session_student"
+        ),
+    )
+
     record_id: int = Field(primary_key=True, index=True)
     matric_number: str = Field(foreign_key="student.matric_number")  # FK to Student
     course_code: str = Field(foreign_key="course.course_code")  # FK to Course
+    session_id: Optional[int] = Field(
+        default=None, foreign_key="attendancesession.session_id"
+    )  # FK to AttendanceSession
     date: datetime = Field(default=datetime.utcnow)  # Attendance date and time
-    geo_location: str
+    # Where the student scanned; absences have no fix. The geohash of the
+    # point is indexed for range lookups by area.
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+    geohash: Optional[str] = Field(default=None, index=True)
     status: str  # Attendance status ("Present" or "Absent")
 
     # Relationships
     student: Optional[Student] = Relationship(back_populates="attendance_records")
     course: Optional[Course] = Relationship(back_populates="attendance_records")
+
+
+# StudentAttendanceSummary model (per student and course attendance counters)
+class StudentAttendanceSummary(SQLModel, table=True):
+    matric_number: str = Field(foreign_key="student.matric_number", primary_key=True)
+    course_code: str = Field(foreign_key="course.course_code", primary_key=True)
+    attended_sessions: int = 0  # Sessions the student was present at
+    total_sessions: int = 0  # Closed sessions plus open ones already attended
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+
+# SessionAttendanceRollup model (one row per closed session, written on close).
+# No foreign key to the session: rollups outlive archived raw rows.
+class SessionAttendanceRollup(SQLModel, table=True):
+    __table_args__ = (
+        Index("ix_sessionattendancerollup_course_started", "course_code", "started_at"),
+    )
+
+    session_id: int = Field(primary_key=True)
+    course_code: str
+    lecturer_id: int
+    department: str  # Department of the lecturer who ran the session
+    semester: str  # "" when neither the session nor its course has one
+    week_start: date  # Monday of the session's calendar week
+    started_at: datetime
+    enrolled_students: int = 0  # Students expected when the session closed
+    present_students: int = 0
+
+
+# WeeklyAttendanceRollup model (per department, semester, week and course)
+class WeeklyAttendanceRollup(SQLModel, table=True):
+    department: str = Field(primary_key=True)
+    semester: str = Field(primary_key=True)
+    week_start: date = Field(primary_key=True)
+    course_code: str = Field(primary_key=True)
+    sessions: int = 0
+    expected_attendances: int = 0  # Sum of enrolled students over the sessions
+    present_attendances: int = 0
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+
+# ProxyScanFlag model (a suspicious group of scans found on the scan path)
+class ProxyScanFlag(SQLModel, table=True):
+    __table_args__ = (
+        # One flag per cluster: later scans joining it update the same row.
+        UniqueConstraint(
+            "session_id",
+            "reason",
+            "cluster_key",
+            "first_scan_at",
+            name="uq_proxyscanflag_cluster",
+        ),
+    )
+
+    flag_id: int = Field(primary_key=True)
+    session_id: int = Field(index=True)
+    course_code: str = Field(index=True)
+    reason: str  # "coordinate_cluster" or "shared_device"
+    cluster_key: str  # Rounded "lat,lon" of the cluster, or the device id
+    matric_numbers: str  # Comma-separated students in the cluster
+    first_scan_at: datetime  # Start of the cluster's run of scans
+    last_scan_at: datetime
+    flagged_at: datetime = Field(default_factory=datetime.utcnow)
+
+
+# ArchivedSemester model (semesters moved out of the hot tables to disk)
+class ArchivedSemester(SQLModel, table=True):
+    semester: str = Field(primary_key=True)
+    archived_at: datetime = Field(default_factory=datetime.utcnow)
+    session_count: int = 0  # Sessions archived so far, across all batches
+    record_count: int = 0  # Attendance records archived so far
+
+
+# SchemaMigration model (schema changes applied to an existing database)
+class SchemaMigration(SQLModel, table=True):
+    name: str = Field(primary_key=True)
+    applied_at: datetime = Field(default_factory=datetime.utcnow)
@@ -1,8 +1,15 @@
 #### app/routes/lecturer.py
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Header, Query, Request, Response, WebSocket
 from sqlalchemy.ext.asyncio import AsyncSession
-from database import get_db
+from database import (
+    get_db,
+    get_read_db,
+    get_critical_db,
+    get_report_db,
+    get_bulk_db,
+    request_principals,
+)
 from models import Lecturer
 from schemas import (
     LecturerCreate,
@@ -13,18 +20,39 @@ from schemas import (
     CourseResponse,
     QRCodeCreate,
     QRCodeResponse,
+    QRRotationResponse,
+    QRCodeFormatsResponse,
     CourseStats,
     LecturerCoursesListResponse,
     AttendanceResponse,
+    LecturerDashboardResponse,
+    AtRiskReportResponse,
+    DepartmentTrend,
+    CourseTrend,
+    SessionTrend,
+    ScanLocation,
+    ProxyScanFlagResponse,
+    BulkEnrollmentResponse,
 )
 from services.lecturer.auth_service import AuthService
 from services.lecturer.qrcode_service import QRCodeService
 from services.lecturer.lecturer_course_service import LecturerCourseService
+from services.lecturer.attendance_feed_service import AttendanceFeedService
+from services.lecturer.analytics_service import AttendanceAnalyticsService
+from services.lecturer.trends_service import AttendanceTrendService
+from services.lecturer.scan_location_service import ScanLocationService
+from services.lecturer.proxy_flag_service import ProxyScanFlagService
+from services.lecturer.dashboard_service import (
+    DASHBOARD_SECTIONS,
+    LecturerDashboardService,
+)
 from util.auth_utils import get_current_lecturer
+from util.qr_image_utils import etag_matches
 from services.lecturer_service import (
     get_attendance_service,
 )
-from typing import List
+from datetime import date
+from typing import List, Literal, Optional
 
 
 router = APIRouter()
@@ -32,7 +60,7 @@ router = APIRouter()
 
 # # **Lecturer Signup Route**
 @router.post("/signup")
-async def lecturer_signup(lecturer: LecturerCreate, db: AsyncSession = Depends(get_db)):
+async def lecturer_signup(lecturer: LecturerCreate, db: AsyncSession = Depends(get_critical_db)):
     response = await AuthService.register_lecturer(lecturer, db)
     return response
 
@@ -41,7 +69,7 @@ async def lecturer_signup(lecturer: LecturerCreate, db: AsyncSession = Depends(g
 @router.post("/login", response_model=LecturerToken)
 async def lecturer_login(
     lecturer: LecturerLogin,
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_critical_db),
 ) -> LecturerToken:
 
     result = await AuthService.login_lecturer(lecturer, db)
@@ -60,7 +88,7 @@ async def lecturer_login(
 # #**Lecturer Change Password Route**
 @router.put("/change-password", status_code=200)
 async def change_password(
-    data: ChangePassword, db: AsyncSession = Depends(get_db)
+    data: ChangePassword, db: AsyncSession = Depends(get_critical_db)
 ) -> dict[str, str]:
     return await AuthService.change_lecturer_password(data, db)
 
@@ -76,10 +104,26 @@ async def create_course(
         course, db, current_lecturer
     )
 
+# #**Bulk Enroll Students Route**
+@router.post("/enroll/bulk", response_model=BulkEnrollmentResponse)
+async def bulk_enroll_students(
+    request: Request,
+    db: AsyncSession = Depends(get_bulk_db),
+    current_lecturer: Lecturer = Depends(get_current_lecturer),
+):
+    """
+    Enroll a class from a CSV request body (text/csv) with matric_number,
+    course_code and lecturer_name columns. Only courses the lecturer teaches
+    are accepted.
+    """
+    return await LecturerCourseService.bulk_enroll_students(
+        request.stream(), db, current_lecturer
+    )
+
 # #**Lecturer Courses Info Route**
 @router.get("/course_info", response_model=List[CourseCreate])
 async def get_course_info(
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     current_lecturer: Lecturer = Depends(get_current_lecturer),
 ):
     # Call the service to get courses
@@ -89,16 +133,37 @@ async def get_course_info(
 #  #**Lecturer course statistics**
 @router.get("/course_stats", response_model=CourseStats)
 async def get_course_stats(
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     current_lecturer: Lecturer = Depends(get_current_lecturer),
 ):
     # Call on the service to get course stats
     courses_stats = await LecturerCourseService.get_courses_stats(db, current_lecturer)
     return courses_stats
 
+#  #**Lecturer dashboard**
+@router.get(
+    "/dashboard",
+    response_model=LecturerDashboardResponse,
+    response_model_exclude_none=True,
+)
+async def get_dashboard(
+    request: Request,
+    sections: List[Literal[DASHBOARD_SECTIONS]] = Query(
+        default=list(DASHBOARD_SECTIONS)
+    ),
+    current_lecturer: Lecturer = Depends(get_current_lecturer),
+):
+    """
+    Everything the lecturer home screen shows, in one request. Repeat the
+    `sections` query parameter to fetch only some of it.
+    """
+    return await LecturerDashboardService.get_dashboard(
+        current_lecturer, sections, request_principals(request)
+    )
+
 #  #**Lecturer course list**
 @router.get("/lecturer_courses", response_model=LecturerCoursesListResponse)
-async def fetch_lecturer_courses(db: AsyncSession = Depends(get_db)):
+async def fetch_lecturer_courses(db: AsyncSession = Depends(get_read_db)):
     """
     API route to fetch all lecturers and their registered course codes.
     """
@@ -109,7 +174,7 @@ async def fetch_lecturer_courses(db: AsyncSession = Depends(get_db)):
 #  #**Lecturer course register Students**
 @router.get("/lecturer_course_students")
 async def lecturer_course_students(
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     current_lecturer: Lecturer = Depends(get_current_lecturer),
 ):
     """
@@ -120,6 +185,104 @@ async def lecturer_course_students(
     )
 
 
+#  #**Students below the attendance threshold**
+@router.get("/at_risk_students", response_model=AtRiskReportResponse)
+async def at_risk_students(
+    course_code: Optional[str] = None,
+    page: int = Query(1, ge=1),
+    page_size: int = Query(50, ge=1, le=500),
+    db: AsyncSession = Depends(get_report_db),
+    current_lecturer: Lecturer = Depends(get_current_lecturer),
+):
+    """
+    Students whose attendance is below ATTENDANCE_AT_RISK_THRESHOLD in the
+    lecturer's courses, lowest first, with their absence streaks.
+    """
+    return await AttendanceAnalyticsService.get_at_risk_students(
+        db, current_lecturer, course_code, page, page_size
+    )
+
+#  #**Attendance trends, drilling down from department to course to session**
+@router.get("/trends/departments", response_model=List[DepartmentTrend])
+async def department_trends(
+    semester: Optional[str] = None,
+    week_from: Optional[date] = None,
+    week_to: Optional[date] = None,
+    db: AsyncSession = Depends(get_report_db),
+    current_lecturer: Lecturer = Depends(get_current_lecturer),
+):
+    return await AttendanceTrendService.get_department_trends(
+        db, current_lecturer, semester, week_from, week_to
+    )
+
+
+@router.get("/trends/departments/{department}/courses", response_model=List[CourseTrend])
+async def course_trends(
+    department: str,
+    semester: Optional[str] = None,
+    week_from: Optional[date] = None,
+    week_to: Optional[date] = None,
+    db: AsyncSession = Depends(get_report_db),
+    current_lecturer: Lecturer = Depends(get_current_lecturer),
+):
+    return await AttendanceTrendService.get_course_trends(
+        db, current_lecturer, department, semester, week_from, week_to
+    )
+
+
+@router.get("/trends/courses/{course_code}/sessions", response_model=List[SessionTrend])
+async def session_trends(
+    course_code: str,
+    semester: Optional[str] = None,
+    week_from: Optional[date] = None,
+    week_to: Optional[date] = None,
+    db: AsyncSession = Depends(get_report_db),
+    current_lecturer: Lecturer = Depends(get_current_lecturer),
+):
+    return await AttendanceTrendService.get_session_trends(
+        db, current_lecturer, course_code, semester, week_from, week_to
+    )
+
+#  #**Scans by location**
+@router.get("/scans/near", response_model=List[ScanLocation])
+async def scans_near(
+    latitude: float = Query(..., ge=-90, le=90),
+    longitude: float = Query(..., ge=-180, le=180),
+    radius_m: float = Query(50, gt=0, le=5000),
+    course_code: Optional[str] = None,
+    limit: int = Query(500, ge=1, le=5000),
+    db: AsyncSession = Depends(get_report_db),
+    current_lecturer: Lecturer = Depends(get_current_lecturer),
+):
+    """Scans in the lecturer's courses within radius_m of a point, nearest first."""
+    return await ScanLocationService.get_scans_near(
+        db, current_lecturer, latitude, longitude, radius_m, course_code, limit
+    )
+
+
+@router.get("/scans/far", response_model=List[ScanLocation])
+async def scans_far_from_session(
+    course_code: str,
+    min_distance_m: float = Query(15, gt=0),
+    limit: int = Query(500, ge=1, le=5000),
+    db: AsyncSession = Depends(get_report_db),
+    current_lecturer: Lecturer = Depends(get_current_lecturer),
+):
+    """Scans of a course made farther than min_distance_m from the session, farthest first."""
+    return await ScanLocationService.get_scans_far_from_session(
+        db, current_lecturer, course_code, min_distance_m, limit
+    )
+
+
+@router.get("/proxy_flags", response_model=List[ProxyScanFlagResponse])
+async def proxy_flags(
+    course_code: str,
+    db: AsyncSession = Depends(get_report_db),
+    current_lecturer: Lecturer = Depends(get_current_lecturer),
+):
+    """Scans the detector flagged as likely proxies: shared spots and shared devices."""
+    return await ProxyScanFlagService.get_proxy_flags(db, current_lecturer, course_code)
+
 # #**Lecturer QRCODE Creation Route**
 @router.post("/generate_qr_code", response_model=QRCodeResponse)
 async def generate_qr_code(
@@ -133,7 +296,7 @@ async def generate_qr_code(
 @router.get("/latest_qr_codes")
 async def get_lecturer_latest_qr_codes(
     current_lecturer: dict = Depends(get_current_lecturer),
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
 ):
     """
     Get the latest QR codes for all courses assigned to the currently logged-in lecturer.
@@ -149,6 +312,67 @@ async def get_lecturer_latest_qr_codes(
     return qr_codes
 
 
+@router.get("/qr_codes/{qr_code_id}/rotation", response_model=QRRotationResponse)
+async def get_qr_code_rotation(
+    qr_code_id: int,
+    db: AsyncSession = Depends(get_read_db),
+    current_lecturer: Lecturer = Depends(get_current_lecturer),
+):
+    """
+    Fetch the rotation seed once; the projector derives each rotating code locally.
+    """
+    return await QRCodeService.get_rotation_seed(qr_code_id, db, current_lecturer)
+
+
+@router.get("/qr_codes/{qr_code_id}/formats", response_model=QRCodeFormatsResponse)
+async def get_qr_code_formats(
+    qr_code_id: int,
+    db: AsyncSession = Depends(get_read_db),
+    current_lecturer: Lecturer = Depends(get_current_lecturer),
+):
+    """
+    Report the QR version and module count of each payload format for a session.
+    """
+    return await QRCodeService.get_qr_code_formats(qr_code_id, db, current_lecturer)
+
+
+@router.get("/qr_codes/{qr_code_id}/image.{image_format}")
+async def get_qr_code_image(
+    qr_code_id: int,
+    image_format: Literal["png", "svg"],
+    if_none_match: Optional[str] = Header(default=None),
+    db: AsyncSession = Depends(get_read_db),
+    current_lecturer: Lecturer = Depends(get_current_lecturer),
+):
+    """
+    Serve the server-rendered QR image. A session's image never changes, so it
+    is marked immutable and revalidated by its strong ETag.
+    """
+    image = await QRCodeService.get_qr_code_image(
+        qr_code_id, image_format, db, current_lecturer
+    )
+    headers = {
+        "ETag": image.etag,
+        "Cache-Control": "private, max-age=31536000, immutable",
+    }
+    if if_none_match and etag_matches(if_none_match, image.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=image.content, media_type=image.media_type, headers=headers)
+
+
+@router.websocket("/qr_codes/{qr_code_id}/live")
+async def live_attendance(
+    websocket: WebSocket, qr_code_id: int, token: Optional[str] = None
+):
+    """
+    Live roster of a QR session: a snapshot, then one event per accepted scan.
+    Browsers cannot set headers on WebSockets, so the token may be a query parameter.
+    """
+    if token is None:
+        scheme, _, token = websocket.headers.get("authorization", "").partition(" ")
+    await AttendanceFeedService.stream_session(websocket, qr_code_id, token)
+
+
 # Lecturer QR Code Deletion Route
 @router.delete("/delete_qr_code", status_code=204)
 async def delete_qr_code(
@@ -162,7 +386,7 @@ async def delete_qr_code(
 @router.get("/attendance/{course_code}", response_model=AttendanceResponse)
 async def get_attendance(
     course_code: str,
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_report_db),
     current_lecturer=Depends(get_current_lecturer),
 ):
     return await get_attendance_service(course_code, current_lecturer, db)
@@ -1,8 +1,8 @@
 # #### app/routes/student.py
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Request
 from sqlalchemy.ext.asyncio import AsyncSession
-from database import get_db
+from database import get_db, get_read_db, get_critical_db, get_bulk_db
 from typing import List
 from models import Student
 from schemas import (
@@ -13,9 +13,10 @@ from schemas import (
     AttendanceCreate,
     EnrollRequest,
     EnrollResponse,
+    StudentImportResponse,
     CourseDetails,
 )
-from util.auth_utils import get_current_student
+from util.auth_utils import get_current_student, get_current_lecturer
 from services.student.auth_service import AuthService
 from services.student.course_service import CourseService
 from services.student.attendance_service import AttendanceService
@@ -25,16 +26,30 @@ router = APIRouter()
 
 # **Student Signup Route**
 @router.post("/signup")
-async def student_signup(student: StudentCreate, db: AsyncSession = Depends(get_db)):
+async def student_signup(student: StudentCreate, db: AsyncSession = Depends(get_critical_db)):
     """
     API endpoint for student signup.
     """
     return await AuthService.student_signup(student, db)
 
 
+# **Bulk Student Import Route**
+@router.post("/import", response_model=StudentImportResponse)
+async def import_students(
+    request: Request,
+    db: AsyncSession = Depends(get_bulk_db),
+    current_lecturer=Depends(get_current_lecturer),
+):
+    """
+    API endpoint to register students from a CSV request body (text/csv) with
+    matric_number, student_fullname, student_email and student_password columns.
+    """
+    return await AuthService.import_students(request.stream(), db, current_lecturer)
+
+
 # **Student Login Route**
 @router.post("/login", response_model=StudentToken)
-async def student_login(student: StudentLogin, db: AsyncSession = Depends(get_db)):
+async def student_login(student: StudentLogin, db: AsyncSession = Depends(get_critical_db)):
     """
     API endpoint for student login.
     """
@@ -52,7 +67,7 @@ async def student_login(student: StudentLogin, db: AsyncSession = Depends(get_db
 
 # **Student Change Password Route**
 @router.put("/change-password", status_code=200)
-async def change_password(data: ChangePassword, db: AsyncSession = Depends(get_db)):
+async def change_password(data: ChangePassword, db: AsyncSession = Depends(get_critical_db)):
     """
     API endpoint to change the password for a student.
     """
@@ -74,7 +89,7 @@ async def enroll_student(
 # **Get Student's Enrolled Courses Route**
 @router.get("/student_courses", response_model=List[CourseDetails])
 async def get_student_courses(
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     current_student: Student = Depends(get_current_student),
 ):
     """
@@ -85,7 +100,7 @@ async def get_student_courses(
 
 @router.get("/course_stats")
 async def student_course_stats(
-    db: AsyncSession = Depends(get_db), current_student=Depends(get_current_student)
+    db: AsyncSession = Depends(get_read_db), current_student=Depends(get_current_student)
 ):
     return await CourseService.get_student_course_stats(db, current_student)
 
@@ -93,7 +108,7 @@ async def student_course_stats(
 @router.post("/scan-qr")
 async def scan_qr(
     attendance_data: AttendanceCreate,
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_critical_db),
     current_student: Student = Depends(get_current_student),
 ):
     """
@@ -104,7 +119,7 @@ async def scan_qr(
 
 @router.get("/attendance_details")
 async def attendance_details(
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     current_student: Student = Depends(get_current_student),
 ):
     """
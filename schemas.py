@@ -1,7 +1,7 @@
 # #### app/schemas.py
 
 from pydantic import BaseModel, EmailStr, Field, HttpUrl
-from datetime import datetime
+from datetime import date, datetime
 from typing import Optional, List, Dict
 
 
@@ -72,8 +72,33 @@ class QRCodeResponse(BaseModel):
 class QRCodeSchema(BaseModel):
     course_name: str
     qr_code_link: HttpUrl
+    qr_code_compact: str  # Smaller alphanumeric payload for the same session
     generation_time: datetime
 
+
+class QRRotationResponse(BaseModel):
+    qr_code_id: int
+    qr_code_link: HttpUrl  # Append "&code=<current code>" before projecting
+    qr_code_compact: str  # Or append "/<current code>" to the compact payload
+    seed: str  # Hex-encoded HOTP key for this session
+    epoch: int  # Unix time of step 0
+    period: int  # Seconds per code
+    digits: int
+    expires_at: datetime
+
+
+class QRSymbolStats(BaseModel):
+    length: int
+    mode: str
+    version: int
+    modules: int  # Modules per side, excluding the quiet zone
+
+
+class QRCodeFormatsResponse(BaseModel):
+    qr_code_id: int
+    legacy: QRSymbolStats
+    compact: QRSymbolStats
+
 # Schema for creating a new Student (receiving data from the frontend)
 class StudentCreate(BaseModel):
     matric_number: str
@@ -120,13 +145,48 @@ class EnrollResponse(BaseModel):
     message: str
 
 
+class BulkEnrollmentRowResult(BaseModel):
+    line: int  # Line number in the uploaded CSV
+    matric_number: str
+    course_code: str
+    status: str  # "enrolled", "already_enrolled", "duplicate" or "rejected"
+    detail: Optional[str] = None
+
+
+class BulkEnrollmentResponse(BaseModel):
+    enrolled: int
+    already_enrolled: int
+    duplicate: int
+    rejected: int
+    results: List[BulkEnrollmentRowResult]
+
+
+class StudentImportRowResult(BaseModel):
+    line: int  # Line number in the uploaded CSV
+    matric_number: str
+    status: str  # "imported", "already_imported", "duplicate" or "rejected"
+    detail: Optional[str] = None
+
+
+class StudentImportResponse(BaseModel):
+    imported: int
+    already_imported: int
+    duplicate: int
+    rejected: int
+    results: List[StudentImportRowResult]
+
+
 # Schema for Attendance marking (receiving data from the frontend)
 class AttendanceCreate(BaseModel):
     matric_number: str  # Student's matric number
-    course_code: str  # Course code
     latitude: float  # Latitude of the student
     longitude: float  # Longitude of the student
-    lecturer_id: int
+    token: Optional[str] = None  # Signed token scanned from the QR code
+    code: Optional[str] = None  # Rotating code scanned alongside the token
+    course_code: Optional[str] = None  # Legacy QR codes only
+    lecturer_id: Optional[int] = None  # Legacy QR codes only
+    # Stable per-install identifier from the app, for proxy-scan detection
+    device_id: Optional[str] = Field(default=None, max_length=128)
 
 
 class CourseStats(BaseModel):
@@ -134,6 +194,87 @@ class CourseStats(BaseModel):
     total_credits: int
 
 
+class CourseStudentCount(BaseModel):
+    course_name: str
+    total_students: int
+
+
+# Sections the client did not ask for are left out of the response.
+class LecturerDashboardResponse(BaseModel):
+    courses: Optional[List[CourseCreate]] = None
+    stats: Optional[CourseStats] = None
+    course_students: Optional[List[CourseStudentCount]] = None
+    latest_qr_codes: Optional[List[QRCodeSchema]] = None
+
+
+class AtRiskStudent(BaseModel):
+    matric_number: str
+    full_name: str
+    course_code: str
+    sessions_held: int
+    sessions_attended: int
+    attendance_percentage: float
+    longest_absence_streak: int
+    current_absence_streak: int
+
+
+class AtRiskReportResponse(BaseModel):
+    threshold: float
+    total: int
+    page: int
+    page_size: int
+    students: List[AtRiskStudent]
+
+
+class AttendanceTrend(BaseModel):
+    semester: str
+    week_start: date
+    sessions: int
+    expected_attendances: int
+    present_attendances: int
+    attendance_percentage: float
+
+
+class DepartmentTrend(AttendanceTrend):
+    department: str
+
+
+class CourseTrend(AttendanceTrend):
+    course_code: str
+
+
+class SessionTrend(BaseModel):
+    session_id: int
+    department: str
+    semester: str
+    week_start: date
+    started_at: datetime
+    enrolled_students: int
+    present_students: int
+    attendance_percentage: float
+
+
+class ScanLocation(BaseModel):
+    matric_number: str
+    course_code: str
+    session_id: Optional[int] = None
+    date: datetime
+    latitude: float
+    longitude: float
+    distance_m: float
+
+
+class ProxyScanFlagResponse(BaseModel):
+    flag_id: int
+    session_id: int
+    course_code: str
+    reason: str
+    cluster_key: str
+    matric_numbers: List[str]
+    first_scan_at: datetime
+    last_scan_at: datetime
+
+
 class LecturerCourseResponse(BaseModel):
     lecturer_name: str
     course_code: str
@@ -152,10 +293,16 @@ class CourseDetails(BaseModel):
     lecturer_name: str
 
 
+class AttendanceSessionColumn(BaseModel):
+    session_id: int
+    started_at: datetime
+    label: str  # Start time for display; sessions are keyed by session_id
+
+
 class StudentAttendance(BaseModel):
     matric_number: str
     full_name: str
-    attendance: Dict[str, str]  # Date as key, status (Present/Absent) as value
+    attendance: Dict[int, str]  # Session id as key, status (Present/Absent) as value
 
 
 
@@ -171,6 +318,7 @@ class StudentAttendanceRecord(BaseModel):
 
 class AttendanceResponse(BaseModel):
     course_name: str
+    sessions: List[AttendanceSessionColumn] = []  # Newest first
     attendance: List[StudentAttendance]
 
 
@@ -0,0 +1,41 @@
+from typing import Optional
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from models import Lecturer, LecturerCourses
+from util.lecturer_utils import validate_lecturer, validate_lecturer_course
+from util.attendance_analytics_utils import fetch_at_risk_report
+from util.tracing_utils import trace_service
+
+# --------------------
+# AttendanceAnalyticsService Class
+# --------------------
+
+
+@trace_service
+class AttendanceAnalyticsService:
+    @staticmethod
+    async def get_at_risk_students(
+        db: AsyncSession,
+        current_lecturer: Lecturer,
+        course_code: Optional[str],
+        page: int,
+        page_size: int,
+    ):
+        """
+        Students below the attendance threshold across the lecturer's courses,
+        or in one of them when course_code is given.
+        """
+        await validate_lecturer(current_lecturer)
+
+        if course_code is not None:
+            await validate_lecturer_course(db, course_code, current_lecturer.lecturer_id)
+            course_codes = [course_code]
+        else:
+            result = await db.execute(
+                select(LecturerCourses.course_code).where(
+                    LecturerCourses.lecturer_id == current_lecturer.lecturer_id
+                )
+            )
+            course_codes = result.scalars().all()
+
+        return await fetch_at_risk_report(db, course_codes, page, page_size)
@@ -0,0 +1,89 @@
+import asyncio
+from fastapi import HTTPException, WebSocket, WebSocketDisconnect
+from config import settings
+from database import bulkhead_session
+from models import AttendanceSession, Lecturer, QRCode
+from utils import filter_records
+from errors.qr_code_errors import QRCodeNotFoundError
+from util.auth_utils import get_current_user
+from util.attendance_feed import RESYNC, attendance_feed, fetch_session_roster
+
+
+# --------------------
+# AttendanceFeedService Class
+# --------------------
+
+async def _fetch_roster(session_id: int):
+    # Each roster read borrows a connection briefly; none is held while idle.
+    async with bulkhead_session("interactive") as db:
+        session = await db.get(AttendanceSession, session_id)
+        if session is None:
+            # Deleted along with its QR code: end the feed as if it had closed.
+            return {"type": "closed"}
+        return await fetch_session_roster(db, session)
+
+
+async def _wait_for_disconnect(websocket: WebSocket):
+    # The feed is one-way; anything the client sends is ignored.
+    try:
+        while True:
+            await websocket.receive_text()
+    except WebSocketDisconnect:
+        pass
+
+
+class AttendanceFeedService:
+    @staticmethod
+    async def stream_session(websocket: WebSocket, qr_code_id: int, token: str):
+        """
+        Push a QR session's roster once, then one event per accepted scan until
+        the session closes or the client goes away.
+        """
+        try:
+            async with bulkhead_session("interactive") as db:
+                lecturer = await get_current_user(token, db, Lecturer, "lecturer_email")
+                qr_code = await filter_records(
+                    QRCode, db, qr_code_id=qr_code_id, lecturer_id=lecturer.lecturer_id
+                )
+                if not qr_code or qr_code.session_id is None:
+                    raise QRCodeNotFoundError()
+        except HTTPException as exc:
+            # 1013 asks the client to retry later; 1008 is a policy rejection.
+            await websocket.close(
+                code=1013 if exc.status_code == 503 else 1008, reason=exc.detail
+            )
+            return
+
+        await websocket.accept()
+        # Subscribe before reading the roster so no scan falls between the two;
+        # a scan already in the roster is repeated as an event, which is harmless.
+        subscription = attendance_feed.subscribe(qr_code.session_id)
+        disconnected = asyncio.create_task(_wait_for_disconnect(websocket))
+        try:
+            event = await _fetch_roster(qr_code.session_id)
+            while True:
+                await asyncio.wait_for(
+                    websocket.send_json(event), settings.FEED_SEND_TIMEOUT_SECONDS
+                )
+                if event["type"] == "closed" or event.get("closed"):
+                    break
+
+                next_event = asyncio.create_task(subscription.queue.get())
+                await asyncio.wait(
+                    {next_event, disconnected}, return_when=asyncio.FIRST_COMPLETED
+                )
+                if not next_event.done():
+                    next_event.cancel()
+                    return
+                event = next_event.result()
+                if event is RESYNC:
+                    event = await _fetch_roster(qr_code.session_id)
+        except asyncio.TimeoutError:
+            # The client stopped reading; drop it rather than buffer for it.
+            await websocket.close(code=1008, reason="Feed consumer too slow")
+            return
+        finally:
+            attendance_feed.unsubscribe(subscription)
+            disconnected.cancel()
+
+        await websocket.close()
@@ -1,23 +1,22 @@
 from sqlalchemy.ext.asyncio import AsyncSession
 from models import Lecturer
+from utils import filter_records, record_exists
 from util.auth_utils import (
     get_password_hash,
     create_access_token,
     verify_password,
-    filter_records,
 )
 from errors.auth_errors import EmailAlreadyExistError, LecturerNotFoundError, PasswordError, EmailDoesNotExistError
-from fastapi import HTTPException
+from util.tracing_utils import trace_service
 
 
+@trace_service
 class AuthService:
     @staticmethod
     async def register_lecturer(lecturer_data, db: AsyncSession):
-        existing_lecturer = await filter_records(
+        if await record_exists(
             Lecturer, db, lecturer_email=lecturer_data.lecturer_email
-        )
-
-        if existing_lecturer:
+        ):
             raise EmailAlreadyExistError()
 
         hashed_password = get_password_hash(lecturer_data.lecturer_password)
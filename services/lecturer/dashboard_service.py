@@ -0,0 +1,93 @@
+import asyncio
+from typing import List, Set
+from sqlalchemy import func, select
+from database import bulkhead_session
+from models import Lecturer, LecturerCourses, StudentCourses
+from util.lecturer_utils import validate_lecturer
+from services.lecturer.lecturer_course_service import LecturerCourseService
+from services.lecturer.qrcode_service import QRCodeService
+from util.tracing_utils import trace_service
+
+# --------------------
+# LecturerDashboardService Class
+# --------------------
+
+DASHBOARD_SECTIONS = ("courses", "stats", "course_students", "latest_qr_codes")
+
+
+async def _read(principals: Set[str], *queries):
+    # Concurrent reads each need their own session, since an AsyncSession runs
+    # one statement at a time; queries grouped here share one session in turn.
+    async with bulkhead_session("interactive", principals, read_only=True) as db:
+        return [await query(db) for query in queries]
+
+
+async def _count_students_per_course(db, lecturer_id: int):
+    result = await db.execute(
+        select(StudentCourses.course_code, func.count(StudentCourses.matric_number))
+        .join(
+            LecturerCourses, LecturerCourses.course_code == StudentCourses.course_code
+        )
+        .where(LecturerCourses.lecturer_id == lecturer_id)
+        .group_by(StudentCourses.course_code)
+    )
+    return dict(result.all())
+
+
+async def _no_result():
+    return []
+
+
+@trace_service
+class LecturerDashboardService:
+    @staticmethod
+    async def get_dashboard(
+        current_lecturer: Lecturer, sections: List[str], principals: Set[str]
+    ):
+        """
+        Build the lecturer home screen in one request. The course list is read
+        once and shared by the sections derived from it. The course reads and
+        the QR code read run concurrently, one session per group, so a request
+        holds at most two interactive slots.
+        """
+        await validate_lecturer(current_lecturer)
+        lecturer_id = current_lecturer.lecturer_id
+        sections = set(sections)
+
+        course_queries = []
+        if sections & {"courses", "stats", "course_students"}:
+            course_queries.append(
+                lambda db: LecturerCourseService.fetch_courses_for_lecturer(db, lecturer_id)
+            )
+        if "course_students" in sections:
+            course_queries.append(lambda db: _count_students_per_course(db, lecturer_id))
+
+        course_results, qr_results = await asyncio.gather(
+            _read(principals, *course_queries) if course_queries else _no_result(),
+            _read(principals, lambda db: QRCodeService.fetch_latest_qr_codes(lecturer_id, db))
+            if "latest_qr_codes" in sections
+            else _no_result(),
+        )
+        courses = course_results[0] if course_results else []
+        student_counts = course_results[1] if len(course_results) > 1 else {}
+        latest_qr_codes = qr_results[0] if qr_results else []
+
+        dashboard = {}
+        if "courses" in sections:
+            dashboard["courses"] = courses
+        if "stats" in sections:
+            dashboard["stats"] = {
+                "total_courses": len(courses),
+                "total_credits": sum(course.course_credits for course in courses),
+            }
+        if "course_students" in sections:
+            dashboard["course_students"] = [
+                {
+                    "course_name": course.course_name,
+                    "total_students": student_counts.get(course.course_code, 0),
+                }
+                for course in courses
+            ]
+        if "latest_qr_codes" in sections:
+            dashboard["latest_qr_codes"] = latest_qr_codes
+        return dashboard
@@ -1,21 +1,26 @@
+from collections import Counter
 from datetime import datetime
-from typing import List
+from typing import AsyncIterator, List
 from sqlalchemy.future import select
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.sql import func
 from models import Lecturer, Course, LecturerCourses, StudentCourses
-from utils import filter_records
-from util.lecturer_utils import validate_lecturer, count_lecturer_courses
+from config import settings
+from utils import filter_records, record_exists, iter_csv_records
+from util.enrollment_utils import ENROLLMENT_COLUMNS, enroll_batch
+from util.lecturer_utils import validate_lecturer
 from errors.course_errors import (
     LecturerCourseAlreadyAssociatedError,
     CourseNotFoundError,
 )
+from util.tracing_utils import trace_service
 
 # --------------------
 # LecturerCourseService Class
 # --------------------
 
 
+@trace_service
 class LecturerCourseService:
     @staticmethod
     async def create_course_for_lecturer(
@@ -43,13 +48,12 @@ class LecturerCourseService:
             new_course = existing_course
 
         # Validate that the lecturer is not already associated with the course.
-        lecturer_course = await filter_records(
+        if await record_exists(
             LecturerCourses,
             db,
             course_code=course.course_code,
             lecturer_id=current_lecturer.lecturer_id,
-        )
-        if lecturer_course:
+        ):
             raise LecturerCourseAlreadyAssociatedError()
 
         # Create the association between the lecturer and the course.
@@ -143,3 +147,40 @@ class LecturerCourseService:
                 }
             )
         return course_students
+
+    @staticmethod
+    async def bulk_enroll_students(
+        chunks: AsyncIterator[bytes], db: AsyncSession, current_lecturer: Lecturer
+    ):
+        """
+        Enroll students from a streamed CSV with matric_number, course_code and
+        lecturer_name columns, into courses the lecturer teaches. Rows are
+        processed in batches as they arrive and each batch commits on its own;
+        the report has one entry per data row.
+        """
+        await validate_lecturer(current_lecturer)
+
+        results = []
+        seen = set()
+        authorized = {}
+        batch = []
+        async for line, row in iter_csv_records(chunks, ENROLLMENT_COLUMNS):
+            batch.append((line, row))
+            if len(batch) >= settings.BULK_BATCH_SIZE:
+                results += await enroll_batch(
+                    db, batch, seen, current_lecturer.lecturer_id, authorized
+                )
+                batch = []
+        if batch:
+            results += await enroll_batch(
+                db, batch, seen, current_lecturer.lecturer_id, authorized
+            )
+
+        counts = Counter(result["status"] for result in results)
+        return {
+            "enrolled": counts["enrolled"],
+            "already_enrolled": counts["already_enrolled"],
+            "duplicate": counts["duplicate"],
+            "rejected": counts["rejected"],
+            "results": results,
+        }
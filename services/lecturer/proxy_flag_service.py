@@ -0,0 +1,23 @@
+from typing import List
+from sqlalchemy.ext.asyncio import AsyncSession
+from models import Lecturer
+from schemas import ProxyScanFlagResponse
+from util.lecturer_utils import validate_lecturer, validate_lecturer_course
+from util.proxy_scan_utils import fetch_proxy_flags
+from util.tracing_utils import trace_service
+
+# --------------------
+# ProxyScanFlagService Class
+# --------------------
+
+
+@trace_service
+class ProxyScanFlagService:
+    @staticmethod
+    async def get_proxy_flags(
+        db: AsyncSession, current_lecturer: Lecturer, course_code: str
+    ) -> List[ProxyScanFlagResponse]:
+        """Suspected proxy scans flagged in a course, most recent first."""
+        await validate_lecturer(current_lecturer)
+        await validate_lecturer_course(db, course_code, current_lecturer.lecturer_id)
+        return await fetch_proxy_flags(db, course_code)
@@ -1,26 +1,37 @@
+import asyncio
+import calendar
 from fastapi import HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
+from config import settings
 from models import QRCode, Course, LecturerCourses
 from schemas import QRCodeSchema
 from utils import filter_records
+from errors.qr_code_errors import QRCodeNotFoundError
+from util.qr_token_utils import claims_from_qr_code, derive_rotation_seed
+from util.qr_image_utils import qr_image_cache
 from util.qrcode_utils import (
-    build_qr_code_url,
-    get_current_utc_time,
+    build_qr_code_link,
+    build_compact_qr_link,
+    describe_qr_symbol,
+    cache_qr_code_images,
     get_start_of_current_hour,
-    check_recent_qr_code,
+    get_or_create_hourly_qr_code,
+    release_qr_code_session,
 )
 from util.lecturer_utils import (
     get_course_by_identifier,
     validate_lecturer_course,
     validate_lecturer,
 )
+from util.tracing_utils import trace_service
 
 
 # --------------------
 # QRCodeService Class
 # --------------------
 
+@trace_service
 class QRCodeService:
     @staticmethod
     async def generate_qr_code(qr_code_data, db: AsyncSession, current_lecturer):
@@ -31,37 +42,29 @@ class QRCodeService:
         course = await get_course_by_identifier(db, qr_code_data.course_code, "course_code")
         await validate_lecturer_course(db, course.course_code, current_lecturer.lecturer_id)
 
-        # Ensure no duplicate QR code exists for this course in the current hour
-        await check_recent_qr_code(db, course.course_code, current_lecturer.lecturer_id)
-
-        generation_time = get_current_utc_time()
-        qr_code_url = build_qr_code_url(
-            course_code=qr_code_data.course_code,
-            lecturer_id=current_lecturer.lecturer_id,
-            latitude=qr_code_data.latitude,
-            longitude=qr_code_data.longitude,
-            generated_at=generation_time.isoformat()
+        # One session per course per hour: returns the existing one on repeat taps.
+        qr_code = await get_or_create_hourly_qr_code(
+            db,
+            course.course_code,
+            current_lecturer.lecturer_id,
+            qr_code_data.latitude,
+            qr_code_data.longitude,
         )
 
-        new_qr_code = QRCode(
-            course_code=qr_code_data.course_code,
-            lecturer_id=current_lecturer.lecturer_id,
-            generation_time=generation_time,
-            latitude=qr_code_data.latitude,
-            longitude=qr_code_data.longitude,
-            url=qr_code_url,
-        )
-
-        db.add(new_qr_code)
-        await db.commit()
-        await db.refresh(new_qr_code)
-        return new_qr_code
+        if not qr_code.url:
+            # Newly created: the signed token embeds the session id, so the
+            # link is filled in within the same transaction as the insert.
+            qr_code.url = build_qr_code_link(qr_code)
+            await db.commit()
+            # Render the projector image once, up front, instead of on every client.
+            await cache_qr_code_images(qr_code)
+        else:
+            await db.commit()
+        return qr_code
 
 
     @staticmethod
     async def get_latest_qr_codes(lecturer_id: int, db: AsyncSession):
-        start_of_current_hour = get_start_of_current_hour()
-
         # Retrieve course codes assigned to the lecturer.
         course_results = await db.execute(
             select(LecturerCourses.course_code).where(
@@ -75,46 +78,114 @@ class QRCodeService:
                 status_code=204, detail="No courses assigned to this lecturer."
             )
 
-        # Retrieve QR codes generated within the current hour.
+        return await QRCodeService.fetch_latest_qr_codes(lecturer_id, db)
+
+    @staticmethod
+    async def fetch_latest_qr_codes(lecturer_id: int, db: AsyncSession):
+        """
+        This hour's QR codes for the lecturer's courses, with course names, in
+        one joined query.
+        """
         qr_code_result = await db.execute(
-            select(QRCode)
+            select(QRCode, Course.course_name)
+            .join(LecturerCourses, LecturerCourses.course_code == QRCode.course_code)
+            .join(Course, Course.course_code == QRCode.course_code)
             .where(
-                QRCode.course_code.in_(lecturer_courses),
-                QRCode.generation_time >= start_of_current_hour,
+                LecturerCourses.lecturer_id == lecturer_id,
+                QRCode.generation_time >= get_start_of_current_hour(),
             )
             .order_by(QRCode.generation_time.desc())
         )
-        qr_codes = qr_code_result.scalars().all()
-
-        if not qr_codes:
-            return []
-
-        # Retrieve course names for the lecturer's courses.
-        course_names_result = await db.execute(
-            select(Course.course_code, Course.course_name).where(
-                Course.course_code.in_(lecturer_courses)
-            )
-        )
-        course_name_mapping = {
-            row.course_code: row.course_name for row in course_names_result.all()
-        }
 
         # Construct and return the response.
         return [
             QRCodeSchema(
-                course_name=course_name_mapping.get(qr.course_code, "Unknown Course"),
-                qr_code_link=build_qr_code_url(
-                    course_code=qr.course_code,
-                    lecturer_id=qr.lecturer_id,
-                    latitude=qr.latitude,
-                    longitude=qr.longitude,
-                    generated_at=qr.generation_time.isoformat()
-                ),
+                course_name=course_name,
+                qr_code_link=build_qr_code_link(qr),
+                qr_code_compact=build_compact_qr_link(qr),
                 generation_time=qr.generation_time,
             )
-            for qr in qr_codes
+            for qr, course_name in qr_code_result.all()
         ]
 
+    @staticmethod
+    async def get_rotation_seed(qr_code_id: int, db: AsyncSession, current_lecturer):
+        """
+        Hand the projector everything it needs to derive rotating codes locally,
+        so it fetches once per session instead of polling for new QR codes.
+        """
+        await validate_lecturer(current_lecturer)
+
+        qr_code = await filter_records(
+            QRCode, db, qr_code_id=qr_code_id, lecturer_id=current_lecturer.lecturer_id
+        )
+        if not qr_code:
+            raise QRCodeNotFoundError()
+
+        claims = claims_from_qr_code(qr_code)
+        if not claims.rotation_period:
+            raise HTTPException(
+                status_code=400, detail="QR code rotation is not enabled."
+            )
+
+        return {
+            "qr_code_id": qr_code.qr_code_id,
+            "qr_code_link": build_qr_code_link(qr_code),
+            "qr_code_compact": build_compact_qr_link(qr_code),
+            "seed": derive_rotation_seed(claims).hex(),
+            "epoch": calendar.timegm(claims.issued_at.utctimetuple()),
+            "period": claims.rotation_period,
+            "digits": settings.QR_ROTATION_DIGITS,
+            "expires_at": claims.expires_at,
+        }
+
+    @staticmethod
+    async def get_qr_code_formats(qr_code_id: int, db: AsyncSession, current_lecturer):
+        """
+        Compare the QR symbols produced by the legacy URL and the compact payload.
+        """
+        await validate_lecturer(current_lecturer)
+
+        qr_code = await filter_records(
+            QRCode, db, qr_code_id=qr_code_id, lecturer_id=current_lecturer.lecturer_id
+        )
+        if not qr_code:
+            raise QRCodeNotFoundError()
+
+        # Encoding a symbol is CPU-bound; keep it off the event loop.
+        return {
+            "qr_code_id": qr_code.qr_code_id,
+            "legacy": await asyncio.to_thread(
+                describe_qr_symbol, build_qr_code_link(qr_code)
+            ),
+            "compact": await asyncio.to_thread(
+                describe_qr_symbol, build_compact_qr_link(qr_code)
+            ),
+        }
+
+    @staticmethod
+    async def get_qr_code_image(
+        qr_code_id: int, image_format: str, db: AsyncSession, current_lecturer
+    ):
+        """
+        Return the pre-rendered QR image, re-rendering only after a cache eviction.
+        """
+        await validate_lecturer(current_lecturer)
+
+        entry = qr_image_cache.get(qr_code_id)
+        if entry is None or entry.lecturer_id != current_lecturer.lecturer_id:
+            qr_code = await filter_records(
+                QRCode,
+                db,
+                qr_code_id=qr_code_id,
+                lecturer_id=current_lecturer.lecturer_id,
+            )
+            if not qr_code:
+                raise QRCodeNotFoundError()
+            entry = await cache_qr_code_images(qr_code)
+
+        return entry.images[image_format]
+
     @staticmethod
     async def delete_qr_code(course_name: str, db: AsyncSession, current_lecturer):
         await validate_lecturer(current_lecturer)
@@ -138,6 +209,9 @@ class QRCodeService:
 
         await db.delete(qr_code)
         await db.flush()
+        if qr_code.session_id is not None:
+            await release_qr_code_session(db, qr_code.session_id)
         await db.commit()
+        qr_image_cache.discard(qr_code.qr_code_id)
 
         return {"detail": f"QR Code for course '{course_name}' deleted successfully."}
@@ -0,0 +1,54 @@
+from typing import Optional
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from models import Lecturer, LecturerCourses
+from util.lecturer_utils import validate_lecturer, validate_lecturer_course
+from util.scan_location_utils import fetch_scans_far_from_session, fetch_scans_near
+from util.tracing_utils import trace_service
+
+# --------------------
+# ScanLocationService Class
+# --------------------
+
+
+@trace_service
+class ScanLocationService:
+    @staticmethod
+    async def get_scans_near(
+        db: AsyncSession,
+        current_lecturer: Lecturer,
+        latitude: float,
+        longitude: float,
+        radius_m: float,
+        course_code: Optional[str],
+        limit: int,
+    ):
+        """Scans near a point, in one of the lecturer's courses or all of them."""
+        await validate_lecturer(current_lecturer)
+
+        if course_code is not None:
+            await validate_lecturer_course(db, course_code, current_lecturer.lecturer_id)
+            course_codes = [course_code]
+        else:
+            result = await db.execute(
+                select(LecturerCourses.course_code).where(
+                    LecturerCourses.lecturer_id == current_lecturer.lecturer_id
+                )
+            )
+            course_codes = result.scalars().all()
+
+        return await fetch_scans_near(
+            db, latitude, longitude, radius_m, course_codes, limit
+        )
+
+    @staticmethod
+    async def get_scans_far_from_session(
+        db: AsyncSession,
+        current_lecturer: Lecturer,
+        course_code: str,
+        min_distance_m: float,
+        limit: int,
+    ):
+        await validate_lecturer(current_lecturer)
+        await validate_lecturer_course(db, course_code, current_lecturer.lecturer_id)
+        return await fetch_scans_far_from_session(db, course_code, min_distance_m, limit)
@@ -0,0 +1,61 @@
+from datetime import date
+from typing import Optional
+from sqlalchemy.ext.asyncio import AsyncSession
+from models import Lecturer
+from errors.course_errors import UnauthorizedDepartmentError
+from util.lecturer_utils import validate_lecturer, validate_lecturer_course
+from util.attendance_rollup_utils import (
+    fetch_course_trends,
+    fetch_department_trends,
+    fetch_session_trends,
+)
+from util.tracing_utils import trace_service
+
+# --------------------
+# AttendanceTrendService Class
+# --------------------
+# Aggregates only, read from the rollup tables; no student is identified.
+# Department totals are open to every lecturer on purpose, for comparison
+# across the institution; course breakdowns are limited to the lecturer's own
+# department and session breakdowns to the lecturer's own courses.
+
+
+@trace_service
+class AttendanceTrendService:
+    @staticmethod
+    async def get_department_trends(
+        db: AsyncSession,
+        current_lecturer: Lecturer,
+        semester: Optional[str],
+        week_from: Optional[date],
+        week_to: Optional[date],
+    ):
+        await validate_lecturer(current_lecturer)
+        return await fetch_department_trends(db, semester, week_from, week_to)
+
+    @staticmethod
+    async def get_course_trends(
+        db: AsyncSession,
+        current_lecturer: Lecturer,
+        department: str,
+        semester: Optional[str],
+        week_from: Optional[date],
+        week_to: Optional[date],
+    ):
+        await validate_lecturer(current_lecturer)
+        if department != current_lecturer.lecturer_department:
+            raise UnauthorizedDepartmentError()
+        return await fetch_course_trends(db, department, semester, week_from, week_to)
+
+    @staticmethod
+    async def get_session_trends(
+        db: AsyncSession,
+        current_lecturer: Lecturer,
+        course_code: str,
+        semester: Optional[str],
+        week_from: Optional[date],
+        week_to: Optional[date],
+    ):
+        await validate_lecturer(current_lecturer)
+        await validate_lecturer_course(db, course_code, current_lecturer.lecturer_id)
+        return await fetch_session_trends(db, course_code, semester, week_from, week_to)
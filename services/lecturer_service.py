@@ -1,15 +1,21 @@
 from sqlmodel import select, func
 from sqlmodel.ext.asyncio.session import AsyncSession
 from models import (
+    AttendanceSession,
     Course,
     LecturerCourses,
     StudentCourses,
     AttendanceRecords,
+    ArchivedSemester,
     Student,
 )
+from util.archive_utils import fetch_archived_attendance
 from errors.course_errors import UnauthorizedLecturerCourseError
 from typing import Dict
 
+# Columns are keyed by session id; the start time is only their display label.
+SESSION_LABEL_FORMAT = "%Y-%m-%d %H:%M"
+
 
 async def get_attendance_service(course_code: str, current_lecturer, db: AsyncSession):
     # Find the course by course_code
@@ -51,26 +57,63 @@ async def get_attendance_service(course_code: str, current_lecturer, db: AsyncSe
             "attendance": [],
         }
 
-    # Get the attendance dates
-    date_query = (
-        select(AttendanceRecords.date)
-        .where(AttendanceRecords.course_code == course.course_code)
-        .order_by(AttendanceRecords.date.desc())
+    # Get the course's sessions; each one is a column of the matrix
+    session_query = (
+        select(AttendanceSession.session_id, AttendanceSession.started_at)
+        .where(
+            # Semester first, matching ix_attendancesession_semester_course.
+            AttendanceSession.semester == course.semester,
+            AttendanceSession.course_code == course.course_code,
+            AttendanceSession.voided_at.is_(None),
+        )
+        .order_by(AttendanceSession.started_at.desc())
     )
-    date_result = await db.execute(date_query)
-    recent_dates = [record[0].strftime("%Y-%m-%d") for record in date_result.fetchall()]
+    session_result = await db.execute(session_query)
+    sessions = session_result.fetchall()
+
+    # Sessions of an archived semester are read back from the archive files
+    archived_presences = []
+    if await db.get(ArchivedSemester, course.semester):
+        archived_sessions, archived_records = await fetch_archived_attendance(
+            course.semester, course.course_code
+        )
+        sessions += sorted(
+            (
+                (session["session_id"], session["started_at"])
+                for session in archived_sessions
+                if session.get("voided_at") is None
+            ),
+            key=lambda session: session[1],
+            reverse=True,
+        )
+        archived_presences = [
+            (record["matric_number"], record["session_id"], record["status"])
+            for record in archived_records
+        ]
 
-    if not recent_dates:
+    if not sessions:
         return {"course_name": course.course_name, "attendance": []}
 
-    # Fetch attendance records for students
-    attendance_query = select(
-        AttendanceRecords.matric_number,
-        AttendanceRecords.date,
-        AttendanceRecords.status,
-    ).where(AttendanceRecords.course_code == course.course_code)
+    # Fetch presences keyed by session. Absence is whatever is missing, so the
+    # result is the same whether or not Absent rows are stored.
+    attendance_query = (
+        select(
+            AttendanceRecords.matric_number,
+            AttendanceRecords.session_id,
+            AttendanceRecords.status,
+        )
+        .join(
+            AttendanceSession,
+            AttendanceSession.session_id == AttendanceRecords.session_id,
+        )
+        .where(
+            AttendanceSession.semester == course.semester,
+            AttendanceSession.course_code == course.course_code,
+            AttendanceRecords.status == "Present",
+        )
+    )
     attendance_result = await db.execute(attendance_query)
-    attendance_records = attendance_result.fetchall()
+    attendance_records = attendance_result.fetchall() + archived_presences
 
     if not attendance_records:
         return {"course_name": course.course_name, "attendance": []}
@@ -81,20 +124,29 @@ async def get_attendance_service(course_code: str, current_lecturer, db: AsyncSe
             "matric_number": student[0],
             "full_name": student[1],
             "attendance": {
-                date: "Absent" for date in recent_dates
+                session_id: "Absent" for session_id, _ in sessions
             },  # Default to Absent
         }
         for student in students
     }
 
     for record in attendance_records:
-        matric_no, date, status = record
-        formatted_date = date.strftime("%Y-%m-%d")
-        if formatted_date in recent_dates:
-            attendance_dict[matric_no]["attendance"][formatted_date] = status
+        matric_no, session_id, status = record
+        student_attendance = attendance_dict.get(matric_no)
+        # Void sessions are not columns; skip their records.
+        if student_attendance and session_id in student_attendance["attendance"]:
+            student_attendance["attendance"][session_id] = status
 
     # Convert to list for response
     return {
         "course_name": course.course_name,
+        "sessions": [
+            {
+                "session_id": session_id,
+                "started_at": started_at,
+                "label": started_at.strftime(SESSION_LABEL_FORMAT),
+            }
+            for session_id, started_at in sessions
+        ],
         "attendance": list(attendance_dict.values()),
     }
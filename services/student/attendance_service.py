@@ -1,30 +1,42 @@
-from datetime import datetime
+import logging
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
-from models import Student, AttendanceRecords
+from config import settings
+from models import Student
 from schemas import AttendanceCreate, StudentAttendanceRecord
-from datetime import datetime
 from util.qrcode_utils import (
     fetch_student,
     fetch_course,
     validate_enrollment,
     fetch_latest_qr_code,
-    is_within_timeframe,
+    get_current_utc_time,
     validate_geolocation,
 )
-from util.attendance_utils import (
-    check_existing_attendance,
-    mark_absent_students,
+from util.qr_token_utils import (
+    verify_qr_token,
+    verify_rotation_code,
+    claims_from_qr_code,
 )
 from util.attendance_utils import (
-    fetch_total_sessions_per_course,
-    fetch_student_attendance_records,
-    calculate_attendance_percentage,
+    record_attendance,
+    close_session,
 )
+from util.attendance_utils import calculate_attendance_percentage
+from util.attendance_summary_utils import fetch_student_attendance_summaries
+from util.attendance_feed import publish_scan
+from util.proxy_scan_utils import proxy_scan_detector, record_proxy_flags
 from errors.attendance_errors import AttendanceAuthError, MarkedAttendanceError
-from errors.qr_code_errors import ExpiredQRCodeError
+from errors.qr_code_errors import (
+    ExpiredQRCodeError,
+    InvalidQRTokenError,
+    StaleQRCodeError,
+)
+from util.tracing_utils import trace_service
+
+logger = logging.getLogger(__name__)
 
 
+@trace_service
 class AttendanceService:
     @staticmethod
     async def scan_qr_service(
@@ -34,50 +46,89 @@ class AttendanceService:
         if attendance_data.matric_number != current_student.matric_number:
             raise AttendanceAuthError()
 
-        # Perform checks using utility functions
-        await fetch_student(db, attendance_data.matric_number)
-        await fetch_course(db, attendance_data.course_code)
-        await validate_enrollment(
-            db, attendance_data.matric_number, attendance_data.course_code
-        )
+        if attendance_data.token:
+            # Signed QR codes carry the session, expiry and location, so only
+            # the enrollment check and the insert need the database.
+            session = verify_qr_token(attendance_data.token)
+            if session.rotation_period and not verify_rotation_code(
+                session, attendance_data.code, get_current_utc_time()
+            ):
+                raise StaleQRCodeError()
+            await validate_enrollment(
+                db, attendance_data.matric_number, session.course_code
+            )
+        else:
+            if not attendance_data.course_code or attendance_data.lecturer_id is None:
+                raise InvalidQRTokenError()
 
-        qr_code = await fetch_latest_qr_code(
-            db, attendance_data.course_code, attendance_data.lecturer_id
-        )
+            # Perform checks using utility functions
+            await fetch_student(db, attendance_data.matric_number)
+            await fetch_course(db, attendance_data.course_code)
+            await validate_enrollment(
+                db, attendance_data.matric_number, attendance_data.course_code
+            )
 
-        if not is_within_timeframe(qr_code.generation_time):
-            # Mark absent students automatically when QR code has expired
-            await mark_absent_students(
-                db, attendance_data.course_code, qr_code.generation_time
+            qr_code = await fetch_latest_qr_code(
+                db, attendance_data.course_code, attendance_data.lecturer_id
             )
-            raise ExpiredQRCodeError()
+            session = claims_from_qr_code(qr_code)
+            # Unsigned links would bypass rotation, so only accept them for static codes.
+            if session.rotation_period:
+                raise InvalidQRTokenError()
 
-        existing_attendance = await check_existing_attendance(
-            db,
-            attendance_data.matric_number,
-            attendance_data.course_code,
-            qr_code.generation_time,
-        )
-        if existing_attendance:
-            raise MarkedAttendanceError()
+        if get_current_utc_time() > session.expires_at:
+            # Close the session (recording absences if configured) once it has expired
+            await close_session(db, session.course_code, session.session_id)
+            raise ExpiredQRCodeError()
 
         validate_geolocation(
             attendance_data.latitude,
             attendance_data.longitude,
-            qr_code.latitude,
-            qr_code.longitude,
+            session.latitude,
+            session.longitude,
         )
 
-        # Record attendance
-        new_attendance = AttendanceRecords(
+        # Record attendance; the (session, student) unique key makes retries and
+        # concurrent duplicates no-ops, so the insert outcome is the dedup check.
+        record_id = await record_attendance(
+            db,
+            session_id=session.session_id,
             matric_number=attendance_data.matric_number,
-            course_code=attendance_data.course_code,
-            status="Present",
-            geo_location=f"{attendance_data.latitude},{attendance_data.longitude}",
-            date=datetime.utcnow(),
+            course_code=session.course_code,
+            latitude=attendance_data.latitude,
+            longitude=attendance_data.longitude,
         )
-        db.add(new_attendance)
-        await db.commit()
+        if record_id is None:
+            raise MarkedAttendanceError()
+
+        scanned_at = get_current_utc_time()
+        publish_scan(
+            session.session_id,
+            current_student.matric_number,
+            current_student.student_fullname,
+            scanned_at,
+        )
+
+        if settings.PROXY_DETECTION_ENABLED:
+            # The attendance is already committed; failing to flag it must not
+            # turn the scan into an error.
+            try:
+                flags = proxy_scan_detector.observe(
+                    session.session_id,
+                    session.course_code,
+                    attendance_data.matric_number,
+                    attendance_data.latitude,
+                    attendance_data.longitude,
+                    attendance_data.device_id,
+                    scanned_at,
+                )
+                if flags:
+                    await record_proxy_flags(db, flags)
+            except Exception:
+                await db.rollback()
+                logger.exception(
+                    "Could not record proxy flags for session %s", session.session_id
+                )
 
         return {"message": "Attendance marked successfully"}
 
@@ -85,20 +136,16 @@ class AttendanceService:
     async def get_student_attendance_details(
         db: AsyncSession, current_student: Student
     ) -> List[StudentAttendanceRecord]:
-        # Fetch total attendance sessions and student-specific attendance records
-        total_sessions = await fetch_total_sessions_per_course(db)
-        attendance_records = await fetch_student_attendance_records(
+        # One summary row per enrolled course, kept current by scans and session closes
+        summaries = await fetch_student_attendance_summaries(
             db, current_student.matric_number
         )
 
         # Calculate attendance percentage and compile attendance data
         attendance_data = []
-        for record in attendance_records:
-            total_sessions_count = total_sessions.get(
-                record.course_code, 1
-            )  # Prevent division by zero
+        for record, lecturer_name in summaries:
             attendance_percentage = calculate_attendance_percentage(
-                record.attended_sessions, total_sessions_count
+                record.attended_sessions, record.total_sessions
             )
 
             attendance_data.append(
@@ -106,7 +153,7 @@ class AttendanceService:
                     matric_number=current_student.matric_number,
                     course_name=record.course_name,
                     course_code=record.course_code,
-                    lecturer_name=record.lecturer_name,
+                    lecturer_name=lecturer_name,
                     course_credits=record.course_credits,
                     semester=record.semester,
                     attendance_score=round(attendance_percentage, 2),
@@ -1,18 +1,25 @@
+from collections import Counter
+from typing import AsyncIterator
 from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import HTTPException
+from config import settings
+from errors.import_errors import ImportNotAllowedError
 from models import Student
+from utils import filter_records, record_exists
 from util.auth_utils import (
     get_password_hash,
     create_access_token,
     verify_password,
-    filter_records,
 )
+from util.student_import_utils import import_students
+from util.tracing_utils import trace_service
 
 
+@trace_service
 class AuthService:
     @staticmethod
     async def student_signup(student_data, db: AsyncSession):
-        if await filter_records(Student, db, matric_number=student_data.matric_number):
+        if await record_exists(Student, db, matric_number=student_data.matric_number):
             raise HTTPException(status_code=400, detail="Student already registered.")
 
         new_student = Student(
@@ -26,6 +33,32 @@ class AuthService:
         await db.refresh(new_student)
         return {"message": "Student Registered Successfully"}
 
+    @staticmethod
+    async def import_students(
+        chunks: AsyncIterator[bytes], db: AsyncSession, current_lecturer
+    ):
+        """
+        Register students from a streamed CSV. Re-sending the same file resumes
+        an interrupted import: rows already registered are skipped unhashed.
+        Creating accounts is not tied to a course, so only the lecturers listed
+        in STUDENT_IMPORT_LECTURER_EMAILS may import.
+        """
+        if (
+            not current_lecturer
+            or current_lecturer.lecturer_email
+            not in settings.STUDENT_IMPORT_LECTURER_EMAILS
+        ):
+            raise ImportNotAllowedError()
+        results = await import_students(db, chunks)
+        counts = Counter(result["status"] for result in results)
+        return {
+            "imported": counts["imported"],
+            "already_imported": counts["already_imported"],
+            "duplicate": counts["duplicate"],
+            "rejected": counts["rejected"],
+            "results": results,
+        }
+
     @staticmethod
     async def student_login(student_data, db: AsyncSession):
         db_student = await filter_records(
@@ -7,15 +7,17 @@ from models import (
     LecturerCourses,
     Lecturer,
 )
-from utils import filter_records
+from utils import filter_records, filter_value, record_exists
 from errors.auth_errors import StudentNotFoundError, LecturerNotFoundError
 from errors.course_errors import (
     CourseNotFoundError,
     UnauthorizedLecturerCourseError,
     StudentEnrolledError
 )
+from util.tracing_utils import trace_service
 
 
+@trace_service
 class CourseService:
     @staticmethod
     async def enroll_student(enrollment_data, db: AsyncSession):
@@ -25,28 +27,26 @@ class CourseService:
         course = await filter_records(
             Course, db, course_code=enrollment_data.course_code
         )
-        lecturer = await filter_records(
-            Lecturer, db, lecturer_name=enrollment_data.lecturer_name
+        lecturer_id = await filter_value(
+            Lecturer.lecturer_id, db, lecturer_name=enrollment_data.lecturer_name
         )
 
         if not student:
             raise StudentNotFoundError()
         if not course:
             raise CourseNotFoundError()
-        if not lecturer:
+        if lecturer_id is None:
             raise LecturerNotFoundError()
 
-        lecturer_course = await filter_records(
+        if not await record_exists(
             LecturerCourses,
             db,
             course_code=enrollment_data.course_code,
-            lecturer_id=lecturer.lecturer_id,
-        )
-
-        if not lecturer_course:
+            lecturer_id=lecturer_id,
+        ):
             raise UnauthorizedLecturerCourseError()
 
-        if await filter_records(
+        if await record_exists(
             StudentCourses,
             db,
             matric_number=enrollment_data.matric_number,
@@ -64,8 +64,8 @@ class CourseService:
         return {
             "matric_number": enrollment_data.matric_number,
             "course_code": enrollment_data.course_code,
-            "lecturer_name": lecturer.lecturer_name,
-            "message": f"Student {enrollment_data.matric_number} successfully enrolled in {enrollment_data.course_code} with Lecturer {lecturer.lecturer_name}",
+            "lecturer_name": enrollment_data.lecturer_name,
+            "message": f"Student {enrollment_data.matric_number} successfully enrolled in {enrollment_data.course_code} with Lecturer {enrollment_data.lecturer_name}",
         }
 
     @staticmethod
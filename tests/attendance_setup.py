@@ -0,0 +1,90 @@
+from datetime import datetime
+from typing import List
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlmodel import SQLModel
+from models import Course, Lecturer, LecturerCourses, Student, StudentCourses
+from schemas import AttendanceCreate, QRCodeCreate
+from services.lecturer.qrcode_service import QRCodeService
+from services.student.attendance_service import AttendanceService
+from util.qr_token_utils import issue_qr_token
+
+LATITUDE, LONGITUDE = 6.5, 3.3
+
+
+async def create_course_database(database_url: str, student_count: int):
+    """
+    Create the schema and one lecturer teaching CSC101 ("Intro") to
+    student_count enrolled students, matric numbers M0, M1, ...
+    """
+    engine = create_async_engine(database_url)
+    async with engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all)
+    session_factory = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+    lecturer = Lecturer(
+        lecturer_id=1,
+        lecturer_name="Ada",
+        lecturer_email="ada@example.com",
+        lecturer_department="CS",
+        lecturer_password="x",
+    )
+    students = [
+        Student(
+            matric_number=f"M{i}",
+            student_fullname=f"Student {i}",
+            student_email=f"m{i}@example.com",
+            student_password="x",
+        )
+        for i in range(student_count)
+    ]
+    async with session_factory() as db:
+        db.add(lecturer)
+        db.add(
+            Course(
+                course_code="CSC101",
+                course_name="Intro",
+                course_credits=3,
+                semester="2025/1",
+                creation_date=datetime.utcnow(),
+            )
+        )
+        db.add(LecturerCourses(lecturer_id=1, course_code="CSC101"))
+        db.add_all(students)
+        db.add_all(
+            StudentCourses(matric_number=student.matric_number, course_code="CSC101")
+            for student in students
+        )
+        await db.commit()
+    return engine, session_factory, lecturer, students
+
+
+async def generate_token(session_factory, lecturer: Lecturer) -> str:
+    async with session_factory() as db:
+        qr_code = await QRCodeService.generate_qr_code(
+            QRCodeCreate(course_code="CSC101", latitude=LATITUDE, longitude=LONGITUDE),
+            db,
+            lecturer,
+        )
+        return issue_qr_token(qr_code)
+
+
+async def scan(session_factory, student: Student, token: str):
+    # One session per scan, as concurrent requests would each have.
+    async with session_factory() as db:
+        return await AttendanceService.scan_qr_service(
+            AttendanceCreate(
+                matric_number=student.matric_number,
+                latitude=LATITUDE,
+                longitude=LONGITUDE,
+                token=token,
+            ),
+            db,
+            student,
+        )
+
+
+
+def outcomes(results: List) -> List[str]:
+    """The class name of each gathered result: "dict" for a marked scan."""
+    return sorted(type(result).__name__ for result in results)
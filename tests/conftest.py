@@ -0,0 +1,18 @@
+import os
+import sys
+import tempfile
+
+# The app reads its settings from the environment at import time; give the
+# tests a throwaway configuration unless one is already set.
+# A file, not ":memory:": the bulkhead engines are created with pool sizes,
+# which SQLite's in-memory pool does not take.
+os.environ.setdefault(
+    "DATABASE_URL",
+    f"sqlite+aiosqlite:///{os.path.join(tempfile.mkdtemp(), 'test.db')}",
+)
+os.environ.setdefault("SECRET_KEY", "test-secret")
+os.environ.setdefault("ALGORITHM", "HS256")
+os.environ.setdefault("ACCESS_TOKEN_EXPIRE_MINUTES", "60")
+os.environ.setdefault("BASE_URL", "https://attend.example.com")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,82 @@
+import asyncio
+from datetime import datetime
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlmodel import SQLModel
+from models import AttendanceSession, Course, Lecturer, LecturerCourses, QRCode
+from schemas import QRCodeCreate
+from services.lecturer.qrcode_service import QRCodeService
+
+CONCURRENT_GENERATIONS = 8
+
+
+async def generate_concurrently(database_url: str):
+    engine = create_async_engine(database_url)
+    async with engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all)
+    session_factory = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+    async with session_factory() as db:
+        lecturer = Lecturer(
+            lecturer_id=1,
+            lecturer_name="Ada",
+            lecturer_email="ada@example.com",
+            lecturer_department="CS",
+            lecturer_password="x",
+        )
+        db.add(lecturer)
+        db.add(
+            Course(
+                course_code="CSC101",
+                course_name="Intro",
+                course_credits=3,
+                semester="2025/1",
+                creation_date=datetime.utcnow(),
+            )
+        )
+        db.add(LecturerCourses(lecturer_id=1, course_code="CSC101"))
+        await db.commit()
+
+    async def generate():
+        # One session per caller, as concurrent requests would each have.
+        async with session_factory() as db:
+            qr_code = await QRCodeService.generate_qr_code(
+                QRCodeCreate(course_code="CSC101", latitude=6.5, longitude=3.3),
+                db,
+                lecturer,
+            )
+            return qr_code.qr_code_id, qr_code.hour_bucket
+
+    generated = await asyncio.gather(
+        *(generate() for _ in range(CONCURRENT_GENERATIONS))
+    )
+    hour_bucket = generated[0][1]
+
+    async with session_factory() as db:
+        qr_codes = await db.scalar(
+            select(func.count()).select_from(QRCode).where(
+                QRCode.course_code == "CSC101",
+                QRCode.lecturer_id == 1,
+                QRCode.hour_bucket == hour_bucket,
+            )
+        )
+        sessions = await db.scalar(
+            select(func.count()).select_from(AttendanceSession).where(
+                AttendanceSession.course_code == "CSC101",
+                AttendanceSession.lecturer_id == 1,
+                AttendanceSession.hour_bucket == hour_bucket,
+            )
+        )
+    await engine.dispose()
+    return [qr_code_id for qr_code_id, _ in generated], qr_codes, sessions
+
+
+def test_simultaneous_generations_share_one_session(tmp_path):
+    qr_code_ids, qr_codes, sessions = asyncio.run(
+        generate_concurrently(f"sqlite+aiosqlite:///{tmp_path / 'qr.db'}")
+    )
+
+    assert len(set(qr_code_ids)) == 1
+    assert qr_codes == 1
+    assert sessions == 1
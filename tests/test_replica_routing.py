@@ -0,0 +1,104 @@
+import asyncio
+import os
+from datetime import datetime
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlmodel import SQLModel
+import database
+from config import settings
+from models import Course
+
+PRINCIPALS = {"sub:ada@example.com"}
+
+
+async def create_schema(database_url: str):
+    engine = create_async_engine(database_url)
+    async with engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all)
+    await engine.dispose()
+
+
+def use_two_databases(monkeypatch, tmp_path):
+    """
+    Point the router at two SQLite files, the primary and its "replica". They
+    are not replicated, so where a read went shows in what it finds.
+    """
+    primary_url = f"sqlite+aiosqlite:///{tmp_path / 'primary.db'}"
+    replica_url = f"sqlite+aiosqlite:///{tmp_path / 'replica.db'}"
+    asyncio.run(create_schema(primary_url))
+    asyncio.run(create_schema(replica_url))
+
+    monkeypatch.setattr(database, "DATABASE_URL", primary_url)
+    monkeypatch.setattr(settings, "READ_DATABASE_URL", replica_url)
+    monkeypatch.setattr(database, "read_engine", create_async_engine(replica_url))
+    monkeypatch.setattr(
+        database, "bulkheads", {"interactive": database.Bulkhead("interactive", 2)}
+    )
+    monkeypatch.setattr(database, "replica_router", database.ReplicaRouter())
+    return tmp_path / "replica.db"
+
+
+async def add_course(course_code: str, principals):
+    async with database.bulkhead_session("interactive", principals) as db:
+        db.add(
+            Course(
+                course_code=course_code,
+                course_name=course_code,
+                course_credits=3,
+                semester="2025/1",
+                creation_date=datetime.utcnow(),
+            )
+        )
+        await db.commit()
+
+
+async def read_course(course_code: str, principals):
+    async with database.bulkhead_session(
+        "interactive", principals, read_only=True
+    ) as db:
+        return await db.get(Course, course_code)
+
+
+async def dispose():
+    for bulkhead in database.bulkheads.values():
+        await bulkhead.dispose()
+    await database.read_engine.dispose()
+
+
+async def read_before_and_after_own_write():
+    try:
+        await add_course("CSC101", {"sub:bob@example.com"})
+        before = await read_course("CSC101", PRINCIPALS)
+        await add_course("CSC102", PRINCIPALS)
+        after = await read_course("CSC101", PRINCIPALS)
+        other_reader = await read_course("CSC101", {"sub:carol@example.com"})
+    finally:
+        await dispose()
+    return before, after, other_reader
+
+
+async def read_after_replica_loss(replica_file):
+    try:
+        await add_course("CSC101", {"sub:bob@example.com"})
+        os.remove(replica_file)
+        course = await read_course("CSC101", PRINCIPALS)
+    finally:
+        await dispose()
+    return course, database.replica_router.replica_healthy
+
+
+def test_reads_stay_on_primary_after_own_write(monkeypatch, tmp_path):
+    use_two_databases(monkeypatch, tmp_path)
+    before, after, other_reader = asyncio.run(read_before_and_after_own_write())
+
+    # Unreplicated write: only a read served by the primary can see it.
+    assert before is None
+    assert after is not None
+    assert other_reader is None
+
+
+def test_read_fails_over_when_replica_file_is_missing(monkeypatch, tmp_path):
+    replica_file = use_two_databases(monkeypatch, tmp_path)
+    course, replica_healthy = asyncio.run(read_after_replica_loss(replica_file))
+
+    assert course is not None
+    assert replica_healthy is False
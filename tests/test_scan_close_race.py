@@ -0,0 +1,49 @@
+import asyncio
+from util.attendance_summary_utils import check_attendance_summaries
+from util.attendance_utils import close_session
+from util.qr_token_utils import verify_qr_token
+from tests.attendance_setup import (
+    create_course_database,
+    generate_token,
+    outcomes,
+    scan,
+)
+
+STUDENTS = 8
+
+
+async def scan_while_closing(database_url: str):
+    engine, session_factory, lecturer, students = await create_course_database(
+        database_url, STUDENTS
+    )
+    try:
+        token = await generate_token(session_factory, lecturer)
+        session_id = verify_qr_token(token).session_id
+
+        async def close():
+            async with session_factory() as db:
+                return await close_session(db, "CSC101", session_id)
+
+        # The close lands in the middle of the scans.
+        half = STUDENTS // 2
+        results = await asyncio.gather(
+            *(scan(session_factory, student, token) for student in students[:half]),
+            close(),
+            *(scan(session_factory, student, token) for student in students[half:]),
+            return_exceptions=True,
+        )
+        async with session_factory() as db:
+            mismatches = await check_attendance_summaries(db)
+    finally:
+        await engine.dispose()
+    return results[half], outcomes(results[:half] + results[half + 1:]), mismatches
+
+
+def test_scans_racing_session_close_keep_summaries_consistent(tmp_path):
+    closed, results, mismatches = asyncio.run(
+        scan_while_closing(f"sqlite+aiosqlite:///{tmp_path / 'scan.db'}")
+    )
+
+    assert closed is True
+    assert results == ["dict"] * STUDENTS
+    assert mismatches == []
@@ -0,0 +1,42 @@
+import asyncio
+from sqlalchemy import func, select
+from models import AttendanceRecords, StudentAttendanceSummary
+from tests.attendance_setup import (
+    create_course_database,
+    generate_token,
+    outcomes,
+    scan,
+)
+
+CONCURRENT_SCANS = 8
+
+
+async def scan_concurrently(database_url: str):
+    engine, session_factory, lecturer, students = await create_course_database(
+        database_url, 1
+    )
+    try:
+        token = await generate_token(session_factory, lecturer)
+        results = await asyncio.gather(
+            *(scan(session_factory, students[0], token) for _ in range(CONCURRENT_SCANS)),
+            return_exceptions=True,
+        )
+        async with session_factory() as db:
+            records = await db.scalar(
+                select(func.count()).select_from(AttendanceRecords)
+            )
+            summary = await db.get(StudentAttendanceSummary, ("M0", "CSC101"))
+    finally:
+        await engine.dispose()
+    return outcomes(results), records, summary
+
+
+def test_duplicate_scans_mark_once(tmp_path):
+    results, records, summary = asyncio.run(
+        scan_concurrently(f"sqlite+aiosqlite:///{tmp_path / 'scan.db'}")
+    )
+
+    assert results == ["MarkedAttendanceError"] * (CONCURRENT_SCANS - 1) + ["dict"]
+    assert records == 1
+    assert summary.attended_sessions == 1
+    assert summary.total_sessions == 1
@@ -0,0 +1,51 @@
+import asyncio
+import pytest
+from sqlalchemy import func, select
+from errors.qr_code_errors import QRCodeNotFoundError
+from models import AttendanceRecords
+from services.lecturer.qrcode_service import QRCodeService
+from util.attendance_summary_utils import check_attendance_summaries
+from tests.attendance_setup import create_course_database, generate_token, scan
+
+
+async def scan_after_delete(database_url: str, scan_first: bool):
+    engine, session_factory, lecturer, students = await create_course_database(
+        database_url, 2
+    )
+    token = await generate_token(session_factory, lecturer)
+    if scan_first:
+        await scan(session_factory, students[0], token)
+
+    async with session_factory() as db:
+        await QRCodeService.delete_qr_code("Intro", db, lecturer)
+
+    try:
+        with pytest.raises(QRCodeNotFoundError):
+            await scan(session_factory, students[1], token)
+        async with session_factory() as db:
+            records = await db.scalar(
+                select(func.count()).select_from(AttendanceRecords)
+            )
+            mismatches = await check_attendance_summaries(db)
+    finally:
+        await engine.dispose()
+    return records, mismatches
+
+
+def test_token_of_deleted_scanned_code_is_refused(tmp_path):
+    records, mismatches = asyncio.run(
+        scan_after_delete(f"sqlite+aiosqlite:///{tmp_path / 'scan.db'}", True)
+    )
+
+    # The voided session keeps its one record and stays out of the summaries.
+    assert records == 1
+    assert mismatches == []
+
+
+def test_token_of_deleted_unscanned_code_is_refused(tmp_path):
+    records, mismatches = asyncio.run(
+        scan_after_delete(f"sqlite+aiosqlite:///{tmp_path / 'scan.db'}", False)
+    )
+
+    assert records == 0
+    assert mismatches == []
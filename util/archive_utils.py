@@ -0,0 +1,247 @@
+import asyncio
+import gzip
+import json
+import os
+import re
+import shutil
+from datetime import datetime
+from typing import Dict, Iterator, List, Tuple
+from sqlalchemy import DateTime, delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from models import (
+    AttendanceSession,
+    AttendanceRecords,
+    ArchivedSemester,
+    Course,
+    QRCode,
+)
+from util.attendance_utils import close_session
+from config import settings
+
+# # --------------------
+# # Semester Archival
+# # --------------------
+#
+# A closed semester's sessions, QR codes and attendance records are moved out
+# of the hot tables into gzip-compressed files:
+#
+#   <ATTENDANCE_ARCHIVE_DIR>/<semester>/batch-<timestamp>/<table>.jsonl.gz
+#
+# The first line of each file lists the column names and every further line
+# holds one row's values, so readers filter rows as they decompress them and
+# only keep the matches. Every archive run writes a new batch, so
+# rows added after an earlier run are archived without rewriting old files.
+# Readers merge batches and dedupe on the primary key, which also makes a
+# batch left behind by a failed commit harmless.
+#
+# Archiving is what keeps the hot tables current-semester sized. Among the
+# hot reads only the lecturer matrix touches sessions and records, and it
+# filters on the course's semester to use the (semester, course_code) index;
+# student details read the per-student summaries, which stay in the database,
+# and the dashboard reads no attendance rows. Until a semester is archived
+# its rows stay in the hot tables.
+
+ARCHIVED_MODELS = (AttendanceSession, QRCode, AttendanceRecords)
+DELETE_CHUNK_SIZE = 500
+
+
+def _semester_dir(semester: str) -> str:
+    slug = re.sub(r"[^A-Za-z0-9._-]", "_", semester)
+    return os.path.join(settings.ATTENDANCE_ARCHIVE_DIR, slug)
+
+
+def _encode(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def write_row_file(path: str, table, rows: List[Dict]):
+    names = [column.name for column in table.columns]
+    with gzip.open(path, "wt", encoding="utf-8") as file:
+        file.write(json.dumps({"columns": names}) + "\n")
+        for row in rows:
+            file.write(
+                json.dumps([_encode(row[name]) for name in names], separators=(",", ":"))
+                + "\n"
+            )
+
+
+def _iter_row_file(path: str) -> Iterator[Dict]:
+    with gzip.open(path, "rt", encoding="utf-8") as file:
+        names = json.loads(file.readline())["columns"]
+        for line in file:
+            yield dict(zip(names, json.loads(line)))
+
+
+def read_archived_rows(semester: str, model, **equals) -> List[Dict]:
+    """
+    Read the archived rows of a table for a semester whose columns equal the
+    given values, merged across batches. Rows are filtered as they stream out
+    of the files, so only the matches are kept in memory.
+    """
+    table = model.__table__
+    directory = _semester_dir(semester)
+    if not os.path.isdir(directory):
+        return []
+
+    datetime_columns = {
+        column.name for column in table.columns if isinstance(column.type, DateTime)
+    }
+    key = table.primary_key.columns.values()[0].name
+    rows = {}
+    for batch in sorted(os.listdir(directory)):
+        if not batch.startswith("batch-"):
+            continue
+        path = os.path.join(directory, batch, f"{table.name}.jsonl.gz")
+        if not os.path.exists(path):
+            continue
+        for row in _iter_row_file(path):
+            if any(row.get(name) != value for name, value in equals.items()):
+                continue
+            for name in datetime_columns:
+                if row.get(name) is not None:
+                    row[name] = datetime.fromisoformat(row[name])
+            rows[row[key]] = row
+    return list(rows.values())
+
+
+async def fetch_archived_attendance(
+    semester: str, course_code: str
+) -> Tuple[List[Dict], List[Dict]]:
+    """
+    Fetch a course's archived sessions and presences. File reads run in a
+    worker thread so they don't stall the event loop.
+    """
+    sessions, records = await asyncio.gather(
+        asyncio.to_thread(
+            read_archived_rows, semester, AttendanceSession, course_code=course_code
+        ),
+        asyncio.to_thread(
+            read_archived_rows,
+            semester,
+            AttendanceRecords,
+            course_code=course_code,
+            status="Present",
+        ),
+    )
+    return sessions, records
+
+
+async def _delete_rows(db: AsyncSession, model, rows: List[Dict]):
+    column = model.__table__.primary_key.columns.values()[0]
+    keys = [row[column.name] for row in rows]
+    for start in range(0, len(keys), DELETE_CHUNK_SIZE):
+        await db.execute(
+            delete(model).where(column.in_(keys[start : start + DELETE_CHUNK_SIZE]))
+        )
+
+
+async def archive_semester(db: AsyncSession, semester: str) -> ArchivedSemester:
+    """
+    Move a semester's sessions, QR codes and attendance records to disk. Open
+    sessions are closed first so the summaries count them. Files are written
+    before the rows are deleted, and the deletes commit in one transaction.
+    """
+    if not semester or semester == settings.CURRENT_SEMESTER:
+        raise ValueError(f"Refusing to archive the current semester {semester!r}")
+
+    open_sessions = await db.execute(
+        select(AttendanceSession.session_id, AttendanceSession.course_code).where(
+            AttendanceSession.semester == semester,
+            AttendanceSession.closed_at.is_(None),
+        )
+    )
+    for session_id, course_code in open_sessions.all():
+        await close_session(db, course_code, session_id)
+
+    semester_sessions = select(AttendanceSession.session_id).where(
+        AttendanceSession.semester == semester
+    )
+    semester_courses = select(Course.course_code).where(Course.semester == semester)
+    queries = {
+        AttendanceSession: AttendanceSession.semester == semester,
+        QRCode: QRCode.session_id.in_(semester_sessions),
+        # Legacy records never linked to a session go with their course.
+        AttendanceRecords: AttendanceRecords.session_id.in_(semester_sessions)
+        | (
+            AttendanceRecords.session_id.is_(None)
+            & AttendanceRecords.course_code.in_(semester_courses)
+        ),
+    }
+    rows = {}
+    for model, condition in queries.items():
+        result = await db.execute(select(model.__table__).where(condition))
+        rows[model] = [dict(row) for row in result.mappings().all()]
+
+    batch_dir = None
+    if any(rows.values()):
+        directory = _semester_dir(semester)
+        batch_name = f"batch-{datetime.utcnow():%Y%m%dT%H%M%S%f}"
+        staging_dir = os.path.join(directory, f".{batch_name}")
+        os.makedirs(staging_dir)
+        for model, model_rows in rows.items():
+            write_row_file(
+                os.path.join(staging_dir, f"{model.__table__.name}.jsonl.gz"),
+                model.__table__,
+                model_rows,
+            )
+        batch_dir = os.path.join(directory, batch_name)
+        os.replace(staging_dir, batch_dir)
+
+    try:
+        # Children first: records and QR codes reference their session.
+        for model in reversed(ARCHIVED_MODELS):
+            await _delete_rows(db, model, rows[model])
+
+        archived = await db.get(ArchivedSemester, semester)
+        if archived is None:
+            archived = ArchivedSemester(semester=semester)
+            db.add(archived)
+        archived.archived_at = datetime.utcnow()
+        archived.session_count += len(rows[AttendanceSession])
+        archived.record_count += len(rows[AttendanceRecords])
+        await db.commit()
+    except Exception:
+        await db.rollback()
+        if batch_dir is not None:
+            shutil.rmtree(batch_dir, ignore_errors=True)
+        raise
+
+    return archived
+
+
+async def fetch_closed_semesters(db: AsyncSession) -> List[str]:
+    """
+    Semesters that still have rows in the hot tables, other than the current one.
+    """
+    result = await db.execute(
+        select(AttendanceSession.semester)
+        .where(
+            AttendanceSession.semester.is_not(None),
+            AttendanceSession.semester != settings.CURRENT_SEMESTER,
+        )
+        .distinct()
+    )
+    return sorted(result.scalars().all())
+
+
+if __name__ == "__main__":
+    import sys
+    from database import async_session
+
+    async def main():
+        async with async_session() as db:
+            semesters = sys.argv[1:]
+            if semesters == ["--closed"]:
+                if not settings.CURRENT_SEMESTER:
+                    sys.exit("Set CURRENT_SEMESTER before archiving closed semesters")
+                semesters = await fetch_closed_semesters(db)
+            if not semesters:
+                sys.exit("usage: python -m util.archive_utils (<semester>... | --closed)")
+            for semester in semesters:
+                archived = await archive_semester(db, semester)
+                print(
+                    f"{semester}: {archived.session_count} sessions, "
+                    f"{archived.record_count} records archived"
+                )
+
+    asyncio.run(main())
@@ -0,0 +1,258 @@
+import asyncio
+from typing import Dict, Iterable, NamedTuple, Optional
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from models import AttendanceRecords, AttendanceSession, Student, StudentCourses
+from util.attendance_summary_utils import archived_courses_query
+from config import settings
+
+# # --------------------
+# # At-Risk Attendance Analytics
+# # --------------------
+#
+# Attendance is loaded in bulk as four flat arrays (sessions, enrollments,
+# presences) and expanded into one row per enrolled student per session of
+# their course, ordered by session start within each enrollment. Ratios,
+# absence streaks and threshold breaches are then computed for every course
+# at once with array operations instead of per-course queries.
+#
+# A session counts once it is closed, or earlier for students who already
+# scanned, the same rule as the attendance summaries.
+
+
+class AttendanceArrays(NamedTuple):
+    course_codes: np.ndarray  # course index -> course code
+    matric_numbers: np.ndarray  # student index -> matric number
+    session_course: np.ndarray  # per session (course, start order): course index
+    session_closed: np.ndarray  # per session: closed or not
+    enrollment_course: np.ndarray  # per enrollment: course index
+    enrollment_student: np.ndarray  # per enrollment: student index
+    presence_session: np.ndarray  # per Present record: session index
+    presence_student: np.ndarray  # per Present record: student index
+
+
+class AttendanceRisk(NamedTuple):
+    course: np.ndarray  # per enrollment: course index
+    student: np.ndarray  # per enrollment: student index
+    held: np.ndarray  # sessions counted
+    attended: np.ndarray
+    percentage: np.ndarray
+    longest_absence_streak: np.ndarray
+    current_absence_streak: np.ndarray
+    at_risk: np.ndarray
+
+
+def _index_of(values: np.ndarray, keys: np.ndarray):
+    """Positions of keys in the sorted array values, and which keys are in it."""
+    if not len(values):
+        return np.zeros(len(keys), dtype=np.int64), np.zeros(len(keys), dtype=bool)
+    positions = np.searchsorted(values, keys).clip(max=len(values) - 1)
+    return positions, values[positions] == keys
+
+
+def _in_scope(column, course_codes: Optional[Iterable[str]]):
+    if course_codes is None:
+        return column.not_in(archived_courses_query())
+    return column.in_(list(course_codes))
+
+
+async def load_attendance_arrays(
+    db: AsyncSession, course_codes: Optional[Iterable[str]] = None
+) -> AttendanceArrays:
+    """
+    Load the sessions, enrollments and presences of the given courses (every
+    course that is not archived by default) with three column queries.
+    """
+    enrollments = (
+        await db.execute(
+            select(StudentCourses.course_code, StudentCourses.matric_number).where(
+                _in_scope(StudentCourses.course_code, course_codes)
+            )
+        )
+    ).all()
+    sessions = (
+        await db.execute(
+            select(
+                AttendanceSession.session_id,
+                AttendanceSession.course_code,
+                AttendanceSession.closed_at.is_not(None),
+            )
+            .where(
+                _in_scope(AttendanceSession.course_code, course_codes),
+                AttendanceSession.voided_at.is_(None),
+            )
+            .order_by(AttendanceSession.course_code, AttendanceSession.started_at)
+        )
+    ).all()
+    presences = (
+        await db.execute(
+            select(AttendanceRecords.session_id, AttendanceRecords.matric_number).where(
+                _in_scope(AttendanceRecords.course_code, course_codes),
+                AttendanceRecords.status == "Present",
+            )
+        )
+    ).all()
+
+    enrollment_courses = np.array([row[0] for row in enrollments], dtype=str)
+    enrollment_students = np.array([row[1] for row in enrollments], dtype=str)
+    session_ids = np.array([row[0] for row in sessions], dtype=np.int64)
+    session_courses = np.array([row[1] for row in sessions], dtype=str)
+    presence_sessions = np.array([row[0] or 0 for row in presences], dtype=np.int64)
+    presence_students = np.array([row[1] for row in presences], dtype=str)
+
+    courses = np.unique(np.concatenate([enrollment_courses, session_courses]))
+    students = np.unique(enrollment_students)
+
+    # Session ids are not in start order; index them through a sorted copy.
+    id_order = np.argsort(session_ids)
+    session_position, session_known = _index_of(session_ids[id_order], presence_sessions)
+    student_position, student_known = _index_of(students, presence_students)
+    # Drop presences of unknown sessions or of students no longer enrolled.
+    known = session_known & student_known
+
+    return AttendanceArrays(
+        course_codes=courses,
+        matric_numbers=students,
+        session_course=np.searchsorted(courses, session_courses),
+        session_closed=np.array([row[2] for row in sessions], dtype=bool),
+        enrollment_course=np.searchsorted(courses, enrollment_courses),
+        enrollment_student=np.searchsorted(students, enrollment_students),
+        presence_session=id_order[session_position[known]],
+        presence_student=student_position[known],
+    )
+
+
+def compute_attendance_risk(
+    arrays: AttendanceArrays, threshold: float
+) -> AttendanceRisk:
+    """
+    Per enrollment: sessions held and attended, attendance percentage, the
+    longest and the current run of consecutive absences, and whether the
+    percentage is below threshold.
+    """
+    course_count = len(arrays.course_codes)
+    sessions_per_course = np.bincount(arrays.session_course, minlength=course_count)
+    # Sessions are ordered by course, so each course's sessions are one slice.
+    first_session = np.concatenate([[0], np.cumsum(sessions_per_course)[:-1]])
+
+    # One row per (enrollment, session of its course), sessions in start order:
+    # enrollment e owns rows block_start[e] onwards, one per session.
+    row_counts = sessions_per_course[arrays.enrollment_course]
+    enrollment_count = len(row_counts)
+    block_start = np.concatenate([[0], np.cumsum(row_counts)[:-1]]).astype(np.int64)
+    row_enrollment = np.repeat(np.arange(enrollment_count), row_counts)
+    row_session = np.arange(len(row_enrollment)) - block_start[row_enrollment]
+    row_session += first_session[arrays.enrollment_course][row_enrollment]
+
+    # Place each presence on its row directly: find its enrollment by
+    # (course, student) key, then offset by the session's position in the course.
+    student_count = max(len(arrays.matric_numbers), 1)
+    enrollment_key = arrays.enrollment_course * student_count + arrays.enrollment_student
+    key_order = np.argsort(enrollment_key)
+    presence_course = arrays.session_course[arrays.presence_session]
+    enrollment_position, enrolled = _index_of(
+        enrollment_key[key_order], presence_course * student_count + arrays.presence_student
+    )
+    presence_enrollment = key_order[enrollment_position[enrolled]]
+    present = np.zeros(len(row_enrollment), dtype=bool)
+    present[
+        block_start[presence_enrollment]
+        + arrays.presence_session[enrolled]
+        - first_session[presence_course[enrolled]]
+    ] = True
+
+    # Rows of open sessions the student has not scanned yet do not count.
+    counted = present | arrays.session_closed[row_session]
+    row_enrollment = row_enrollment[counted]
+    present = present[counted]
+
+    held = np.bincount(row_enrollment, minlength=enrollment_count)
+    attended = np.bincount(row_enrollment[present], minlength=enrollment_count)
+    percentage = np.divide(
+        attended * 100.0, held, out=np.zeros(enrollment_count), where=held > 0
+    )
+
+    # Absence runs: each row knows where its run started, as the latest
+    # position after a presence or the start of its enrollment's rows.
+    positions = np.arange(len(row_enrollment))
+    new_block = np.ones(len(row_enrollment), dtype=bool)
+    new_block[1:] = row_enrollment[1:] != row_enrollment[:-1]
+    run_start = np.maximum.accumulate(
+        np.where(present, positions + 1, np.where(new_block, positions, 0))
+    )
+    run_length = np.where(present, 0, positions - run_start + 1)
+
+    longest = np.zeros(enrollment_count, dtype=np.int64)
+    current = np.zeros(enrollment_count, dtype=np.int64)
+    if len(positions):
+        first_row = np.flatnonzero(new_block)
+        last_row = np.append(first_row[1:] - 1, len(positions) - 1)
+        longest[row_enrollment[first_row]] = np.maximum.reduceat(run_length, first_row)
+        current[row_enrollment[last_row]] = run_length[last_row]
+
+    return AttendanceRisk(
+        course=arrays.enrollment_course,
+        student=arrays.enrollment_student,
+        held=held,
+        attended=attended,
+        percentage=percentage,
+        longest_absence_streak=longest,
+        current_absence_streak=current,
+        at_risk=(held > 0) & (percentage < threshold),
+    )
+
+
+async def fetch_at_risk_report(
+    db: AsyncSession,
+    course_codes: Optional[Iterable[str]],
+    page: int,
+    page_size: int,
+    threshold: Optional[float] = None,
+) -> Dict:
+    """
+    One page of the students below threshold, lowest percentage first, with
+    their names looked up for that page only.
+    """
+    threshold = settings.ATTENDANCE_AT_RISK_THRESHOLD if threshold is None else threshold
+    arrays = await load_attendance_arrays(db, course_codes)
+    # Off the event loop: large arrays take a while and NumPy releases the GIL.
+    risk = await asyncio.to_thread(compute_attendance_risk, arrays, threshold)
+
+    flagged = np.flatnonzero(risk.at_risk)
+    # Lowest percentage first, then the longest current absence streak.
+    flagged = flagged[
+        np.lexsort((-risk.current_absence_streak[flagged], risk.percentage[flagged]))
+    ]
+    page_rows = flagged[(page - 1) * page_size : page * page_size]
+
+    matric_numbers = [str(arrays.matric_numbers[risk.student[row]]) for row in page_rows]
+    names = dict(
+        (
+            await db.execute(
+                select(Student.matric_number, Student.student_fullname).where(
+                    Student.matric_number.in_(matric_numbers)
+                )
+            )
+        ).all()
+    )
+
+    return {
+        "threshold": threshold,
+        "total": len(flagged),
+        "page": page,
+        "page_size": page_size,
+        "students": [
+            {
+                "matric_number": matric_number,
+                "full_name": names.get(matric_number, ""),
+                "course_code": str(arrays.course_codes[risk.course[row]]),
+                "sessions_held": int(risk.held[row]),
+                "sessions_attended": int(risk.attended[row]),
+                "attendance_percentage": round(float(risk.percentage[row]), 2),
+                "longest_absence_streak": int(risk.longest_absence_streak[row]),
+                "current_absence_streak": int(risk.current_absence_streak[row]),
+            }
+            for matric_number, row in zip(matric_numbers, page_rows)
+        ],
+    }
@@ -0,0 +1,122 @@
+import asyncio
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, Optional, Set
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from models import AttendanceRecords, AttendanceSession, Student, StudentCourses
+from config import settings
+
+# # --------------------
+# # Live Attendance Feed
+# # --------------------
+#
+# The scan path publishes each accepted scan to the subscribers of its
+# session. Publishing never waits: every subscriber has a bounded queue, and
+# a subscriber that falls behind has its backlog replaced by one RESYNC
+# marker, after which it is sent a fresh roster instead of the missed events.
+# The broker is per process, so a subscriber only hears scans handled by the
+# worker it is connected to.
+
+RESYNC = {"type": "resync"}
+
+
+class FeedSubscription:
+    def __init__(self, session_id: int):
+        self.session_id = session_id
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=settings.FEED_QUEUE_SIZE)
+        self.resyncs = 0
+
+    def offer(self, event: Dict):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Too slow to keep up: collapse the backlog into a single resync.
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(RESYNC)
+            self.resyncs += 1
+
+
+class AttendanceFeedBroker:
+    def __init__(self):
+        self._subscribers: Dict[int, Set[FeedSubscription]] = defaultdict(set)
+
+    def subscribe(self, session_id: int) -> FeedSubscription:
+        subscription = FeedSubscription(session_id)
+        self._subscribers[session_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: FeedSubscription):
+        subscribers = self._subscribers.get(subscription.session_id)
+        if subscribers is not None:
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self._subscribers[subscription.session_id]
+
+    def publish(self, session_id: int, event: Dict):
+        for subscription in tuple(self._subscribers.get(session_id, ())):
+            subscription.offer(event)
+
+    def subscriber_count(self, session_id: Optional[int] = None) -> int:
+        if session_id is not None:
+            return len(self._subscribers.get(session_id, ()))
+        return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+
+attendance_feed = AttendanceFeedBroker()
+
+
+def publish_scan(session_id: int, matric_number: str, full_name: str, scanned_at: datetime):
+    attendance_feed.publish(
+        session_id,
+        {
+            "type": "scan",
+            "matric_number": matric_number,
+            "full_name": full_name,
+            "scanned_at": scanned_at.isoformat(),
+        },
+    )
+
+
+def publish_session_closed(session_id: int):
+    attendance_feed.publish(session_id, {"type": "closed"})
+
+
+async def fetch_session_roster(db: AsyncSession, session: AttendanceSession) -> Dict:
+    """
+    Build the roster of a session: every enrolled student and whether they
+    have scanned. Cheap compared to the course matrix, it covers one session.
+    """
+    result = await db.execute(
+        select(
+            Student.matric_number,
+            Student.student_fullname,
+            AttendanceRecords.date,
+        )
+        .join(StudentCourses, StudentCourses.matric_number == Student.matric_number)
+        .outerjoin(
+            AttendanceRecords,
+            (AttendanceRecords.matric_number == Student.matric_number)
+            & (AttendanceRecords.session_id == session.session_id)
+            & (AttendanceRecords.status == "Present"),
+        )
+        .where(StudentCourses.course_code == session.course_code)
+        .order_by(Student.matric_number)
+    )
+    return {
+        "type": "snapshot",
+        "session_id": session.session_id,
+        "course_code": session.course_code,
+        "started_at": session.started_at.isoformat(),
+        "closed": session.closed_at is not None,
+        "students": [
+            {
+                "matric_number": matric_number,
+                "full_name": full_name,
+                "status": "Present" if scanned_at else "Absent",
+                "scanned_at": scanned_at.isoformat() if scanned_at else None,
+            }
+            for matric_number, full_name, scanned_at in result.all()
+        ],
+    }
@@ -0,0 +1,327 @@
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional
+from sqlalchemy import delete, func, literal, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from models import (
+    AttendanceRecords,
+    AttendanceSession,
+    Course,
+    Lecturer,
+    SessionAttendanceRollup,
+    StudentCourses,
+    WeeklyAttendanceRollup,
+)
+from utils import dialect_insert, insert_ignoring_conflicts
+
+# # --------------------
+# # Attendance Rollups
+# # --------------------
+#
+# Trends are read from two pre-aggregated tables instead of the raw rows:
+#   SessionAttendanceRollup  one row per closed session: enrolled and present
+#   WeeklyAttendanceRollup   per department, semester, calendar week and course:
+#                            sessions, expected and present attendances
+# Closing a session writes its session row and adds it to its weekly row, in
+# the closing transaction; voiding one takes it back out. Department and semester drill down to courses
+# from the weekly rows, and courses to sessions from the session rows.
+
+
+def week_start(moment) -> date:
+    """Monday of the calendar week a date or datetime falls in."""
+    day = moment.date() if isinstance(moment, datetime) else moment
+    return day - timedelta(days=day.weekday())
+
+
+def session_rollup_query():
+    """
+    The rollup values of sessions: department of the lecturer who ran them,
+    semester, enrolled students and students present.
+    """
+    enrolled = (
+        select(func.count())
+        .select_from(StudentCourses)
+        .where(StudentCourses.course_code == AttendanceSession.course_code)
+        .scalar_subquery()
+    )
+    present = (
+        select(func.count())
+        .select_from(AttendanceRecords)
+        .where(
+            AttendanceRecords.session_id == AttendanceSession.session_id,
+            AttendanceRecords.status == "Present",
+        )
+        .scalar_subquery()
+    )
+    return (
+        select(
+            AttendanceSession.session_id,
+            AttendanceSession.course_code,
+            AttendanceSession.lecturer_id,
+            Lecturer.lecturer_department,
+            func.coalesce(AttendanceSession.semester, Course.semester, literal("")),
+            AttendanceSession.started_at,
+            enrolled,
+            present,
+        )
+        .join(Lecturer, Lecturer.lecturer_id == AttendanceSession.lecturer_id)
+        .join(Course, Course.course_code == AttendanceSession.course_code)
+    )
+
+
+def _rollup_values(row) -> Dict:
+    session_id, course_code, lecturer_id, department, semester, started_at, enrolled, present = row
+    return {
+        "session_id": session_id,
+        "course_code": course_code,
+        "lecturer_id": lecturer_id,
+        "department": department,
+        "semester": semester,
+        "week_start": week_start(started_at),
+        "started_at": started_at,
+        "enrolled_students": enrolled,
+        # Present students who later left the course still count as present.
+        "present_students": present,
+    }
+
+
+async def record_session_close_in_rollups(db: AsyncSession, session_id: int):
+    """
+    Add a closed session to the rollups. Runs in the transaction that closes
+    it; a session already rolled up is left alone, so it counts only once.
+    """
+    row = (
+        await db.execute(
+            session_rollup_query().where(AttendanceSession.session_id == session_id)
+        )
+    ).first()
+    if row is None:
+        return
+    values = _rollup_values(row)
+    inserted = (
+        await db.execute(
+            insert_ignoring_conflicts(db, SessionAttendanceRollup, ["session_id"])
+            .values(**values)
+            .returning(SessionAttendanceRollup.session_id)
+        )
+    ).first()
+    if inserted is None:
+        return
+
+    now = datetime.utcnow()
+    statement = dialect_insert(db, WeeklyAttendanceRollup).values(
+        department=values["department"],
+        semester=values["semester"],
+        week_start=values["week_start"],
+        course_code=values["course_code"],
+        sessions=1,
+        expected_attendances=values["enrolled_students"],
+        present_attendances=values["present_students"],
+        updated_at=now,
+    )
+    await db.execute(
+        statement.on_conflict_do_update(
+            index_elements=["department", "semester", "week_start", "course_code"],
+            set_={
+                "sessions": WeeklyAttendanceRollup.sessions + 1,
+                "expected_attendances": WeeklyAttendanceRollup.expected_attendances
+                + values["enrolled_students"],
+                "present_attendances": WeeklyAttendanceRollup.present_attendances
+                + values["present_students"],
+                "updated_at": now,
+            },
+        )
+    )
+
+
+async def remove_session_from_rollups(db: AsyncSession, session_id: int):
+    """
+    Take a void session back out of the rollups, if it was rolled up.
+    """
+    rollup = await db.get(SessionAttendanceRollup, session_id)
+    if rollup is None:
+        return
+    await db.execute(
+        update(WeeklyAttendanceRollup)
+        .where(
+            WeeklyAttendanceRollup.department == rollup.department,
+            WeeklyAttendanceRollup.semester == rollup.semester,
+            WeeklyAttendanceRollup.week_start == rollup.week_start,
+            WeeklyAttendanceRollup.course_code == rollup.course_code,
+        )
+        .values(
+            sessions=WeeklyAttendanceRollup.sessions - 1,
+            expected_attendances=WeeklyAttendanceRollup.expected_attendances
+            - rollup.enrolled_students,
+            present_attendances=WeeklyAttendanceRollup.present_attendances
+            - rollup.present_students,
+            updated_at=datetime.utcnow(),
+        )
+    )
+    await db.delete(rollup)
+
+
+def rebuild_attendance_rollups(conn):
+    """
+    Recompute both rollups from the closed, non-void sessions still in the live tables.
+    Synchronous, for migrations. Rollups of archived sessions are kept.
+    """
+    rows = [
+        _rollup_values(row)
+        for row in conn.execute(
+            session_rollup_query().where(
+                AttendanceSession.closed_at.is_not(None),
+                AttendanceSession.voided_at.is_(None),
+            )
+        )
+    ]
+    conn.execute(
+        delete(SessionAttendanceRollup).where(
+            SessionAttendanceRollup.session_id.in_(
+                select(AttendanceSession.session_id).where(
+                    AttendanceSession.closed_at.is_not(None)
+                )
+            )
+        )
+    )
+    if rows:
+        conn.execute(SessionAttendanceRollup.__table__.insert(), rows)
+
+    # The weekly rows are re-derived from every session row, archived ones included.
+    weekly: Dict[tuple, Dict] = {}
+    now = datetime.utcnow()
+    for rollup in conn.execute(select(SessionAttendanceRollup.__table__)).mappings():
+        key = (
+            rollup["department"],
+            rollup["semester"],
+            rollup["week_start"],
+            rollup["course_code"],
+        )
+        entry = weekly.setdefault(
+            key,
+            {
+                "department": rollup["department"],
+                "semester": rollup["semester"],
+                "week_start": rollup["week_start"],
+                "course_code": rollup["course_code"],
+                "sessions": 0,
+                "expected_attendances": 0,
+                "present_attendances": 0,
+                "updated_at": now,
+            },
+        )
+        entry["sessions"] += 1
+        entry["expected_attendances"] += rollup["enrolled_students"]
+        entry["present_attendances"] += rollup["present_students"]
+    conn.execute(delete(WeeklyAttendanceRollup))
+    if weekly:
+        conn.execute(WeeklyAttendanceRollup.__table__.insert(), list(weekly.values()))
+
+
+# Drill-down queries. They read the rollup tables only.
+
+
+def _percentage(present: int, expected: int) -> float:
+    return round(present * 100 / expected, 2) if expected else 0.0
+
+
+def _weekly_filters(semester, week_from, week_to):
+    filters = []
+    if semester is not None:
+        filters.append(WeeklyAttendanceRollup.semester == semester)
+    if week_from is not None:
+        filters.append(WeeklyAttendanceRollup.week_start >= week_start(week_from))
+    if week_to is not None:
+        filters.append(WeeklyAttendanceRollup.week_start <= week_to)
+    return filters
+
+
+def _weekly_totals(*group_by):
+    return select(
+        *group_by,
+        WeeklyAttendanceRollup.semester,
+        WeeklyAttendanceRollup.week_start,
+        func.sum(WeeklyAttendanceRollup.sessions),
+        func.sum(WeeklyAttendanceRollup.expected_attendances),
+        func.sum(WeeklyAttendanceRollup.present_attendances),
+    ).group_by(*group_by, WeeklyAttendanceRollup.semester, WeeklyAttendanceRollup.week_start)
+
+
+def _trend_row(key: str, value, semester, week, sessions, expected, present) -> Dict:
+    return {
+        key: value,
+        "semester": semester,
+        "week_start": week,
+        "sessions": sessions,
+        "expected_attendances": expected,
+        "present_attendances": present,
+        "attendance_percentage": _percentage(present, expected),
+    }
+
+
+async def fetch_department_trends(
+    db: AsyncSession,
+    semester: Optional[str] = None,
+    week_from: Optional[date] = None,
+    week_to: Optional[date] = None,
+) -> List[Dict]:
+    """Attendance per department, semester and week."""
+    result = await db.execute(
+        _weekly_totals(WeeklyAttendanceRollup.department)
+        .where(*_weekly_filters(semester, week_from, week_to))
+        .order_by(WeeklyAttendanceRollup.department, WeeklyAttendanceRollup.week_start)
+    )
+    return [_trend_row("department", *row) for row in result.all()]
+
+
+async def fetch_course_trends(
+    db: AsyncSession,
+    department: str,
+    semester: Optional[str] = None,
+    week_from: Optional[date] = None,
+    week_to: Optional[date] = None,
+) -> List[Dict]:
+    """Attendance per course and week within one department."""
+    result = await db.execute(
+        _weekly_totals(WeeklyAttendanceRollup.course_code)
+        .where(
+            WeeklyAttendanceRollup.department == department,
+            *_weekly_filters(semester, week_from, week_to),
+        )
+        .order_by(WeeklyAttendanceRollup.course_code, WeeklyAttendanceRollup.week_start)
+    )
+    return [_trend_row("course_code", *row) for row in result.all()]
+
+
+async def fetch_session_trends(
+    db: AsyncSession,
+    course_code: str,
+    semester: Optional[str] = None,
+    week_from: Optional[date] = None,
+    week_to: Optional[date] = None,
+) -> List[Dict]:
+    """Attendance of each closed session of one course."""
+    query = select(SessionAttendanceRollup).where(
+        SessionAttendanceRollup.course_code == course_code
+    )
+    if semester is not None:
+        query = query.where(SessionAttendanceRollup.semester == semester)
+    if week_from is not None:
+        query = query.where(SessionAttendanceRollup.week_start >= week_start(week_from))
+    if week_to is not None:
+        query = query.where(SessionAttendanceRollup.week_start <= week_to)
+    result = await db.execute(query.order_by(SessionAttendanceRollup.started_at))
+    return [
+        {
+            "session_id": rollup.session_id,
+            "department": rollup.department,
+            "semester": rollup.semester,
+            "week_start": rollup.week_start,
+            "started_at": rollup.started_at,
+            "enrolled_students": rollup.enrolled_students,
+            "present_students": rollup.present_students,
+            "attendance_percentage": _percentage(
+                rollup.present_students, rollup.enrolled_students
+            ),
+        }
+        for rollup in result.scalars().all()
+    ]
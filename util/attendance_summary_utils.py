@@ -0,0 +1,312 @@
+from datetime import datetime
+from sqlalchemy import select, func, update, delete, exists, literal, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+from models import (
+    ArchivedSemester,
+    AttendanceSession,
+    AttendanceRecords,
+    Course,
+    Lecturer,
+    LecturerCourses,
+    StudentCourses,
+    StudentAttendanceSummary,
+)
+from utils import dialect_insert, insert_ignoring_conflicts
+
+# # --------------------
+# # Attendance Summaries
+# # --------------------
+#
+# One StudentAttendanceSummary row per (student, course) holds
+#   attended_sessions = sessions the student was present at
+#   total_sessions    = closed sessions + open sessions the student attended
+# Void sessions (their QR code was deleted) count in neither.
+# The scan path bumps both counters for the scanning student; closing a
+# session bumps total_sessions for every enrolled student who missed it. Both
+# hold the session row lock, so a scan landing after the close only bumps
+# attended_sessions: the close has already counted the session.
+
+
+async def record_presence_in_summary(
+    db: AsyncSession, matric_number: str, course_code: str, session_closed: bool = False
+):
+    """
+    Count a new presence. Runs in the scan's transaction, after the insert.
+    A session already closed is already in total_sessions.
+    """
+    now = datetime.utcnow()
+    new_session = 0 if session_closed else 1
+    statement = dialect_insert(db, StudentAttendanceSummary).values(
+        matric_number=matric_number,
+        course_code=course_code,
+        attended_sessions=1,
+        total_sessions=new_session,
+        updated_at=now,
+    )
+    await db.execute(
+        statement.on_conflict_do_update(
+            index_elements=["matric_number", "course_code"],
+            set_={
+                "attended_sessions": StudentAttendanceSummary.attended_sessions + 1,
+                "total_sessions": StudentAttendanceSummary.total_sessions
+                + new_session,
+                "updated_at": now,
+            },
+        )
+    )
+
+
+async def record_session_close_in_summary(
+    db: AsyncSession, course_code: str, session_id: int
+):
+    """
+    Count a closed session against every enrolled student who missed it.
+    Must run exactly once per session, in the transaction that closes it.
+    """
+    now = datetime.utcnow()
+    enrolled = select(StudentCourses.matric_number).where(
+        StudentCourses.course_code == course_code
+    )
+    present = select(AttendanceRecords.matric_number).where(
+        AttendanceRecords.session_id == session_id,
+        AttendanceRecords.status == "Present",
+    )
+
+    await db.execute(
+        insert_ignoring_conflicts(
+            db, StudentAttendanceSummary, ["matric_number", "course_code"]
+        ).from_select(
+            [
+                "matric_number",
+                "course_code",
+                "attended_sessions",
+                "total_sessions",
+                "updated_at",
+            ],
+            select(
+                StudentCourses.matric_number,
+                StudentCourses.course_code,
+                literal(0),
+                literal(0),
+                literal(now),
+            ).where(StudentCourses.course_code == course_code),
+        )
+    )
+    await db.execute(
+        update(StudentAttendanceSummary)
+        .where(
+            StudentAttendanceSummary.course_code == course_code,
+            StudentAttendanceSummary.matric_number.in_(enrolled),
+            StudentAttendanceSummary.matric_number.not_in(present),
+        )
+        .values(
+            total_sessions=StudentAttendanceSummary.total_sessions + 1,
+            updated_at=now,
+        )
+    )
+
+
+async def fetch_student_attendance_summaries(db: AsyncSession, matric_number: str):
+    """
+    Fetch one row per enrolled course with its summary counters and lecturers.
+    """
+    result = await db.execute(
+        select(
+            Course.course_code,
+            Course.course_name,
+            Course.semester,
+            Course.course_credits,
+            func.coalesce(StudentAttendanceSummary.attended_sessions, 0).label(
+                "attended_sessions"
+            ),
+            func.coalesce(StudentAttendanceSummary.total_sessions, 0).label(
+                "total_sessions"
+            ),
+        )
+        .join(StudentCourses, StudentCourses.course_code == Course.course_code)
+        .outerjoin(
+            StudentAttendanceSummary,
+            (StudentAttendanceSummary.matric_number == StudentCourses.matric_number)
+            & (StudentAttendanceSummary.course_code == StudentCourses.course_code),
+        )
+        .where(StudentCourses.matric_number == matric_number)
+        .order_by(Course.course_code)
+    )
+    courses = result.all()
+
+    lecturers = {}
+    if courses:
+        lecturer_result = await db.execute(
+            select(LecturerCourses.course_code, Lecturer.lecturer_name)
+            .join(Lecturer, Lecturer.lecturer_id == LecturerCourses.lecturer_id)
+            .where(LecturerCourses.course_code.in_([c.course_code for c in courses]))
+        )
+        for course_code, lecturer_name in lecturer_result.all():
+            lecturers.setdefault(course_code, []).append(lecturer_name)
+
+    return [
+        (course, ", ".join(sorted(lecturers.get(course.course_code, []))))
+        for course in courses
+    ]
+
+
+def archived_courses_query():
+    """
+    Courses of archived semesters. Their raw rows live in the archive files,
+    so their summaries are final and are never recomputed.
+    """
+    return select(Course.course_code).join(
+        ArchivedSemester, ArchivedSemester.semester == Course.semester
+    )
+
+
+def expected_summaries_query(matric_number: str = None, course_code: str = None):
+    """
+    Derive the summary counters for enrolled students from the raw rows.
+    """
+    enrolled = StudentCourses.__table__
+    sessions = AttendanceSession.__table__
+    records = AttendanceRecords.__table__
+
+    # Explicit correlation: enrolled lives two levels up, past the count subquery.
+    present = (
+        exists()
+        .where(
+            records.c.session_id == sessions.c.session_id,
+            records.c.matric_number == enrolled.c.matric_number,
+            records.c.status == "Present",
+        )
+        .correlate(sessions, enrolled)
+    )
+    attended = (
+        select(func.count())
+        .select_from(sessions)
+        .where(
+            sessions.c.course_code == enrolled.c.course_code,
+            sessions.c.voided_at.is_(None),
+            present,
+        )
+        .scalar_subquery()
+    )
+    total = (
+        select(func.count())
+        .select_from(sessions)
+        .where(
+            sessions.c.course_code == enrolled.c.course_code,
+            sessions.c.voided_at.is_(None),
+            or_(sessions.c.closed_at.is_not(None), present),
+        )
+        .scalar_subquery()
+    )
+    query = select(
+        enrolled.c.matric_number,
+        enrolled.c.course_code,
+        attended.label("attended_sessions"),
+        total.label("total_sessions"),
+    ).where(enrolled.c.course_code.not_in(archived_courses_query()))
+    if matric_number is not None:
+        query = query.where(enrolled.c.matric_number == matric_number)
+    if course_code is not None:
+        query = query.where(enrolled.c.course_code == course_code)
+    return query
+
+
+def rebuild_attendance_summaries(
+    conn, matric_number: str = None, course_code: str = None
+):
+    """
+    Recompute summaries from the raw rows in two set-based statements, for
+    everyone or for one student or course. Takes a synchronous connection, so
+    it serves both migrations and run_sync.
+    """
+    summaries = StudentAttendanceSummary.__table__
+    clear = delete(summaries).where(
+        summaries.c.course_code.not_in(archived_courses_query())
+    )
+    if matric_number is not None:
+        clear = clear.where(summaries.c.matric_number == matric_number)
+    if course_code is not None:
+        clear = clear.where(summaries.c.course_code == course_code)
+    conn.execute(clear)
+
+    expected = expected_summaries_query(matric_number, course_code).subquery()
+    conn.execute(
+        summaries.insert().from_select(
+            [
+                "matric_number",
+                "course_code",
+                "attended_sessions",
+                "total_sessions",
+                "updated_at",
+            ],
+            select(
+                expected.c.matric_number,
+                expected.c.course_code,
+                expected.c.attended_sessions,
+                expected.c.total_sessions,
+                literal(datetime.utcnow()),
+            ),
+        )
+    )
+
+
+async def check_attendance_summaries(
+    db: AsyncSession, matric_number: str = None, repair: bool = False
+):
+    """
+    Compare stored summaries with the raw rows and return the mismatches.
+    With repair=True the affected summaries are rebuilt.
+    """
+    expected = {
+        (row.matric_number, row.course_code): (row.attended_sessions, row.total_sessions)
+        for row in (await db.execute(expected_summaries_query(matric_number))).all()
+    }
+    stored_query = select(
+        StudentAttendanceSummary.matric_number,
+        StudentAttendanceSummary.course_code,
+        StudentAttendanceSummary.attended_sessions,
+        StudentAttendanceSummary.total_sessions,
+    )
+    if matric_number is not None:
+        stored_query = stored_query.where(
+            StudentAttendanceSummary.matric_number == matric_number
+        )
+    stored = {
+        (row.matric_number, row.course_code): (row.attended_sessions, row.total_sessions)
+        for row in (await db.execute(stored_query)).all()
+    }
+
+    mismatches = [
+        {
+            "matric_number": key[0],
+            "course_code": key[1],
+            "stored": stored.get(key, (0, 0)),
+            "expected": counts,
+        }
+        for key, counts in expected.items()
+        if stored.get(key, (0, 0)) != counts
+    ]
+
+    if repair and mismatches:
+        connection = await db.connection()
+        for matric in {mismatch["matric_number"] for mismatch in mismatches}:
+            await connection.run_sync(rebuild_attendance_summaries, matric)
+        await db.commit()
+    return mismatches
+
+
+if __name__ == "__main__":
+    import asyncio
+    import sys
+    from database import async_session
+
+    async def main():
+        async with async_session() as db:
+            mismatches = await check_attendance_summaries(
+                db, repair="--repair" in sys.argv
+            )
+        for mismatch in mismatches:
+            print(mismatch)
+        print(f"{len(mismatches)} summaries out of date")
+
+    asyncio.run(main())
@@ -1,59 +1,25 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func
-from typing import Dict
-from datetime import timedelta, datetime
-from models import QRCode, AttendanceRecords, Course, LecturerCourses, Lecturer, StudentCourses
+from sqlalchemy import select, update
+from datetime import datetime, timedelta
+from typing import Optional
+from models import AttendanceSession, AttendanceRecords, StudentCourses
+from utils import insert_ignoring_conflicts, select_for_update
+from util.attendance_summary_utils import (
+    record_presence_in_summary,
+    record_session_close_in_summary,
+)
+from util.attendance_rollup_utils import record_session_close_in_rollups
+from util.attendance_feed import publish_session_closed
+from util.proxy_scan_utils import proxy_scan_detector
+from util.geohash_utils import encode_geohash
+from errors.qr_code_errors import QRCodeNotFoundError
+from config import settings
 
 
 # # --------------------
 # # Helper Functions
 # # --------------------
 
-async def fetch_total_sessions_per_course(db: AsyncSession) -> Dict[str, int]:
-    """
-    Fetch the total number of QR code generations (attendance sessions) per course.
-    """
-    total_qr_stmt = select(
-        QRCode.course_code, func.count().label("total_sessions")
-    ).group_by(QRCode.course_code)
-
-    result = await db.execute(total_qr_stmt)
-    return {row.course_code: row.total_sessions for row in result.all()}
-
-
-async def fetch_student_attendance_records(db: AsyncSession, matric_number: str):
-    """
-    Fetch attendance records where the student was present.
-    """
-    student_attendance_stmt = (
-        select(
-            AttendanceRecords.course_code,
-            Course.course_name,
-            Course.semester,
-            Course.course_credits,
-            Lecturer.lecturer_name,
-            func.count().label("attended_sessions"),
-        )
-        .join(Course, Course.course_code == AttendanceRecords.course_code)
-        .join(LecturerCourses, LecturerCourses.course_code == Course.course_code)
-        .join(Lecturer, Lecturer.lecturer_id == LecturerCourses.lecturer_id)
-        .where(
-            AttendanceRecords.matric_number == matric_number,
-            AttendanceRecords.status == "Present",
-        )
-        .group_by(
-            AttendanceRecords.course_code,
-            Course.course_name,
-            Course.semester,
-            Course.course_credits,
-            Lecturer.lecturer_name,
-        )
-    )
-
-    result = await db.execute(student_attendance_stmt)
-    return result.all()
-
-
 def calculate_attendance_percentage(
     attended_sessions: int, total_sessions: int
 ) -> float:
@@ -65,26 +31,65 @@ def calculate_attendance_percentage(
     return min((attended_sessions / total_sessions) * 100, 100)
 
 
-async def check_existing_attendance(
-    db: AsyncSession, matric_number: str, course_code: str, qr_generation_time: datetime
+async def record_attendance(
+    db: AsyncSession,
+    session_id: int,
+    matric_number: str,
+    course_code: str,
+    latitude: Optional[float] = None,
+    longitude: Optional[float] = None,
+    status: str = "Present",
 ):
-    end_time = qr_generation_time + timedelta(minutes=10)
+    """
+    Insert an attendance record for a session in one statement. Returns the new
+    record id, or None when the student already has a record for the session.
+    Raises QRCodeNotFoundError when the session's QR code has been deleted,
+    since a signed token outlives the code it was issued for.
+    """
+    # Lock the session row first. close_session and QR code deletion update
+    # the same row, so a scan is serialised with both, and sees whether the
+    # close has already counted the session for this student.
+    session = (
+        await db.execute(
+            select_for_update(
+                db,
+                [AttendanceSession.closed_at, AttendanceSession.voided_at],
+                AttendanceSession.session_id == session_id,
+            )
+        )
+    ).first()
+    if session is None or session.voided_at is not None:
+        raise QRCodeNotFoundError()
     result = await db.execute(
-        select(AttendanceRecords).where(
-            (AttendanceRecords.matric_number == matric_number)
-            & (AttendanceRecords.course_code == course_code)
-            & (AttendanceRecords.date >= qr_generation_time)
-            & (AttendanceRecords.date <= end_time)
+        insert_ignoring_conflicts(
+            db, AttendanceRecords, ["session_id", "matric_number"]
         )
+        .values(
+            session_id=session_id,
+            matric_number=matric_number,
+            course_code=course_code,
+            latitude=latitude,
+            longitude=longitude,
+            geohash=(
+                encode_geohash(latitude, longitude) if latitude is not None else None
+            ),
+            status=status,
+            date=datetime.utcnow(),
+        )
+        .returning(AttendanceRecords.record_id)
     )
-    return result.scalars().first()
+    record_id = result.scalar()
+    if record_id is not None and status == "Present":
+        await record_presence_in_summary(
+            db, matric_number, course_code, session_closed=session.closed_at is not None
+        )
+    await db.commit()
+    return record_id
 
 
-async def mark_absent_students(
-    db: AsyncSession, course_code: str, qr_code_time: datetime
-):
+async def mark_absent_students(db: AsyncSession, course_code: str, session_id: int):
     """
-    Automatically marks students absent if they haven't marked attendance within the QR code's valid period (1 hour).
+    Automatically marks students absent if they haven't marked attendance within the session's valid period.
     """
     # Fetch students registered for the course
     registered_students = await db.execute(
@@ -94,11 +99,10 @@ async def mark_absent_students(
     )
     registered_students = registered_students.scalars().all()
 
-    # Fetch students who have already marked attendance
+    # Fetch students who already have a record for this session
     attendance_records = await db.execute(
         select(AttendanceRecords.matric_number).where(
-            (AttendanceRecords.course_code == course_code)
-            & (AttendanceRecords.date >= qr_code_time)
+            AttendanceRecords.session_id == session_id
         )
     )
     present_students = attendance_records.scalars().all()
@@ -106,15 +110,71 @@ async def mark_absent_students(
     # Identify absent students
     absent_students = set(registered_students) - set(present_students)
 
-    # Mark absent students
-    for matric_number in absent_students:
-        new_absence = AttendanceRecords(
-            matric_number=matric_number,
-            course_code=course_code,
-            status="Absent",
-            geo_location=None,
-            date=datetime.utcnow(),
+    # Mark absent students in one statement; concurrent late scans for the
+    # same session skip rows another request already wrote.
+    if absent_students:
+        now = datetime.utcnow()
+        await db.execute(
+            insert_ignoring_conflicts(
+                db, AttendanceRecords, ["session_id", "matric_number"]
+            ),
+            [
+                {
+                    "session_id": session_id,
+                    "matric_number": matric_number,
+                    "course_code": course_code,
+                    "status": "Absent",
+                    "date": now,
+                }
+                for matric_number in absent_students
+            ],
         )
-        db.add(new_absence)
 
     await db.commit()
+
+
+async def close_session(db: AsyncSession, course_code: str, session_id: int) -> bool:
+    """
+    Close an expired session exactly once; returns True for the call that closed
+    it. Absence is derived at read time from sessions x enrollment, so Absent
+    rows are only written when ATTENDANCE_STORE_ABSENCES is enabled. The update
+    locks the session row until commit, which serialises it with scans.
+    """
+    result = await db.execute(
+        update(AttendanceSession)
+        .where(
+            AttendanceSession.session_id == session_id,
+            AttendanceSession.closed_at.is_(None),
+        )
+        .values(closed_at=datetime.utcnow())
+    )
+    closed = result.rowcount == 1
+    if closed:
+        await record_session_close_in_summary(db, course_code, session_id)
+        await record_session_close_in_rollups(db, session_id)
+    if closed and settings.ATTENDANCE_STORE_ABSENCES:
+        await mark_absent_students(db, course_code, session_id)
+    else:
+        await db.commit()
+    if closed:
+        publish_session_closed(session_id)
+        proxy_scan_detector.forget(session_id)
+    return closed
+
+
+async def close_expired_sessions(db: AsyncSession) -> int:
+    """
+    Close every session whose scan window has passed. Run periodically so
+    sessions close (and summaries count them) even if nobody scans late.
+    """
+    cutoff = datetime.utcnow() - timedelta(minutes=settings.QR_TOKEN_TTL_MINUTES)
+    result = await db.execute(
+        select(AttendanceSession.session_id, AttendanceSession.course_code).where(
+            AttendanceSession.closed_at.is_(None),
+            AttendanceSession.started_at < cutoff,
+        )
+    )
+    closed = 0
+    for session_id, course_code in result.all():
+        closed += await close_session(db, course_code, session_id)
+    return closed
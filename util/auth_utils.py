@@ -1,20 +1,20 @@
 #### app/utils.py
-from fastapi import Depends, HTTPException
+import hmac
+from fastapi import Depends, Header, HTTPException
 from jose import jwt, JWTError
 from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime, timedelta
-from sqlalchemy.future import select
 from typing import Optional
-from database import get_db
+from database import bulkhead_session
 from config import settings
+from utils import filter_records
 from models import Lecturer, Student
-from passlib.context import CryptContext
+from errors.auth_errors import MetricsAccessError
+from util.password_utils import get_password_hash, verify_password
+from util.tracing_utils import span
 from fastapi.security import OAuth2PasswordBearer
 
 
-# Password hashing utility
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
 # Oauth2 scheme for Lecturer and Student
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="lecturers/login")
 oauth2_scheme_student = OAuth2PasswordBearer(tokenUrl="student/login")
@@ -35,14 +35,6 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     return encoded_jwt
 
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
-
-
-def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
-
-
 async def get_current_user(token: str, db: AsyncSession, user_model, email_field: str):
     credentials_exception = HTTPException(
         status_code=401,
@@ -50,37 +42,46 @@ async def get_current_user(token: str, db: AsyncSession, user_model, email_field
         headers={"WWW-Authenticate": "Bearer"},
     )
     try:
-        payload = jwt.decode(
-            token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM]
-        )
+        with span("jwt_decode"):
+            payload = jwt.decode(
+                token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM]
+            )
         user_email: str = payload.get("sub")
         if user_email is None:
             raise credentials_exception
     except JWTError:
         raise credentials_exception
 
-    query = select(user_model).where(getattr(user_model, email_field) == user_email)
-    result = await db.execute(query)
-    user = result.scalars().first()
+    user = await filter_records(user_model, db, **{email_field: user_email})
     if user is None:
         raise credentials_exception
     return user
 
 
-async def get_current_lecturer(
-    token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)
-):
-    return await get_current_user(token, db, Lecturer, "lecturer_email")
+# The user lookup runs in its own small "auth" class, on a session released
+# before the route's work starts. It never takes a slot from the route's class,
+# so a scan holds one critical slot and reports leave the critical class alone.
+async def get_current_lecturer(token: str = Depends(oauth2_scheme)):
+    with span("get_current_lecturer", "dependency"):
+        async with bulkhead_session("auth") as db:
+            return await get_current_user(token, db, Lecturer, "lecturer_email")
+
 
+async def get_current_student(token: str = Depends(oauth2_scheme_student)):
+    with span("get_current_student", "dependency"):
+        async with bulkhead_session("auth") as db:
+            return await get_current_user(token, db, Student, "student_email")
 
-async def get_current_student(
-    token: str = Depends(oauth2_scheme_student), db: AsyncSession = Depends(get_db)
-):
-    return await get_current_user(token, db, Student, "student_email")
+
+def metrics_token_matches(token: Optional[str]) -> bool:
+    return bool(
+        settings.METRICS_TOKEN
+        and token
+        and hmac.compare_digest(token, settings.METRICS_TOKEN)
+    )
 
 
-async def filter_records(model, db: AsyncSession, **filters):
-    """Reusable function to filter records from a given model."""
-    query = select(model).filter_by(**filters)
-    result = await db.execute(query)
-    return result.scalars().first()
+async def verify_metrics_token(x_metrics_token: Optional[str] = Header(default=None)):
+    """Admit operators only: METRICS_TOKEN in X-Metrics-Token, when one is configured."""
+    if not metrics_token_matches(x_metrics_token):
+        raise MetricsAccessError()
@@ -0,0 +1,164 @@
+from typing import Dict, List, Set, Tuple
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from models import Student, Course, Lecturer, LecturerCourses, StudentCourses
+from utils import insert_ignoring_conflicts
+from util.lecturer_utils import validate_lecturer_course
+from errors.auth_errors import StudentNotFoundError, LecturerNotFoundError
+from errors.course_errors import (
+    CourseNotFoundError,
+    UnauthorizedLecturerCourseError,
+    StudentEnrolledError,
+)
+
+# # --------------------
+# # Bulk Enrollment
+# # --------------------
+
+ENROLLMENT_COLUMNS = ("matric_number", "course_code", "lecturer_name")
+
+
+def _row_result(line, row, status, detail=None):
+    return {
+        "line": line,
+        "matric_number": row["matric_number"],
+        "course_code": row["course_code"],
+        "status": status,
+        "detail": detail,
+    }
+
+
+async def authorize_courses(
+    db: AsyncSession, course_codes: Set[str], lecturer_id: int, authorized: Dict[str, bool]
+):
+    """
+    Record in `authorized` whether the uploading lecturer teaches each course
+    code not checked yet; the dict carries the answers across batches.
+    """
+    for course_code in course_codes - authorized.keys():
+        try:
+            await validate_lecturer_course(db, course_code, lecturer_id)
+            authorized[course_code] = True
+        except UnauthorizedLecturerCourseError:
+            authorized[course_code] = False
+
+
+async def enroll_batch(
+    db: AsyncSession,
+    batch: List[Tuple[int, Dict[str, str]]],
+    seen: Set[Tuple[str, str]],
+    lecturer_id: int,
+    authorized: Dict[str, bool],
+) -> List[Dict]:
+    """
+    Validate and enroll one batch of CSV rows with a fixed number of queries:
+    one set lookup each for students, courses, lecturers and lecturer
+    assignments, then a single conflict-skipping insert. Pairs already in StudentCourses come back
+    from the insert as not inserted, so concurrent enrollments cannot race it.
+    Rows for courses the uploading lecturer does not teach are rejected.
+    `seen` carries the pairs of earlier batches to flag repeated rows.
+    """
+    batch = [
+        (line, {column: row.get(column) or "" for column in ENROLLMENT_COLUMNS})
+        for line, row in batch
+    ]
+    matric_numbers = {row["matric_number"] for _, row in batch}
+    course_codes = {row["course_code"] for _, row in batch}
+    lecturer_names = {row["lecturer_name"] for _, row in batch}
+
+    students = set(
+        (
+            await db.execute(
+                select(Student.matric_number).where(
+                    Student.matric_number.in_(matric_numbers)
+                )
+            )
+        ).scalars()
+    )
+    courses = set(
+        (
+            await db.execute(
+                select(Course.course_code).where(Course.course_code.in_(course_codes))
+            )
+        ).scalars()
+    )
+    assignments = set(
+        (
+            await db.execute(
+                select(Lecturer.lecturer_name, LecturerCourses.course_code)
+                .join(LecturerCourses, LecturerCourses.lecturer_id == Lecturer.lecturer_id)
+                .where(
+                    Lecturer.lecturer_name.in_(lecturer_names),
+                    LecturerCourses.course_code.in_(course_codes),
+                )
+            )
+        ).all()
+    )
+    lecturers = set(
+        (
+            await db.execute(
+                select(Lecturer.lecturer_name).where(
+                    Lecturer.lecturer_name.in_(lecturer_names)
+                )
+            )
+        ).scalars()
+    )
+
+    await authorize_courses(db, course_codes & courses, lecturer_id, authorized)
+
+    results = {}
+    accepted = []
+    for line, row in batch:
+        pair = (row["matric_number"], row["course_code"])
+        if not all(row.values()):
+            results[line] = _row_result(line, row, "rejected", "Missing a required value.")
+        elif row["matric_number"] not in students:
+            results[line] = _row_result(line, row, "rejected", StudentNotFoundError().detail)
+        elif row["course_code"] not in courses:
+            results[line] = _row_result(line, row, "rejected", CourseNotFoundError().detail)
+        elif not authorized[row["course_code"]]:
+            results[line] = _row_result(
+                line, row, "rejected", UnauthorizedLecturerCourseError().detail
+            )
+        elif row["lecturer_name"] not in lecturers:
+            results[line] = _row_result(line, row, "rejected", LecturerNotFoundError().detail)
+        elif (row["lecturer_name"], row["course_code"]) not in assignments:
+            results[line] = _row_result(
+                line, row, "rejected", UnauthorizedLecturerCourseError().detail
+            )
+        elif pair in seen:
+            results[line] = _row_result(line, row, "duplicate", "Repeats an earlier row.")
+        else:
+            seen.add(pair)
+            accepted.append((line, row))
+
+    if accepted:
+        inserted = set(
+            (
+                await db.execute(
+                    insert_ignoring_conflicts(
+                        db, StudentCourses, ["matric_number", "course_code"]
+                    )
+                    .values(
+                        [
+                            {
+                                "matric_number": row["matric_number"],
+                                "course_code": row["course_code"],
+                            }
+                            for _, row in accepted
+                        ]
+                    )
+                    .returning(StudentCourses.matric_number, StudentCourses.course_code)
+                )
+            ).all()
+        )
+        await db.commit()
+        for line, row in accepted:
+            if (row["matric_number"], row["course_code"]) in inserted:
+                results[line] = _row_result(line, row, "enrolled")
+            else:
+                results[line] = _row_result(
+                    line, row, "already_enrolled", StudentEnrolledError().detail
+                )
+
+    return [results[line] for line, _ in batch]
@@ -0,0 +1,104 @@
+import math
+from typing import List, Optional, Tuple
+
+# # --------------------
+# # Geohash Keys
+# # --------------------
+#
+# A geohash interleaves longitude and latitude bits and writes them in base32,
+# so points close together share a prefix and every prefix is a rectangular
+# cell. The alphabet is in ASCII order, which makes each cell one contiguous
+# range of an ordinary string index: "near here" becomes a few range scans
+# over the cells covering the search area.
+
+BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+# 9 characters: cells of about 4.8 m x 4.8 m, finer than a GPS fix.
+GEOHASH_PRECISION = 9
+METERS_PER_DEGREE = 111_320
+MAX_COVERING_CELLS = 16
+
+
+def encode_geohash(latitude: float, longitude: float, precision: int = GEOHASH_PRECISION) -> str:
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    value = 0
+    even = True  # Bits alternate, starting with longitude.
+    while len(chars) < precision:
+        target, bounds = (longitude, lon_range) if even else (latitude, lat_range)
+        middle = (bounds[0] + bounds[1]) / 2
+        value <<= 1
+        if target >= middle:
+            value |= 1
+            bounds[0] = middle
+        else:
+            bounds[1] = middle
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(BASE32[value])
+            bits = value = 0
+    return "".join(chars)
+
+
+def cell_size(precision: int) -> Tuple[float, float]:
+    """Height and width in degrees of the cells of a geohash precision."""
+    lat_bits = 5 * precision // 2
+    lon_bits = 5 * precision - lat_bits
+    return 180 / 2**lat_bits, 360 / 2**lon_bits
+
+
+def bounding_box(latitude: float, longitude: float, radius_m: float):
+    """South, west, north, east of the box around a circle, in degrees."""
+    dlat = radius_m / METERS_PER_DEGREE
+    dlon = radius_m / (METERS_PER_DEGREE * max(math.cos(math.radians(latitude)), 1e-6))
+    return (
+        max(latitude - dlat, -90.0),
+        max(longitude - dlon, -180.0),
+        min(latitude + dlat, 90.0),
+        min(longitude + dlon, 180.0),
+    )
+
+
+def _steps(start: float, stop: float, step: float) -> List[float]:
+    points = []
+    point = start
+    while point < stop:
+        points.append(point)
+        point += step
+    return points + [stop]
+
+
+def covering_prefixes(latitude: float, longitude: float, radius_m: float) -> List[str]:
+    """
+    The geohash cells covering a circle: the finest precision whose cells
+    cover its bounding box with at most MAX_COVERING_CELLS prefixes.
+    """
+    south, west, north, east = bounding_box(latitude, longitude, radius_m)
+    for precision in range(GEOHASH_PRECISION, 0, -1):
+        height, width = cell_size(precision)
+        if math.ceil((north - south) / height + 1) * math.ceil(
+            (east - west) / width + 1
+        ) > MAX_COVERING_CELLS:
+            continue
+        return sorted(
+            {
+                encode_geohash(lat, lon, precision)
+                for lat in _steps(south, north, height)
+                for lon in _steps(west, east, width)
+            }
+        )
+    return [""]
+
+
+def prefix_upper_bound(prefix: str) -> Optional[str]:
+    """The first geohash after every hash starting with prefix (None: no bound)."""
+    chars = list(prefix)
+    while chars:
+        position = BASE32.index(chars[-1])
+        if position + 1 < len(BASE32):
+            chars[-1] = BASE32[position + 1]
+            return "".join(chars)
+        chars.pop()
+    return None
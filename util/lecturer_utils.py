@@ -1,6 +1,6 @@
 from sqlalchemy.ext.asyncio import AsyncSession
 from models import Course, LecturerCourses
-from utils import filter_records
+from utils import filter_records, record_exists
 from sqlalchemy.future import select
 from sqlalchemy.sql import func
 from errors.course_errors import (
@@ -32,12 +32,10 @@ async def validate_lecturer_course(db: AsyncSession, course_code, lecturer_id):
     """
     Check if a lecturer is assigned to a given course.
     """
-    lecturer_course = await filter_records(
+    if not await record_exists(
         LecturerCourses, db, course_code=course_code, lecturer_id=lecturer_id
-    )
-    if not lecturer_course:
+    ):
         raise UnauthorizedLecturerCourseError()
-    return lecturer_course
 
 
 async def validate_lecturer(current_lecturer):
@@ -0,0 +1,124 @@
+import asyncio
+import sys
+import threading
+import time
+from collections import deque
+from typing import Dict, Optional
+from config import settings
+from util.profiling_utils import collapse_frame
+
+# # --------------------
+# # Event Loop Lag Monitor
+# # --------------------
+#
+# A task sleeps LOOP_MONITOR_INTERVAL_SECONDS at a time and records how late
+# each wake-up is: any lag is time the loop spent running something else
+# without yielding. The task cannot see what blocked it, since it only runs
+# once the blocking call returns, so a watchdog thread watches its heartbeat
+# and captures the loop thread's stack while a stall is still in progress.
+
+
+class LoopLagMonitor:
+    def __init__(self, window: int = 1200, stall_history: int = 20):
+        self.lags = deque(maxlen=window)
+        self.smoothed_lag = 0.0
+        self.max_lag = 0.0
+        self.ticks = 0
+        self.stalls: deque = deque(maxlen=stall_history)
+        self.stall_count = 0
+        self._heartbeat = time.monotonic()
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+
+    @property
+    def overloaded(self) -> bool:
+        limit = settings.LOOP_LAG_SHED_SECONDS
+        return bool(limit) and self.smoothed_lag > limit
+
+    def record(self, lag: float):
+        self.lags.append(lag)
+        self.ticks += 1
+        self.max_lag = max(self.max_lag, lag)
+        # Exponential smoothing, so a single slow tick does not trigger shedding.
+        self.smoothed_lag += (lag - self.smoothed_lag) * 0.2
+
+    async def _measure(self):
+        interval = settings.LOOP_MONITOR_INTERVAL_SECONDS
+        while True:
+            expected = time.monotonic() + interval
+            await asyncio.sleep(interval)
+            now = time.monotonic()
+            self._heartbeat = now
+            self.record(max(now - expected, 0.0))
+
+    def _watch(self, loop_thread_id: int):
+        threshold = settings.LOOP_BLOCKING_THRESHOLD_SECONDS
+        interval = settings.LOOP_MONITOR_INTERVAL_SECONDS
+        reported = None
+        while not self._stopped.wait(min(interval, threshold / 2)):
+            heartbeat = self._heartbeat
+            blocked = time.monotonic() - heartbeat - interval
+            if blocked < threshold or reported == heartbeat:
+                continue
+            frame = sys._current_frames().get(loop_thread_id)
+            if frame is None:
+                continue
+            # One report per stall: the heartbeat moves on once it ends.
+            reported = heartbeat
+            stack = collapse_frame(frame).split(";")
+            self.stall_count += 1
+            self.stalls.append(
+                {"at": time.time(), "blocked_seconds": round(blocked, 4), "stack": stack}
+            )
+            print(
+                f"Event loop blocked for {blocked:.3f}s in "
+                f"{' <- '.join(reversed(stack[-5:]))}"
+            )
+
+    def start(self):
+        """Start measuring the running loop. Call from inside the loop."""
+        if not settings.LOOP_MONITOR_INTERVAL_SECONDS or self._task is not None:
+            return
+        self._heartbeat = time.monotonic()
+        self._stopped.clear()
+        self._task = asyncio.create_task(self._measure())
+        self._watchdog = threading.Thread(
+            target=self._watch,
+            args=(threading.get_ident(),),
+            name="loop-watchdog",
+            daemon=True,
+        )
+        self._watchdog.start()
+
+    def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        self._stopped.set()
+        self._watchdog.join()
+        self._task = self._watchdog = None
+
+    def percentiles(self, points=(50, 90, 99)) -> Dict[str, float]:
+        lags = sorted(self.lags)
+        if not lags:
+            return {f"p{point}": 0.0 for point in points}
+        return {
+            f"p{point}": lags[min(len(lags) - 1, len(lags) * point // 100)]
+            for point in points
+        }
+
+    def metrics(self) -> Dict:
+        return {
+            "ticks": self.ticks,
+            "window": len(self.lags),
+            **{name: round(value, 6) for name, value in self.percentiles().items()},
+            "max": round(self.max_lag, 6),
+            "smoothed": round(self.smoothed_lag, 6),
+            "overloaded": self.overloaded,
+            "stalls": self.stall_count,
+            "recent_stalls": list(self.stalls),
+        }
+
+
+loop_monitor = LoopLagMonitor()
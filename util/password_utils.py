@@ -0,0 +1,20 @@
+from typing import List
+from passlib.context import CryptContext
+
+# Kept free of app imports so process-pool workers can load it cheaply.
+
+# Password hashing utility
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+
+def verify_password(plain_password: str, hashed_password: str) -> bool:
+    return pwd_context.verify(plain_password, hashed_password)
+
+
+def get_password_hash(password: str) -> str:
+    return pwd_context.hash(password)
+
+
+def hash_passwords(passwords: List[str]) -> List[str]:
+    """Hash a chunk of passwords; the unit of work sent to pool workers."""
+    return [pwd_context.hash(password) for password in passwords]
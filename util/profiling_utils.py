@@ -0,0 +1,154 @@
+import hashlib
+import hmac
+import os
+import re
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from datetime import datetime
+from typing import Dict, Optional
+from config import settings
+
+# # --------------------
+# # Request Profiling
+# # --------------------
+#
+# Profiles are written in the folded-stack format ("outer;inner;leaf count"
+# per line) that flamegraph.pl, speedscope and inferno read directly. CPU
+# profiles count samples of the event loop thread's stack; memory profiles
+# weigh each allocation traceback by the bytes still allocated when the
+# request finished. Samples cover the whole loop thread, so requests running
+# concurrently with a profiled one show up in its profile too.
+
+
+def _frame_name(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({code.co_filename}:{code.co_firstlineno})".replace(";", ":")
+
+
+def collapse_frame(frame) -> str:
+    names = []
+    while frame is not None:
+        names.append(_frame_name(frame))
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class StackSampler(threading.Thread):
+    """Sample the stack of one thread at a fixed interval until stopped."""
+
+    def __init__(self, thread_id: int, interval: float):
+        super().__init__(name="request-profiler", daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.stacks[collapse_frame(frame)] += 1
+
+    def stop(self) -> Counter:
+        self._stopped.set()
+        self.join()
+        return self.stacks
+
+
+class RequestProfile:
+    """
+    One profiled request: a stack sampler on the calling thread and,
+    with PROFILE_TRACEMALLOC, an allocation snapshot at the end.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.cpu: Counter = Counter()
+        self.memory: Counter = Counter()
+        self._traced = False
+        self._sampler = StackSampler(threading.get_ident(), settings.PROFILE_INTERVAL_SECONDS)
+
+    def start(self):
+        if settings.PROFILE_TRACEMALLOC and not tracemalloc.is_tracing():
+            tracemalloc.start(64)
+            self._traced = True
+        self._sampler.start()
+
+    def stop(self):
+        self.cpu = self._sampler.stop()
+        if self._traced:
+            snapshot = tracemalloc.take_snapshot()
+            tracemalloc.stop()
+            for stat in snapshot.statistics("traceback"):
+                stack = ";".join(
+                    f"{frame.filename}:{frame.lineno}".replace(";", ":")
+                    for frame in reversed(stat.traceback)
+                )
+                self.memory[stack] += stat.size
+
+
+def profile_name(method: str, path: str) -> str:
+    slug = re.sub(r"[^A-Za-z0-9]+", "_", path).strip("_") or "root"
+    return f"{datetime.now():%Y%m%dT%H%M%S%f}-{method.lower()}-{slug[:60]}"
+
+
+def _write_folded(path: str, stacks: Counter):
+    with open(path, "w") as file:
+        for stack, count in stacks.most_common():
+            file.write(f"{stack} {count}\n")
+
+
+def rotate_profiles(directory: str, keep: int):
+    """Delete the oldest profile files beyond the newest `keep`."""
+    files = sorted(
+        entry.path
+        for entry in os.scandir(directory)
+        if entry.is_file() and entry.name.endswith(".folded")
+    )
+    for path in files[: max(len(files) - keep, 0)]:
+        os.remove(path)
+
+
+def save_profile(profile: RequestProfile) -> Dict[str, str]:
+    """Write a finished profile to PROFILE_DIR and rotate old ones. Blocking."""
+    os.makedirs(settings.PROFILE_DIR, exist_ok=True)
+    written = {}
+    for kind, stacks in (("cpu", profile.cpu), ("mem", profile.memory)):
+        if stacks:
+            path = os.path.join(settings.PROFILE_DIR, f"{profile.name}.{kind}.folded")
+            _write_folded(path, stacks)
+            written[kind] = path
+    rotate_profiles(settings.PROFILE_DIR, settings.PROFILE_MAX_FILES)
+    return written
+
+
+# Profiling on demand: X-Profile-Token is "<expiry unix time>.<hex HMAC>",
+# keyed from SECRET_KEY, so only whoever holds the key can mint one and a
+# leaked token stops working at its expiry.
+
+
+def _profile_signature(expires: int) -> str:
+    return hmac.new(
+        settings.SECRET_KEY.encode(), f"profile:{expires}".encode(), hashlib.sha256
+    ).hexdigest()
+
+
+def issue_profile_token(minutes: int = 60) -> str:
+    expires = int(time.time()) + minutes * 60
+    return f"{expires}.{_profile_signature(expires)}"
+
+
+def verify_profile_token(token: Optional[str]) -> bool:
+    if not token:
+        return False
+    expires, _, signature = token.partition(".")
+    if not expires.isdigit() or int(expires) < time.time():
+        return False
+    return hmac.compare_digest(_profile_signature(int(expires)), signature)
+
+
+if __name__ == "__main__":
+    print(issue_profile_token(int(sys.argv[1]) if len(sys.argv) > 1 else 60))
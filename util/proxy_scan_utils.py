@@ -0,0 +1,224 @@
+from collections import OrderedDict, deque
+from datetime import datetime, timedelta
+from typing import Deque, Dict, List, NamedTuple, Optional, Set, Tuple
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from models import ProxyScanFlag
+from utils import dialect_insert
+from config import settings
+
+# # --------------------
+# # Proxy-Scan Detection
+# # --------------------
+#
+# Each accepted scan is fed to the detector, which keeps a sliding window per
+# open session:
+#   coordinate cells  scans bucketed by coordinates rounded to
+#                     PROXY_COORDINATE_DECIMALS (5 decimals is about 1 m),
+#                     each cell holding the scans of the last
+#                     PROXY_WINDOW_SECONDS in a bounded deque
+#   devices           the students each device_id marked in the session
+# A scan's cell and its 8 neighbours reaching PROXY_CLUSTER_SIZE distinct
+# students, or a device marking a second student, is flagged; counting the
+# neighbours catches phones whose fixes straddle a rounding boundary. Every
+# scan costs a fixed number of dictionary and deque operations, expired cells
+# are evicted oldest first, and only the flags reach the database. State is
+# per worker process, like the live feed.
+
+
+class ProxyFlag(NamedTuple):
+    session_id: int
+    course_code: str
+    reason: str
+    cluster_key: str
+    matric_numbers: Tuple[str, ...]
+    first_scan_at: datetime
+    last_scan_at: datetime
+
+
+class CellWindow:
+    """Recent scans from one coordinate cell, and when the current run began."""
+
+    def __init__(self, at: datetime):
+        self.started = at
+        # Bounded: a cluster is flagged long before the deque fills up.
+        self.scans: Deque[Tuple[datetime, str]] = deque(
+            maxlen=settings.PROXY_CLUSTER_SIZE * 4
+        )
+
+
+class SessionScanWindow:
+    def __init__(self, course_code: str):
+        self.course_code = course_code
+        # Least recently scanned cell first, so expired cells come off the front.
+        self.cells: "OrderedDict[Tuple[int, int], CellWindow]" = OrderedDict()
+        self.devices: Dict[str, Set[str]] = {}
+        self.device_first_scan: Dict[str, datetime] = {}
+
+    def observe_location(
+        self, key: Tuple[int, int], matric_number: str, at: datetime
+    ) -> CellWindow:
+        expired = at - timedelta(seconds=settings.PROXY_WINDOW_SECONDS)
+        while self.cells:
+            oldest_key, oldest = next(iter(self.cells.items()))
+            if oldest.scans[-1][0] >= expired:
+                break
+            del self.cells[oldest_key]
+
+        cell = self.cells.get(key)
+        if cell is None:
+            cell = self.cells[key] = CellWindow(at)
+        else:
+            self.cells.move_to_end(key)
+        while cell.scans and cell.scans[0][0] < expired:
+            cell.scans.popleft()
+        if not cell.scans:
+            cell.started = at
+        cell.scans.append((at, matric_number))
+        return cell
+
+    def students_near(self, key: Tuple[int, int], at: datetime) -> Set[str]:
+        """Students scanning from a cell or its 8 neighbours within the window."""
+        expired = at - timedelta(seconds=settings.PROXY_WINDOW_SECONDS)
+        latitude, longitude = key
+        students = set()
+        for row in (latitude - 1, latitude, latitude + 1):
+            for column in (longitude - 1, longitude, longitude + 1):
+                cell = self.cells.get((row, column))
+                if cell is not None:
+                    students.update(
+                        student for scanned_at, student in cell.scans
+                        if scanned_at >= expired
+                    )
+        return students
+
+    def observe_device(self, device_id: str, matric_number: str, at: datetime):
+        students = self.devices.setdefault(device_id, set())
+        self.device_first_scan.setdefault(device_id, at)
+        if len(students) < settings.PROXY_CLUSTER_SIZE * 4:
+            students.add(matric_number)
+        return students
+
+
+class ProxyScanDetector:
+    def __init__(self):
+        self._sessions: "OrderedDict[int, SessionScanWindow]" = OrderedDict()
+
+    def _window(self, session_id: int, course_code: str) -> SessionScanWindow:
+        window = self._sessions.get(session_id)
+        if window is None:
+            window = self._sessions[session_id] = SessionScanWindow(course_code)
+            while len(self._sessions) > settings.PROXY_MAX_SESSIONS:
+                self._sessions.popitem(last=False)
+        else:
+            self._sessions.move_to_end(session_id)
+        return window
+
+    def observe(
+        self,
+        session_id: int,
+        course_code: str,
+        matric_number: str,
+        latitude: float,
+        longitude: float,
+        device_id: Optional[str],
+        at: datetime,
+    ) -> List[ProxyFlag]:
+        """Add a scan to its session's window; returns the flags it raises."""
+        window = self._window(session_id, course_code)
+        flags = []
+
+        decimals = settings.PROXY_COORDINATE_DECIMALS
+        scale = 10**decimals
+        cell = (round(latitude * scale), round(longitude * scale))
+        cell_window = window.observe_location(cell, matric_number, at)
+        students = window.students_near(cell, at)
+        if len(students) >= settings.PROXY_CLUSTER_SIZE:
+            flags.append(
+                ProxyFlag(
+                    session_id,
+                    course_code,
+                    "coordinate_cluster",
+                    f"{cell[0] / scale:.{decimals}f},{cell[1] / scale:.{decimals}f}",
+                    tuple(sorted(students)),
+                    cell_window.started,
+                    at,
+                )
+            )
+
+        if device_id:
+            students = window.observe_device(device_id, matric_number, at)
+            if len(students) > 1:
+                flags.append(
+                    ProxyFlag(
+                        session_id,
+                        course_code,
+                        "shared_device",
+                        device_id,
+                        tuple(sorted(students)),
+                        window.device_first_scan[device_id],
+                        at,
+                    )
+                )
+        return flags
+
+    def forget(self, session_id: int):
+        """Drop a session's window once it closes."""
+        self._sessions.pop(session_id, None)
+
+    def session_count(self) -> int:
+        return len(self._sessions)
+
+
+proxy_scan_detector = ProxyScanDetector()
+
+
+async def record_proxy_flags(db: AsyncSession, flags: List[ProxyFlag]):
+    """
+    Save flags, one row per cluster (session, reason, key and the scan that
+    started it): a scan joining a flagged cluster updates its students and
+    last scan time.
+    """
+    now = datetime.utcnow()
+    for flag in flags:
+        statement = dialect_insert(db, ProxyScanFlag).values(
+            session_id=flag.session_id,
+            course_code=flag.course_code,
+            reason=flag.reason,
+            cluster_key=flag.cluster_key,
+            matric_numbers=",".join(flag.matric_numbers),
+            first_scan_at=flag.first_scan_at,
+            last_scan_at=flag.last_scan_at,
+            flagged_at=now,
+        )
+        await db.execute(
+            statement.on_conflict_do_update(
+                index_elements=["session_id", "reason", "cluster_key", "first_scan_at"],
+                set_={
+                    "matric_numbers": statement.excluded.matric_numbers,
+                    "last_scan_at": statement.excluded.last_scan_at,
+                },
+            )
+        )
+    await db.commit()
+
+
+async def fetch_proxy_flags(db: AsyncSession, course_code: str) -> List[Dict]:
+    result = await db.execute(
+        select(ProxyScanFlag)
+        .where(ProxyScanFlag.course_code == course_code)
+        .order_by(ProxyScanFlag.last_scan_at.desc())
+    )
+    return [
+        {
+            "flag_id": flag.flag_id,
+            "session_id": flag.session_id,
+            "course_code": flag.course_code,
+            "reason": flag.reason,
+            "cluster_key": flag.cluster_key,
+            "matric_numbers": flag.matric_numbers.split(","),
+            "first_scan_at": flag.first_scan_at,
+            "last_scan_at": flag.last_scan_at,
+        }
+        for flag in result.scalars().all()
+    ]
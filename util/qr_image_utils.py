@@ -0,0 +1,84 @@
+import hashlib
+import io
+import re
+from collections import OrderedDict
+from typing import Dict, NamedTuple, Optional
+import segno
+from config import settings
+
+# # --------------------
+# # Rendered QR Images
+# # --------------------
+
+IMAGE_MEDIA_TYPES = {"png": "image/png", "svg": "image/svg+xml"}
+# An entity-tag (RFC 9110 section 8.8.3): optional weak prefix, quoted opaque tag.
+_ENTITY_TAG = re.compile(r'(?:W/)?("[\x21\x23-\x7e\x80-\xff]*")')
+
+
+class RenderedImage(NamedTuple):
+    content: bytes
+    etag: str
+    media_type: str
+
+
+class CachedQRImages(NamedTuple):
+    lecturer_id: int
+    images: Dict[str, RenderedImage]
+
+
+def render_qr_images(content: str) -> Dict[str, RenderedImage]:
+    """
+    Render a QR payload once into every supported image format. The ETag is a
+    digest of the bytes, so it is strong and stable across workers.
+    """
+    symbol = segno.make_qr(content, error="m", boost_error=False)
+    images = {}
+    for kind, media_type in IMAGE_MEDIA_TYPES.items():
+        buffer = io.BytesIO()
+        symbol.save(buffer, kind=kind, scale=settings.QR_IMAGE_SCALE, border=4)
+        data = buffer.getvalue()
+        images[kind] = RenderedImage(
+            content=data,
+            etag=f'"{hashlib.sha256(data).hexdigest()[:32]}"',
+            media_type=media_type,
+        )
+    return images
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """
+    Evaluate If-None-Match against an ETag (RFC 9110 section 13.1.2): "*"
+    matches any representation, and entity-tags compare weakly, so W/"x"
+    matches "x".
+    """
+    if if_none_match.strip() == "*":
+        return True
+    return etag in _ENTITY_TAG.findall(if_none_match)
+
+
+class QRImageCache:
+    """
+    Byte cache of rendered QR images keyed by qr_code_id with LRU eviction.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[int, CachedQRImages]" = OrderedDict()
+
+    def get(self, qr_code_id: int) -> Optional[CachedQRImages]:
+        entry = self._entries.get(qr_code_id)
+        if entry is not None:
+            self._entries.move_to_end(qr_code_id)
+        return entry
+
+    def put(self, qr_code_id: int, entry: CachedQRImages):
+        self._entries[qr_code_id] = entry
+        self._entries.move_to_end(qr_code_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def discard(self, qr_code_id: int):
+        self._entries.pop(qr_code_id, None)
+
+
+qr_image_cache = QRImageCache(settings.QR_IMAGE_CACHE_SIZE)
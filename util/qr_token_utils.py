@@ -0,0 +1,370 @@
+import base64
+import binascii
+import hashlib
+import hmac
+import re
+import struct
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import NamedTuple
+from config import settings
+from errors.qr_code_errors import InvalidQRTokenError
+
+# # --------------------
+# # Signed QR Tokens
+# # --------------------
+#
+# Layout (big endian): version, key id, flags, rotation period (seconds),
+# session id, lecturer id, issued-at (unix seconds), ttl (seconds), latitude
+# and longitude in micro-degrees, then the length-prefixed course code. The
+# payload is followed by a truncated HMAC-SHA256 tag and the whole token is
+# base64url encoded without padding.
+
+TOKEN_VERSION = 2
+MAC_SIZE = 16
+COORDINATE_SCALE = 1_000_000
+
+_HEADER = struct.Struct(">BBBBIIIHiiB")
+_COUNTER = struct.Struct(">Q")
+_EPOCH = datetime(1970, 1, 1)
+
+
+class QRTokenClaims(NamedTuple):
+    session_id: int
+    course_code: str
+    lecturer_id: int
+    latitude: float
+    longitude: float
+    issued_at: datetime
+    expires_at: datetime
+    flags: int = 0
+    key_id: int = 0
+    rotation_period: int = 0
+
+
+@lru_cache(maxsize=None)
+def _derive_key(secret: str, key_id: int) -> bytes:
+    return hmac.new(
+        secret.encode(), f"qr-token:{key_id}".encode(), hashlib.sha256
+    ).digest()
+
+
+def get_signing_key(key_id: int) -> bytes:
+    """
+    Return the HMAC key for a key id: the active id is derived from SECRET_KEY,
+    retired ids from the secret recorded for them in QR_TOKEN_RETIRED_KEYS.
+    """
+    if key_id == settings.QR_TOKEN_KEY_ID:
+        return _derive_key(settings.SECRET_KEY, key_id)
+    secret = settings.QR_TOKEN_RETIRED_KEYS.get(key_id)
+    if secret is None:
+        raise InvalidQRTokenError()
+    return _derive_key(secret, key_id)
+
+
+def _sign(payload: bytes, key_id: int) -> bytes:
+    return hmac.new(get_signing_key(key_id), payload, hashlib.sha256).digest()[:MAC_SIZE]
+
+
+def _b64encode(raw: bytes) -> str:
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def _b64decode(token: str) -> bytes:
+    try:
+        return base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+    except (binascii.Error, ValueError):
+        raise InvalidQRTokenError()
+
+
+def _to_unix(moment: datetime) -> int:
+    return int((moment - _EPOCH).total_seconds())
+
+
+def pack_qr_token(
+    session_id: int,
+    course_code: str,
+    lecturer_id: int,
+    latitude: float,
+    longitude: float,
+    issued_at: datetime,
+    ttl_seconds: int = None,
+    flags: int = 0,
+    rotation_period: int = None,
+) -> bytes:
+    """
+    Build the signed binary token (payload followed by its MAC).
+    """
+    if ttl_seconds is None:
+        ttl_seconds = settings.QR_TOKEN_TTL_MINUTES * 60
+    if rotation_period is None:
+        rotation_period = settings.QR_ROTATION_PERIOD_SECONDS
+    course = course_code.encode()
+    key_id = settings.QR_TOKEN_KEY_ID
+    payload = (
+        _HEADER.pack(
+            TOKEN_VERSION,
+            key_id,
+            flags,
+            rotation_period,
+            session_id,
+            lecturer_id,
+            _to_unix(issued_at),
+            ttl_seconds,
+            round(latitude * COORDINATE_SCALE),
+            round(longitude * COORDINATE_SCALE),
+            len(course),
+        )
+        + course
+    )
+    return payload + _sign(payload, key_id)
+
+
+def unpack_qr_token(raw: bytes) -> QRTokenClaims:
+    """
+    Verify the MAC of a binary token and return its claims. Expiry is left to
+    the caller so an expired session can still be identified.
+    """
+    if len(raw) < _HEADER.size + MAC_SIZE:
+        raise InvalidQRTokenError()
+    (
+        version,
+        key_id,
+        flags,
+        rotation_period,
+        session_id,
+        lecturer_id,
+        issued_at,
+        ttl_seconds,
+        latitude,
+        longitude,
+        course_length,
+    ) = _HEADER.unpack_from(raw)
+    payload_size = _HEADER.size + course_length
+    if version != TOKEN_VERSION or len(raw) != payload_size + MAC_SIZE:
+        raise InvalidQRTokenError()
+    payload = raw[:payload_size]
+    if not hmac.compare_digest(_sign(payload, key_id), raw[payload_size:]):
+        raise InvalidQRTokenError()
+
+    issued = _EPOCH + timedelta(seconds=issued_at)
+    return QRTokenClaims(
+        session_id=session_id,
+        course_code=payload[_HEADER.size :].decode(),
+        lecturer_id=lecturer_id,
+        latitude=latitude / COORDINATE_SCALE,
+        longitude=longitude / COORDINATE_SCALE,
+        issued_at=issued,
+        expires_at=issued + timedelta(seconds=ttl_seconds),
+        flags=flags,
+        key_id=key_id,
+        rotation_period=rotation_period,
+    )
+
+
+def issue_qr_token(qr_code) -> str:
+    """
+    Issue the signed token for a persisted QRCode session.
+    """
+    return _b64encode(
+        pack_qr_token(
+            session_id=qr_code.session_id,
+            course_code=qr_code.course_code,
+            lecturer_id=qr_code.lecturer_id,
+            latitude=qr_code.latitude,
+            longitude=qr_code.longitude,
+            issued_at=qr_code.generation_time,
+            rotation_period=qr_code.rotation_period,
+        )
+    )
+
+
+def verify_qr_token(token: str) -> QRTokenClaims:
+    """
+    Decode and authenticate a token scanned from a QR code, in either the
+    compact or the URL-embedded format.
+    """
+    if _COMPACT_ALPHABET.fullmatch(token):
+        return unpack_compact_token(_b32decode(token))
+    return unpack_qr_token(_b64decode(token))
+
+
+def claims_from_qr_code(qr_code) -> QRTokenClaims:
+    """
+    Describe a QRCode row the same way a verified token would. The rotation
+    period is the one the code was issued with, so changing the setting does
+    not invalidate live codes.
+    """
+    # Tokens carry whole seconds; truncate so both views derive the same seed.
+    issued_at = qr_code.generation_time.replace(microsecond=0)
+    return QRTokenClaims(
+        session_id=qr_code.session_id,
+        course_code=qr_code.course_code,
+        lecturer_id=qr_code.lecturer_id,
+        latitude=qr_code.latitude,
+        longitude=qr_code.longitude,
+        issued_at=issued_at,
+        expires_at=issued_at + timedelta(minutes=settings.QR_TOKEN_TTL_MINUTES),
+        key_id=settings.QR_TOKEN_KEY_ID,
+        rotation_period=qr_code.rotation_period,
+    )
+
+
+# # --------------------
+# # Compact Tokens
+# # --------------------
+#
+# Compact tokens drop the URL wrapper and encode a tighter layout in
+# base32hex (0-9, A-V), which QR alphanumeric mode packs at 5.5 bits per
+# character instead of 8. Layout (big endian): version, key id, rotation
+# period, session id, lecturer id, issued-at, ttl, latitude and longitude in
+# units of 1e-5 degrees (about 1.1 m), the length-prefixed course code, then
+# a shorter MAC; the token lives for minutes, so 80 bits is plenty.
+
+COMPACT_VERSION = 3
+COMPACT_MAC_SIZE = 10
+COMPACT_COORDINATE_SCALE = 100_000
+
+_COMPACT_HEADER = struct.Struct(">BBBIIIHiiB")
+_COMPACT_ALPHABET = re.compile(r"[0-9A-V]+")
+_B32HEX_DIGITS = "0123456789ABCDEFGHIJKLMNOPQRSTUV"
+
+
+def _b32encode(raw: bytes) -> str:
+    length = -(-len(raw) * 8 // 5)
+    value = int.from_bytes(raw, "big") << (length * 5 - len(raw) * 8)
+    digits = []
+    for _ in range(length):
+        value, digit = divmod(value, 32)
+        digits.append(_B32HEX_DIGITS[digit])
+    return "".join(reversed(digits))
+
+
+def _b32decode(token: str) -> bytes:
+    # int() parses base32hex natively, so decoding is one C call and no
+    # per-character work; the trailing pad bits are shifted away.
+    size = len(token) * 5 // 8
+    return (int(token, 32) >> (len(token) * 5 - size * 8)).to_bytes(size, "big")
+
+
+def pack_compact_token(claims: QRTokenClaims) -> bytes:
+    course = claims.course_code.encode()
+    key_id = settings.QR_TOKEN_KEY_ID
+    payload = (
+        _COMPACT_HEADER.pack(
+            COMPACT_VERSION,
+            key_id,
+            claims.rotation_period,
+            claims.session_id,
+            claims.lecturer_id,
+            _to_unix(claims.issued_at),
+            int((claims.expires_at - claims.issued_at).total_seconds()),
+            round(claims.latitude * COMPACT_COORDINATE_SCALE),
+            round(claims.longitude * COMPACT_COORDINATE_SCALE),
+            len(course),
+        )
+        + course
+    )
+    return payload + _sign(payload, key_id)[:COMPACT_MAC_SIZE]
+
+
+def unpack_compact_token(raw: bytes) -> QRTokenClaims:
+    """
+    Verify and decode a compact token. Fields are read in place with a
+    precompiled struct and the MAC is checked over a memoryview, so the only
+    copies made are the decoded claims themselves.
+    """
+    if len(raw) < _COMPACT_HEADER.size + COMPACT_MAC_SIZE:
+        raise InvalidQRTokenError()
+    (
+        version,
+        key_id,
+        rotation_period,
+        session_id,
+        lecturer_id,
+        issued_at,
+        ttl_seconds,
+        latitude,
+        longitude,
+        course_length,
+    ) = _COMPACT_HEADER.unpack_from(raw)
+    payload_size = _COMPACT_HEADER.size + course_length
+    if version != COMPACT_VERSION or len(raw) != payload_size + COMPACT_MAC_SIZE:
+        raise InvalidQRTokenError()
+    view = memoryview(raw)
+    mac = hmac.new(get_signing_key(key_id), view[:payload_size], hashlib.sha256)
+    if not hmac.compare_digest(mac.digest()[:COMPACT_MAC_SIZE], view[payload_size:]):
+        raise InvalidQRTokenError()
+
+    issued = _EPOCH + timedelta(seconds=issued_at)
+    return QRTokenClaims(
+        session_id=session_id,
+        course_code=str(view[_COMPACT_HEADER.size : payload_size], "utf-8"),
+        lecturer_id=lecturer_id,
+        latitude=latitude / COMPACT_COORDINATE_SCALE,
+        longitude=longitude / COMPACT_COORDINATE_SCALE,
+        issued_at=issued,
+        expires_at=issued + timedelta(seconds=ttl_seconds),
+        key_id=key_id,
+        rotation_period=rotation_period,
+    )
+
+
+def issue_compact_token(qr_code) -> str:
+    """
+    Issue the compact token for a persisted QRCode session.
+    """
+    return _b32encode(pack_compact_token(claims_from_qr_code(qr_code)))
+
+
+# # --------------------
+# # Rotating Codes
+# # --------------------
+#
+# A rotating session projects its token plus a short code that changes every
+# `rotation_period` seconds. Codes are HOTP values (RFC 4226) over the step
+# counter, keyed by a per-session seed derived from the signing key, so no
+# rotation is ever written to the database.
+
+
+def derive_rotation_seed(claims: QRTokenClaims) -> bytes:
+    """
+    Derive the per-session rotation seed from the key that signed the token.
+    """
+    return hmac.new(
+        get_signing_key(claims.key_id),
+        f"qr-rotation:{claims.session_id}:{_to_unix(claims.issued_at)}".encode(),
+        hashlib.sha256,
+    ).digest()
+
+
+def rotation_step(claims: QRTokenClaims, moment: datetime) -> int:
+    return int((moment - claims.issued_at).total_seconds()) // claims.rotation_period
+
+
+def hotp(seed: bytes, counter: int, digits: int = None) -> str:
+    """
+    Compute an RFC 4226 HMAC-based one-time password for a counter value.
+    """
+    if digits is None:
+        digits = settings.QR_ROTATION_DIGITS
+    digest = hmac.new(seed, _COUNTER.pack(counter), hashlib.sha1).digest()
+    offset = digest[-1] & 0x0F
+    value = int.from_bytes(digest[offset : offset + 4], "big") & 0x7FFFFFFF
+    return str(value % 10**digits).zfill(digits)
+
+
+def verify_rotation_code(claims: QRTokenClaims, code: str, moment: datetime) -> bool:
+    """
+    Check a rotating code against the current step and its neighbours, which
+    absorbs scan latency and small clock drift on the projector.
+    """
+    if not code:
+        return False
+    seed = derive_rotation_seed(claims)
+    step = rotation_step(claims, moment)
+    return any(
+        hmac.compare_digest(hotp(seed, candidate), code)
+        for candidate in (step, step - 1, step + 1)
+        if candidate >= 0
+    )
@@ -1,32 +1,105 @@
+import asyncio
 from config import settings
 from datetime import datetime, timedelta
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, exists, delete
 from geopy.distance import geodesic
+import segno
 from datetime import datetime, timedelta
-from models import Student, Course, QRCode, StudentCourses
-from errors.qr_code_errors import HourlyQRCodeError, QRCodeNotFoundError
+from models import (
+    Student,
+    Course,
+    QRCode,
+    StudentCourses,
+    AttendanceSession,
+    AttendanceRecords,
+)
+from errors.qr_code_errors import QRCodeNotFoundError
 from errors.auth_errors import StudentNotFoundError
 from errors.course_errors import CourseNotFoundError, StudentEnrolledError
 from errors.attendance_errors import LocationRangeError
+from util.qr_token_utils import issue_qr_token, issue_compact_token
+from util.qr_image_utils import CachedQRImages, qr_image_cache, render_qr_images
+from utils import filter_records, insert_or_get, record_exists
+from util.attendance_summary_utils import rebuild_attendance_summaries
+from util.attendance_rollup_utils import remove_session_from_rollups
+from util.attendance_feed import publish_session_closed
+from util.proxy_scan_utils import proxy_scan_detector
+from util.tracing_utils import span
 
 # # --------------------
 # # Helper Functions
 # # --------------------
 
 
-def build_qr_code_url(course_code, lecturer_id, latitude, longitude, generated_at):
+def build_qr_code_url(
+    course_code, lecturer_id, latitude, longitude, generated_at, token=None
+):
     """
     Construct the QR code URL with query parameters.
     """
     base_url = settings.BASE_URL.strip("/")
-    return (
+    url = (
         f"{base_url}/?course_code={course_code}"
         f"&lecturer_id={lecturer_id}"
         f"&latitude={latitude}"
         f"&longitude={longitude}"
         f"&generated_at={generated_at}"
     )
+    if token:
+        url += f"&token={token}"
+    return url
+
+
+def build_qr_code_link(qr_code):
+    """
+    Construct the URL for a persisted QR code, including its signed token.
+    """
+    return build_qr_code_url(
+        course_code=qr_code.course_code,
+        lecturer_id=qr_code.lecturer_id,
+        latitude=qr_code.latitude,
+        longitude=qr_code.longitude,
+        generated_at=qr_code.generation_time.isoformat(),
+        token=issue_qr_token(qr_code),
+    )
+
+
+def build_compact_qr_link(qr_code):
+    """
+    Construct the compact QR payload: prefix plus base32hex token. Rotating
+    sessions append "/<code>" to it.
+    """
+    prefix = settings.QR_COMPACT_PREFIX or f"{settings.BASE_URL.strip('/').upper()}/Q/"
+    return f"{prefix}{issue_compact_token(qr_code)}"
+
+
+def describe_qr_symbol(content: str, error: str = "m"):
+    """
+    Report the QR symbol a payload needs: encoding mode, version and modules per side.
+    """
+    symbol = segno.make_qr(content, error=error, boost_error=False)
+    return {
+        "length": len(content),
+        "mode": symbol.mode,
+        "version": symbol.version,
+        "modules": symbol.symbol_size(border=0)[0],
+    }
+
+
+async def cache_qr_code_images(qr_code) -> CachedQRImages:
+    """
+    Render the compact payload of a QR code and keep the images in the cache.
+    Rendering is CPU-bound, so it runs in a worker thread.
+    """
+    entry = CachedQRImages(
+        lecturer_id=qr_code.lecturer_id,
+        images=await asyncio.to_thread(
+            render_qr_images, build_compact_qr_link(qr_code)
+        ),
+    )
+    qr_image_cache.put(qr_code.qr_code_id, entry)
+    return entry
 
 
 def get_current_utc_time():
@@ -38,27 +111,88 @@ def get_start_of_current_hour():
     return now.replace(minute=0, second=0, microsecond=0)
 
 
-async def check_recent_qr_code(db: AsyncSession, course_code, lecturer_id):
+async def get_or_create_hourly_qr_code(
+    db: AsyncSession, course_code, lecturer_id, latitude, longitude
+):
     """
-    Ensure that a QR code for the same course does not exist within the current hour.
+    Create this hour's attendance session and its QR code for a course, or
+    return the ones that already exist. Both inserts are keyed upserts, so
+    simultaneous requests converge on the same rows without a prior SELECT.
     """
-    start_of_current_hour = get_start_of_current_hour()
+    started_at = get_current_utc_time()
+    hour_bucket = started_at.replace(minute=0, second=0, microsecond=0)
 
-    result = await db.execute(
-        select(QRCode)
-        .where(
-            QRCode.course_code == course_code,
-            QRCode.lecturer_id == lecturer_id,
-            QRCode.generation_time
-            >= start_of_current_hour,  # Only consider QR codes from this hour
+    sessions = await db.scalars(
+        insert_or_get(
+            db, AttendanceSession, ["course_code", "lecturer_id", "hour_bucket"]
         )
-        .order_by(QRCode.generation_time.desc())
+        .values(
+            course_code=course_code,
+            lecturer_id=lecturer_id,
+            semester=select(Course.semester)
+            .where(Course.course_code == course_code)
+            .scalar_subquery(),
+            started_at=started_at,
+            hour_bucket=hour_bucket,
+            latitude=latitude,
+            longitude=longitude,
+        )
+        .returning(AttendanceSession),
+        execution_options={"populate_existing": True},
+    )
+    session = sessions.one()
+
+    qr_codes = await db.scalars(
+        insert_or_get(db, QRCode, ["course_code", "lecturer_id", "hour_bucket"])
+        .values(
+            course_code=course_code,
+            lecturer_id=lecturer_id,
+            session_id=session.session_id,
+            generation_time=session.started_at,
+            hour_bucket=hour_bucket,
+            latitude=session.latitude,
+            longitude=session.longitude,
+            url="",
+            rotation_period=settings.QR_ROTATION_PERIOD_SECONDS,
+        )
+        .returning(QRCode),
+        execution_options={"populate_existing": True},
     )
+    return qr_codes.one()
 
-    existing_qr_code = result.scalars().first()
 
-    if existing_qr_code:
-        raise HourlyQRCodeError()
+async def release_qr_code_session(db: AsyncSession, session_id: int):
+    """
+    Called when a QR code is deleted: drop its session if nobody scanned it,
+    otherwise keep the session for its records but void it, free its hour
+    slot, and take it back out of the summaries and rollups.
+    """
+    has_records = await db.scalar(
+        select(
+            exists().where(AttendanceRecords.session_id == session_id)
+        )
+    )
+    if has_records:
+        now = get_current_utc_time()
+        # Locked like close_session, so a concurrent scan either lands before
+        # the void (and is removed with the rest) or sees it and is refused.
+        session = await db.get(AttendanceSession, session_id, with_for_update=True)
+        session.hour_bucket = None
+        session.voided_at = now
+        # Closed without close_session, which would count it; the sweeper skips it.
+        session.closed_at = session.closed_at or now
+        await db.flush()
+        await remove_session_from_rollups(db, session_id)
+        connection = await db.connection()
+        await connection.run_sync(
+            rebuild_attendance_summaries, None, session.course_code
+        )
+        publish_session_closed(session_id)
+        proxy_scan_detector.forget(session_id)
+    else:
+        await db.execute(
+            delete(AttendanceSession).where(AttendanceSession.session_id == session_id)
+        )
 
 
 def is_within_timeframe(qr_time: datetime) -> bool:
@@ -74,39 +208,31 @@ def validate_geolocation(
 ):
     student_location = (student_lat, student_long)
     lecturer_location = (qr_lat, qr_long)
-    distance = geodesic(student_location, lecturer_location).meters
+    with span("geodesic"):
+        distance = geodesic(student_location, lecturer_location).meters
     if distance > max_distance:
         raise LocationRangeError()
     return True
 
 
 async def fetch_student(db: AsyncSession, matric_number: str):
-    result = await db.execute(
-        select(Student).where(Student.matric_number == matric_number)
-    )
-    student = result.scalars().first()
+    student = await filter_records(Student, db, matric_number=matric_number)
     if not student:
         raise StudentNotFoundError()
     return student
 
 
 async def fetch_course(db: AsyncSession, course_code: str):
-    result = await db.execute(select(Course).where(Course.course_code == course_code))
-    course = result.scalars().first()
+    course = await filter_records(Course, db, course_code=course_code)
     if not course:
         raise CourseNotFoundError()
     return course
 
 
 async def validate_enrollment(db: AsyncSession, matric_number: str, course_code: str):
-    result = await db.execute(
-        select(StudentCourses).where(
-            (StudentCourses.matric_number == matric_number)
-            & (StudentCourses.course_code == course_code)
-        )
-    )
-    enrollment = result.scalars().first()
-    if not enrollment:
+    if not await record_exists(
+        StudentCourses, db, matric_number=matric_number, course_code=course_code
+    ):
         raise StudentEnrolledError()
 
 
@@ -0,0 +1,104 @@
+import math
+from typing import Dict, List, Sequence
+from sqlalchemy import and_, func, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from models import AttendanceRecords, AttendanceSession
+from utils import haversine
+from util.geohash_utils import METERS_PER_DEGREE, covering_prefixes, prefix_upper_bound
+
+# # --------------------
+# # Scan Location Analysis
+# # --------------------
+#
+# Both lookups narrow candidates in SQL with index-friendly conditions on the
+# numeric columns or the geohash, then measure exact distances in Python.
+
+SCAN_COLUMNS = (
+    AttendanceRecords.matric_number,
+    AttendanceRecords.course_code,
+    AttendanceRecords.session_id,
+    AttendanceRecords.date,
+    AttendanceRecords.latitude,
+    AttendanceRecords.longitude,
+)
+
+
+def _scan(row, distance: float) -> Dict:
+    matric_number, course_code, session_id, date, latitude, longitude = row[:6]
+    return {
+        "matric_number": matric_number,
+        "course_code": course_code,
+        "session_id": session_id,
+        "date": date,
+        "latitude": latitude,
+        "longitude": longitude,
+        "distance_m": round(distance, 1),
+    }
+
+
+def geohash_ranges(latitude: float, longitude: float, radius_m: float):
+    """One geohash range condition per cell covering the circle."""
+    conditions = []
+    for prefix in covering_prefixes(latitude, longitude, radius_m):
+        upper = prefix_upper_bound(prefix)
+        condition = AttendanceRecords.geohash >= prefix
+        if upper is not None:
+            condition = and_(condition, AttendanceRecords.geohash < upper)
+        conditions.append(condition)
+    return or_(*conditions)
+
+
+async def fetch_scans_near(
+    db: AsyncSession,
+    latitude: float,
+    longitude: float,
+    radius_m: float,
+    course_codes: Sequence[str],
+    limit: int,
+) -> List[Dict]:
+    """Scans within radius_m of a point, nearest first."""
+    result = await db.execute(
+        select(*SCAN_COLUMNS).where(
+            geohash_ranges(latitude, longitude, radius_m),
+            AttendanceRecords.course_code.in_(course_codes),
+        )
+    )
+    scans = []
+    for row in result.all():
+        distance = haversine(latitude, longitude, row[4], row[5])
+        if distance <= radius_m:
+            scans.append(_scan(row, distance))
+    scans.sort(key=lambda scan: scan["distance_m"])
+    return scans[:limit]
+
+
+async def fetch_scans_far_from_session(
+    db: AsyncSession, course_code: str, min_distance_m: float, limit: int
+) -> List[Dict]:
+    """
+    Scans of a course made more than min_distance_m from their session's
+    location, farthest first.
+    """
+    # A point within this many degrees of the session on both axes is at most
+    # min_distance_m away at any latitude (a degree of longitude is never
+    # longer than one of latitude), so SQL only returns the points outside it.
+    inner = min_distance_m / math.sqrt(2) / METERS_PER_DEGREE
+    result = await db.execute(
+        select(*SCAN_COLUMNS, AttendanceSession.latitude, AttendanceSession.longitude)
+        .join(AttendanceSession, AttendanceSession.session_id == AttendanceRecords.session_id)
+        .where(
+            AttendanceRecords.course_code == course_code,
+            AttendanceRecords.latitude.is_not(None),
+            or_(
+                func.abs(AttendanceRecords.latitude - AttendanceSession.latitude) > inner,
+                func.abs(AttendanceRecords.longitude - AttendanceSession.longitude) > inner,
+            ),
+        )
+    )
+    scans = []
+    for row in result.all():
+        distance = haversine(row[6], row[7], row[4], row[5])
+        if distance > min_distance_m:
+            scans.append(_scan(row, distance))
+    scans.sort(key=lambda scan: scan["distance_m"], reverse=True)
+    return scans[:limit]
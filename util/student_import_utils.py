@@ -0,0 +1,237 @@
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import AsyncIterator, Callable, Dict, List, Optional, Set, Tuple
+from pydantic import ValidationError
+from sqlalchemy import or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from models import Student
+from schemas import StudentCreate
+from utils import insert_ignoring_conflicts, iter_csv_records
+from util.password_utils import hash_passwords
+from config import settings
+
+# # --------------------
+# # Bulk Student Import
+# # --------------------
+#
+# Imports are resumable through the Student table itself: a row whose matric
+# number is already registered with the same email is reported as
+# already_imported and costs no hashing, so re-running an interrupted import
+# with the same file picks up where it stopped.
+
+STUDENT_COLUMNS = tuple(StudentCreate.model_fields)
+
+
+def hash_worker_count() -> int:
+    return settings.IMPORT_HASH_WORKERS or os.cpu_count() or 1
+
+
+_hash_pool: Optional[ProcessPoolExecutor] = None
+
+
+def get_hash_pool() -> ProcessPoolExecutor:
+    """
+    The process's one hashing pool, created on first use and shared by all
+    imports. Workers are spawned lazily and stay up until shutdown_hash_pool.
+    """
+    global _hash_pool
+    if _hash_pool is None:
+        # Spawned workers only import util.password_utils; forking a process
+        # that runs an event loop and driver threads is not safe.
+        _hash_pool = ProcessPoolExecutor(
+            max_workers=hash_worker_count(),
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _hash_pool
+
+
+async def shutdown_hash_pool():
+    """
+    Stop the hashing pool. Waiting for the workers to exit blocks, so it runs
+    in a thread instead of on the event loop.
+    """
+    global _hash_pool
+    pool, _hash_pool = _hash_pool, None
+    if pool is not None:
+        await asyncio.to_thread(pool.shutdown, wait=True)
+
+
+async def hash_in_pool(pool: Executor, passwords: List[str]) -> List[str]:
+    """
+    Hash passwords across the pool in one chunk per worker, keeping bcrypt's
+    CPU time off the event loop.
+    """
+    if not passwords:
+        return []
+    loop = asyncio.get_running_loop()
+    size = -(-len(passwords) // hash_worker_count())
+    chunks = await asyncio.gather(
+        *(
+            loop.run_in_executor(pool, hash_passwords, passwords[start : start + size])
+            for start in range(0, len(passwords), size)
+        )
+    )
+    return [hashed for chunk in chunks for hashed in chunk]
+
+
+def _row_result(line, row, status, detail=None):
+    return {
+        "line": line,
+        "matric_number": row.get("matric_number") or "",
+        "status": status,
+        "detail": detail,
+    }
+
+
+async def import_student_batch(
+    db: AsyncSession,
+    pool: Executor,
+    batch: List[Tuple[int, Dict[str, str]]],
+    seen: Set[str],
+) -> List[Dict]:
+    """
+    Validate, hash and insert one batch of student rows. Existing matric
+    numbers and emails are found with one query, and only new students are
+    hashed and inserted, in a single conflict-skipping statement.
+    """
+    results = {}
+    candidates = []
+    for line, row in batch:
+        try:
+            student = StudentCreate.model_validate(row)
+        except ValidationError as exc:
+            error = exc.errors()[0]
+            field = ".".join(str(part) for part in error["loc"])
+            results[line] = _row_result(line, row, "rejected", f"{field}: {error['msg']}")
+            continue
+        candidates.append((line, row, student))
+
+    existing = (
+        await db.execute(
+            select(Student.matric_number, Student.student_email).where(
+                or_(
+                    Student.matric_number.in_(
+                        {student.matric_number for _, _, student in candidates}
+                    ),
+                    Student.student_email.in_(
+                        {student.student_email for _, _, student in candidates}
+                    ),
+                )
+            )
+        )
+    ).all()
+    email_by_matric = dict(existing)
+    emails = {email for _, email in existing}
+
+    new_students = []
+    for line, row, student in candidates:
+        if email_by_matric.get(student.matric_number) == student.student_email:
+            results[line] = _row_result(line, row, "already_imported")
+        elif student.matric_number in email_by_matric:
+            results[line] = _row_result(
+                line, row, "rejected", "Matric number registered with another email."
+            )
+        elif student.student_email in emails:
+            results[line] = _row_result(line, row, "rejected", "Email already registered.")
+        elif student.matric_number in seen or student.student_email in seen:
+            results[line] = _row_result(line, row, "duplicate", "Repeats an earlier row.")
+        else:
+            seen.update((student.matric_number, student.student_email))
+            new_students.append((line, row, student))
+
+    if new_students:
+        hashes = await hash_in_pool(
+            pool, [student.student_password for _, _, student in new_students]
+        )
+        inserted = set(
+            (
+                await db.execute(
+                    insert_ignoring_conflicts(db, Student, ["matric_number"])
+                    .values(
+                        [
+                            {
+                                "matric_number": student.matric_number,
+                                "student_fullname": student.student_fullname,
+                                "student_email": student.student_email,
+                                "student_password": hashed,
+                            }
+                            for (_, _, student), hashed in zip(new_students, hashes)
+                        ]
+                    )
+                    .returning(Student.matric_number)
+                )
+            ).scalars()
+        )
+        await db.commit()
+        for line, row, student in new_students:
+            # Lost a race with a concurrent signup of the same matric number.
+            results[line] = (
+                _row_result(line, row, "imported")
+                if student.matric_number in inserted
+                else _row_result(line, row, "already_imported")
+            )
+
+    return [results[line] for line, _ in batch]
+
+
+async def import_students(
+    db: AsyncSession,
+    chunks: AsyncIterator[bytes],
+    on_progress: Optional[Callable[[List[Dict]], None]] = None,
+) -> List[Dict]:
+    """
+    Import students from a streamed CSV in batches of BULK_BATCH_SIZE, each
+    committed on its own. on_progress receives every batch's results.
+    """
+    results = []
+    seen = set()
+    batch = []
+    pool = get_hash_pool()
+    async for line, row in iter_csv_records(chunks, STUDENT_COLUMNS):
+        batch.append((line, row))
+        if len(batch) >= settings.BULK_BATCH_SIZE:
+            results += await import_student_batch(db, pool, batch, seen)
+            if on_progress:
+                on_progress(results)
+            batch = []
+    if batch:
+        results += await import_student_batch(db, pool, batch, seen)
+        if on_progress:
+            on_progress(results)
+    return results
+
+
+if __name__ == "__main__":
+    import sys
+    from collections import Counter
+    from database import async_session
+
+    async def read_file(path: str) -> AsyncIterator[bytes]:
+        with open(path, "rb") as file:
+            while chunk := file.read(1 << 16):
+                yield chunk
+
+    def report(results: List[Dict]):
+        counts = Counter(result["status"] for result in results)
+        print(
+            f"{len(results)} rows: {counts['imported']} imported, "
+            f"{counts['already_imported']} already imported, "
+            f"{counts['duplicate']} duplicate, {counts['rejected']} rejected",
+            flush=True,
+        )
+
+    async def main():
+        if len(sys.argv) != 2:
+            sys.exit("usage: python -m util.student_import_utils <students.csv>")
+        try:
+            async with async_session() as db:
+                results = await import_students(db, read_file(sys.argv[1]), report)
+        finally:
+            await shutdown_hash_pool()
+        for result in results:
+            if result["status"] in ("rejected", "duplicate"):
+                print(f"line {result['line']}: {result['detail']}")
+
+    asyncio.run(main())
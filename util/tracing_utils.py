@@ -0,0 +1,204 @@
+import asyncio
+import functools
+import inspect
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+# # --------------------
+# # Request Tracing
+# # --------------------
+#
+# Every HTTP request gets a Trace holding its spans: the request itself, the
+# auth and session dependencies, service calls, JWT decoding, geodesic checks,
+# commits and every SQL statement. Spans are summed per name into the
+# Server-Timing header of operator requests, and with TRACE_FILE set each trace
+# is appended to it in the Chrome trace event format (chrome://tracing,
+# Perfetto, speedscope).
+
+
+class Span:
+    __slots__ = ("name", "category", "start", "end", "task", "args")
+
+    def __init__(self, name: str, category: str, task: int, args: Optional[Dict] = None):
+        self.name = name
+        self.category = category
+        self.start = time.perf_counter()
+        self.end: Optional[float] = None
+        self.task = task
+        self.args = args
+
+
+class Trace:
+    def __init__(self, name: str):
+        self.name = name
+        self.wall_start = time.time()
+        self.start = time.perf_counter()
+        self.spans: List[Span] = []
+        self._tasks: Dict[int, int] = {}
+
+    def open_span(self, name: str, category: str, args: Optional[Dict] = None) -> Span:
+        # Concurrent tasks of one request each get their own track.
+        try:
+            task = id(asyncio.current_task())
+        except RuntimeError:
+            task = 0
+        span = Span(name, category, self._tasks.setdefault(task, len(self._tasks)), args)
+        self.spans.append(span)
+        return span
+
+    def server_timing(self) -> str:
+        """Summed duration per span name, SQL statements as one entry, and the total."""
+        now = time.perf_counter()
+        totals: Dict[str, float] = {}
+        statements = 0
+        for span in self.spans:
+            if span.end is None:
+                continue
+            name = "sql" if span.category == "sql" else span.name
+            totals[name] = totals.get(name, 0.0) + span.end - span.start
+            statements += span.category == "sql"
+        service_ends = [
+            span.end for span in self.spans if span.category == "service" and span.end
+        ]
+        if service_ends:
+            # Response validation and serialization run after the service returns.
+            totals["serialize"] = now - max(service_ends)
+        entries = [
+            f'sql;dur={duration * 1000:.2f};desc="{statements} statements"'
+            if name == "sql"
+            else f"{name};dur={duration * 1000:.2f}"
+            for name, duration in totals.items()
+        ]
+        entries.append(f"total;dur={(now - self.start) * 1000:.2f}")
+        return ", ".join(entries)
+
+    def chrome_events(self) -> List[Dict]:
+        end = time.perf_counter()
+        origin = self.wall_start * 1e6 - self.start * 1e6
+        events = [
+            {
+                "name": self.name,
+                "cat": "request",
+                "ph": "X",
+                "ts": round(self.wall_start * 1e6),
+                "dur": round((end - self.start) * 1e6),
+                "pid": os.getpid(),
+                "tid": 0,
+            }
+        ]
+        for span in self.spans:
+            event = {
+                "name": span.name,
+                "cat": span.category,
+                "ph": "X",
+                "ts": round(origin + span.start * 1e6),
+                "dur": round(((span.end or end) - span.start) * 1e6),
+                "pid": os.getpid(),
+                "tid": span.task,
+            }
+            if span.args:
+                event["args"] = span.args
+            events.append(event)
+        return events
+
+
+current_trace: ContextVar[Optional[Trace]] = ContextVar("current_trace", default=None)
+
+
+@contextmanager
+def span(name: str, category: str = "app", **args):
+    """Time a block as a span of the current request; a no-op outside one."""
+    trace = current_trace.get()
+    if trace is None:
+        yield None
+        return
+    opened = trace.open_span(name, category, args or None)
+    try:
+        yield opened
+    finally:
+        opened.end = time.perf_counter()
+
+
+def trace_service(cls):
+    """Class decorator: run every async static method of a service in a span."""
+    for name, member in list(vars(cls).items()):
+        if isinstance(member, staticmethod) and inspect.iscoroutinefunction(member.__func__):
+            setattr(cls, name, staticmethod(_traced(f"{cls.__name__}.{name}", member.__func__)))
+    return cls
+
+
+def _traced(name, function):
+    @functools.wraps(function)
+    async def wrapper(*args, **kwargs):
+        with span(name, "service"):
+            return await function(*args, **kwargs)
+
+    return wrapper
+
+
+_export_lock = threading.Lock()
+
+
+def export_trace(trace: Trace, path: str):
+    """
+    Append a trace to a Chrome trace file. The JSON array format allows the
+    closing bracket to be missing, so the file stays valid while it grows.
+    """
+    lines = "".join(json.dumps(event) + ",\n" for event in trace.chrome_events())
+    with _export_lock:
+        new_file = not os.path.exists(path) or os.path.getsize(path) == 0
+        with open(path, "a") as file:
+            if new_file:
+                file.write("[\n")
+            file.write(lines)
+
+
+# SQL statements and commits of any engine or session, attributed to the
+# request whose task issued them.
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _open_sql_span(conn, cursor, statement, parameters, context, executemany):
+    trace = current_trace.get()
+    if trace is not None:
+        conn.info.setdefault("trace_spans", []).append(
+            trace.open_span("sql", "sql", {"statement": statement[:500]})
+        )
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _close_sql_span(conn, cursor, statement, parameters, context, executemany):
+    spans = conn.info.get("trace_spans")
+    if spans:
+        spans.pop().end = time.perf_counter()
+
+
+@event.listens_for(Engine, "handle_error")
+def _discard_sql_span(exception_context):
+    conn = exception_context.connection
+    spans = conn.info.get("trace_spans") if conn is not None else None
+    if spans:
+        spans.pop().end = time.perf_counter()
+
+
+@event.listens_for(Session, "before_commit")
+def _open_commit_span(session):
+    trace = current_trace.get()
+    if trace is not None:
+        session.info["commit_span"] = trace.open_span("commit", "db")
+
+
+@event.listens_for(Session, "after_commit")
+@event.listens_for(Session, "after_rollback")
+def _close_commit_span(session):
+    opened = session.info.pop("commit_span", None)
+    if opened is not None:
+        opened.end = time.perf_counter()
@@ -1,14 +1,287 @@
 #### app/utils.py
 
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import UniqueConstraint, bindparam, exists, inspect, update
 from sqlalchemy.future import select
+from sqlalchemy.dialects import postgresql, sqlite
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import AsyncIterator, Dict, Iterable, Optional, Tuple
+from errors.import_errors import MissingCSVColumnsError
+import codecs
+import csv
+import io
 import math
 
+# --------------------
+# Cached Lookup Statements
+# --------------------
+# Lookups by a fixed set of columns run constantly with the same shape. Each
+# (model, filter keys) shape is built once with bound parameters and reused,
+# so SQLAlchemy takes the memoized cache key and the compiled SQL from its
+# cache instead of building and hashing a new select on every call.
+
+
+def _bound_criteria(model, keys):
+    return [getattr(model, key) == bindparam(key) for key in keys]
+
+
+@lru_cache(maxsize=None)
+def _record_statement(model, keys: Tuple[str, ...]):
+    return select(model).where(*_bound_criteria(model, keys)).limit(1)
+
+
+@lru_cache(maxsize=None)
+def _value_statement(column, keys: Tuple[str, ...]):
+    return select(column).where(*_bound_criteria(column.class_, keys)).limit(1)
+
+
+@lru_cache(maxsize=None)
+def _exists_statement(model, keys: Tuple[str, ...]):
+    return select(exists().where(*_bound_criteria(model, keys)))
+
+
+def _lookup(cached_statement, target, filters):
+    # "= NULL" never matches; None filters keep filter_by's IS NULL semantics.
+    if None in filters.values():
+        return None
+    return cached_statement(target, tuple(sorted(filters)))
+
+
+# --------------------
+# Request Identity Cache
+# --------------------
+# A request tends to load the same rows more than once: the auth dependency
+# loads the user, then the service looks the same user up again, and helpers
+# re-check courses and QR codes their caller already fetched. While a request
+# is active, rows found by primary key or unique key are remembered, and
+# lookups by one of those keys are answered without a query. Only rows are
+# cached, never misses, so a row created later in the request is still found.
+
+# Keys the application treats as unique although the schema does not enforce
+# them: login emails, course names and lecturer course assignments.
+NATURAL_KEYS = {
+    "student": [("student_email",)],
+    "lecturer": [("lecturer_email",)],
+    "course": [("course_name",)],
+    "lecturercourses": [("course_code", "lecturer_id")],
+}
+
+
+class RequestIdentityCache:
+    def __init__(self):
+        self.rows: Dict[Tuple, object] = {}
+        self.hits = 0
+        self.misses = 0
+
+
+current_identity_cache: ContextVar[Optional[RequestIdentityCache]] = ContextVar(
+    "current_identity_cache", default=None
+)
+identity_cache_totals = {"requests": 0, "hits": 0, "misses": 0}
+
+
+@lru_cache(maxsize=None)
+def identity_keys(model) -> Tuple[Tuple[str, ...], ...]:
+    table = model.__table__
+    keys = [tuple(sorted(column.name for column in table.primary_key.columns))]
+    keys += [(column.name,) for column in table.columns if column.unique]
+    keys += [
+        tuple(sorted(column.name for column in constraint.columns))
+        for constraint in table.constraints
+        if isinstance(constraint, UniqueConstraint)
+    ]
+    keys += NATURAL_KEYS.get(table.name, [])
+    return tuple(dict.fromkeys(keys))
+
+
+def remember_identity(row):
+    """Make a loaded row answer later lookups by any of its keys in this request."""
+    cache = current_identity_cache.get()
+    if cache is None or row is None:
+        return
+    model = type(row)
+    for keys in identity_keys(model):
+        values = tuple(getattr(row, key) for key in keys)
+        if None not in values:
+            cache.rows[(model, keys, values)] = row
+
+
+async def cached_identity(model, db: AsyncSession, filters):
+    """
+    Return the cached row matching filters, attached to db, when the filters
+    contain one of the model's identity keys. Counts the avoided query.
+    """
+    cache = current_identity_cache.get()
+    if cache is None:
+        return None
+    keyed = False
+    for keys in identity_keys(model):
+        if not all(key in filters for key in keys):
+            continue
+        keyed = True
+        row = cache.rows.get((model, keys, tuple(filters[key] for key in keys)))
+        if row is None:
+            continue
+        state = inspect(row)
+        if state.was_deleted or state.modified or state.expired_attributes:
+            # Deleted, changed or rolled back since it was cached.
+            continue
+        if any(getattr(row, key) != value for key, value in filters.items()):
+            # Same key, but the other filters rule the row out.
+            break
+        cache.hits += 1
+        if state.session is not db.sync_session:
+            # Loaded by another session of this request (the auth lookup);
+            # attach it without reloading.
+            row = await db.merge(row, load=False)
+        return row
+    if keyed:
+        cache.misses += 1
+    return None
+
+
 async def filter_records(model, db: AsyncSession, **filters):
     """Reusable function to filter records from a given model."""
-    query = select(model).filter_by(**filters)
-    result = await db.execute(query)
-    return result.scalars().first()
+    row = await cached_identity(model, db, filters)
+    if row is not None:
+        return row
+    statement = _lookup(_record_statement, model, filters)
+    if statement is None:
+        statement = select(model).filter_by(**filters).limit(1)
+    result = await db.execute(statement, filters)
+    row = result.scalars().first()
+    remember_identity(row)
+    return row
+
+
+async def filter_value(column, db: AsyncSession, **filters):
+    """Fetch one column of the first matching record instead of the whole row."""
+    row = await cached_identity(column.class_, db, filters)
+    if row is not None:
+        return getattr(row, column.key)
+    statement = _lookup(_value_statement, column, filters)
+    if statement is None:
+        statement = select(column).filter_by(**filters).limit(1)
+    return await db.scalar(statement, filters)
+
+
+async def record_exists(model, db: AsyncSession, **filters) -> bool:
+    """Check whether a matching record exists without loading it."""
+    if await cached_identity(model, db, filters) is not None:
+        return True
+    statement = _lookup(_exists_statement, model, filters)
+    if statement is None:
+        statement = select(select(model).filter_by(**filters).exists())
+    return await db.scalar(statement, filters)
+
+
+def dialect_insert(db: AsyncSession, model):
+    """
+    Build an INSERT supporting ON CONFLICT clauses for the session's database.
+    """
+    dialect = postgresql if db.get_bind().dialect.name == "postgresql" else sqlite
+    return dialect.insert(model)
+
+
+def insert_ignoring_conflicts(db: AsyncSession, model, conflict_columns):
+    """
+    Build an INSERT ... ON CONFLICT DO NOTHING for the session's database, so
+    uniqueness is enforced by one statement instead of a check then an insert.
+    """
+    return dialect_insert(db, model).on_conflict_do_nothing(
+        index_elements=conflict_columns
+    )
+
+
+def insert_or_get(db: AsyncSession, model, conflict_columns):
+    """
+    Build an INSERT whose conflict clause is a no-op update, so RETURNING yields
+    the new row or, on conflict, the existing one - in a single statement.
+    """
+    statement = dialect_insert(db, model)
+    key = conflict_columns[0]
+    return statement.on_conflict_do_update(
+        index_elements=conflict_columns, set_={key: statement.excluded[key]}
+    )
+
+
+def select_for_update(db: AsyncSession, columns, *criteria):
+    """
+    Build a statement returning columns of the matching row and locking it
+    until commit. SQLite ignores FOR UPDATE and only locks once a transaction
+    writes, so there the lock is taken by a no-op UPDATE ... RETURNING.
+    """
+    if db.get_bind().dialect.name == "sqlite":
+        return (
+            update(columns[0].table)
+            .where(*criteria)
+            .values({columns[0].key: columns[0]})
+            .returning(*columns)
+        )
+    return select(*columns).where(*criteria).with_for_update()
+
+
+def _complete_records_end(text: str) -> int:
+    """
+    Length of the longest prefix of text that ends on a record boundary: a
+    newline outside quotes. Doubled quotes inside a field keep the count even.
+    """
+    end = text.rfind("\n")
+    while end != -1:
+        if text.count('"', 0, end) % 2 == 0:
+            return end + 1
+        end = text.rfind("\n", 0, end)
+    return 0
+
+
+async def iter_csv_records(
+    chunks: AsyncIterator[bytes], required_columns: Iterable[str]
+) -> AsyncIterator[Tuple[int, Dict[str, str]]]:
+    """
+    Parse a streamed UTF-8 CSV with a header row into (line number, record)
+    pairs as the bytes arrive, without holding the whole upload in memory.
+    Text is handed to csv.reader only up to the last complete record, so
+    quoted fields may span lines; line numbers are where each record starts.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    header = None
+    lines_read = 0
+    pending = ""
+
+    async def blocks():
+        nonlocal pending
+        async for chunk in chunks:
+            pending += decoder.decode(chunk)
+            end = _complete_records_end(pending)
+            if end:
+                block, pending = pending[:end], pending[end:]
+                yield block
+        pending += decoder.decode(b"", final=True)
+        if pending:
+            yield pending
+
+    async for block in blocks():
+        reader = csv.reader(io.StringIO(block))
+        record_start = lines_read + 1
+        for values in reader:
+            line_number = record_start
+            record_start = lines_read + reader.line_num + 1
+            values = [value.strip() for value in values]
+            if not any(values):
+                continue
+            if header is None:
+                header = values
+                missing = set(required_columns) - set(header)
+                if missing:
+                    raise MissingCSVColumnsError(missing)
+                continue
+            yield line_number, dict(zip(header, values))
+        lines_read += reader.line_num
+
+    if header is None:
+        # An empty body has no header either.
+        raise MissingCSVColumnsError(required_columns)
 
 
 def haversine(lat1, lon1, lat2, lon2):